@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Measure throughput and peak memory of `open_uri` streaming
+decompression per codec, compared with decompressing whole file
+in memory.
+
+Usage: python benchmarks/bench_decompress.py [MEGABYTES] [CHUNK_KB]
+"""
+
+import os
+import sys
+import bz2
+import gzip
+import lzma
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.fs import iter_uri_chunks  # noqa
+
+CODECS = [('gzip', gzip), ('bz2', bz2), ('xz', lzma)]
+
+
+def make_data(megabytes: int) -> bytes:
+    lines = []
+    size = 0
+    number = 0
+    while size < megabytes * 1024 * 1024:
+        line = (f'- name: item-{number}\n  value: {number * 7919 % 100003}\n'
+                f'  tags: [{number % 13}, {number % 17}]\n').encode('ascii')
+        lines.append(line)
+        size += len(line)
+        number += 1
+    return b''.join(lines)
+
+
+def read_streaming(path: str, chunk_size: int) -> int:
+    return sum(len(chunk) for chunk in iter_uri_chunks(
+        path, chunk_size=chunk_size, decompress=True))
+
+
+def read_whole(path: str, module) -> int:
+    with open(path, 'rb') as fp:
+        return len(module.decompress(fp.read()))
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    size = function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size / elapsed / 2 ** 20, peak / 2 ** 20
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    chunk_size = (int(sys.argv[2]) if len(sys.argv) > 2 else 256) * 1024
+    data = make_data(megabytes)
+    print(f'{len(data) / 2 ** 20:.0f} MiB of text, '
+          f'{chunk_size // 1024} KiB chunks')
+    print(f'{"codec":<6} {"ratio":>6} {"streaming":>22} {"whole file":>22}')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for codec, module in CODECS:
+            path = os.path.join(temp_dir, f'data.{codec}')
+            with open(path, 'wb') as fp:
+                fp.write(module.compress(data))
+            ratio = len(data) / os.path.getsize(path)
+            stream_speed, stream_peak = measure(
+                read_streaming, path, chunk_size)
+            whole_speed, whole_peak = measure(read_whole, path, module)
+            print(f'{codec:<6} {ratio:>5.1f}x '
+                  f'{stream_speed:>7.0f} MiB/s {stream_peak:>6.1f} MiB '
+                  f'{whole_speed:>7.0f} MiB/s {whole_peak:>6.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
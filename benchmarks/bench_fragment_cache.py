@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Measure repeated loads of the same config tree with and without
+process-wide fragment cache.
+
+Usage: python benchmarks/bench_fragment_cache.py [LOADS] [FRAGMENTS] [ENTRIES]
+"""
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.yamlinclude import DEFAULT_INCLUDE_LOADER, FragmentCache, \
+    load  # noqa
+from bench_yamlinclude import generate_tree  # noqa
+
+
+def bench(config_path: pathlib.Path, loads: int, fragment_cache) -> float:
+    start = time.perf_counter()
+    for _ in range(loads):
+        with config_path.open('r') as fp:
+            load(fp, DEFAULT_INCLUDE_LOADER, fragment_cache=fragment_cache)
+    return time.perf_counter() - start
+
+
+def main():
+    loads = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    fragments = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    entries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_path = generate_tree(pathlib.Path(temp_dir), fragments, entries)
+        print(f'{loads} loads of {fragments} fragments x {entries} entries '
+              f'({DEFAULT_INCLUDE_LOADER.__name__})')
+        uncached = bench(config_path, loads, None)
+        print(f'No cache:     {uncached:.3f} s')
+        for frozen in (False, True):
+            cache = FragmentCache(frozen=frozen)
+            cached = bench(config_path, loads, cache)
+            label = 'Frozen cache:' if frozen else 'Copying cache:'
+            print(f'{label:15}{cached:.3f} s '
+                  f'({uncached / cached:.1f}x faster, {cache.info()})')
+
+
+if __name__ == '__main__':
+    main()
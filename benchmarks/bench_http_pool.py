@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare requests per second of `open_uri` with default `urlopen`
+and with `PooledHTTPOpener` against local HTTP/1.1 server.
+
+Usage: python benchmarks/bench_http_pool.py [REQUESTS] [BODY_BYTES]
+"""
+
+import os
+import sys
+import time
+import threading
+import http.server
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.fs import open_uri  # noqa
+from tcutils.httppool import PooledHTTPOpener  # noqa
+
+
+def make_handler(body: bytes):
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are written separately
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def bench(url: str, requests: int, opener=None) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        with open_uri(url, opener=opener) as response:
+            response.read()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    body_bytes = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), make_handler(b'x' * body_bytes))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/data'
+    try:
+        print(f'{requests} sequential requests, {body_bytes} byte body')
+        plain = bench(url, requests)
+        print(f'urlopen:          {plain:8.0f} req/s')
+        with PooledHTTPOpener() as opener:
+            pooled = bench(url, requests, opener)
+            print(f'PooledHTTPOpener: {pooled:8.0f} req/s '
+                  f'({pooled / plain:.1f}x, '
+                  f'{opener.pool.created} connections opened)')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
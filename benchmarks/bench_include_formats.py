@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare load time of the same include set stored as Yaml, JSON
+and MessagePack.
+
+Usage: python benchmarks/bench_include_formats.py [MEGABYTES] [FRAGMENTS]
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import tempfile
+
+import yaml
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.yamlinclude import DEFAULT_INCLUDE_LOADER, load, \
+    msgpack  # noqa
+
+
+def generate_fragment(fragment: int, entries: int) -> dict:
+    return {
+        f'key_{entry}': {
+            'name': f'service {fragment}-{entry}',
+            'port': 8000 + entry,
+            'enabled': True,
+            'ratio': entry / 7,
+            'tags': ['alpha', 'beta', 'gamma'],
+        }
+        for entry in range(entries)
+    }
+
+
+def write_fragment(path: pathlib.Path, fragment: dict):
+    if path.suffix == '.json':
+        path.write_text(json.dumps(fragment))
+    elif path.suffix == '.msgpack':
+        path.write_bytes(msgpack.packb(fragment))
+    else:
+        path.write_text(yaml.dump(fragment, Dumper=yaml.CSafeDumper
+                                  if yaml.__with_libyaml__
+                                  else yaml.SafeDumper))
+
+
+def generate_tree(
+    root: pathlib.Path,
+    suffix: str,
+    megabytes: float,
+    fragments: int,
+) -> pathlib.Path:
+    """Generate `fragments` includes of about `megabytes` in total
+    (measured as Yaml)."""
+    # Single Yaml entry above is about 110 bytes
+    entries = int(megabytes * 1024 * 1024 / 110 / fragments)
+    lines = []
+    for fragment in range(fragments):
+        fragment_name = f'fragment_{fragment}{suffix}'
+        write_fragment(
+            root / fragment_name, generate_fragment(fragment, entries))
+        lines.append(f'section_{fragment}: !include {fragment_name}')
+    config_path = root / f'config{suffix}.yaml'
+    config_path.write_text('\n'.join(lines) + '\n')
+    return config_path
+
+
+def bench(config_path: pathlib.Path) -> float:
+    start = time.perf_counter()
+    with config_path.open('r') as fp:
+        load(fp, DEFAULT_INCLUDE_LOADER, fragment_cache=None)
+    return time.perf_counter() - start
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    fragments = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    suffixes = ['.yaml', '.json']
+    if msgpack is not None:
+        suffixes.append('.msgpack')
+    print(f'{fragments} fragments, about {megabytes:g} MB as Yaml '
+          f'({DEFAULT_INCLUDE_LOADER.__name__})')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        results = {}
+        for suffix in suffixes:
+            config_path = generate_tree(root, suffix, megabytes, fragments)
+            size = sum(
+                path.stat().st_size for path in root.glob(f'*{suffix}'))
+            results[suffix] = bench(config_path)
+            print(f'{suffix:9} {size / 1024 / 1024:6.1f} MiB '
+                  f'{results[suffix]:8.3f} s '
+                  f'({results[".yaml"] / results[suffix]:.1f}x)')
+    if msgpack is None:
+        print('.msgpack  msgpack package is not available')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare sequential Configuration.load loop with Configuration.load_many.
+
+Usage: python benchmarks/bench_load_many.py [FILES] [ENTRIES] [WORKERS]
+"""
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from marshmallow import fields  # noqa
+from tcutils.config import BaseConfigSchema, Configuration  # noqa
+
+
+class TenantSchema(BaseConfigSchema):
+    name = fields.String()
+    defaults = fields.Dict()
+    services = fields.Dict()
+
+
+def generate_configs(root: pathlib.Path, files: int, entries: int):
+    """Generate `files` tenant configs including shared defaults."""
+    with (root / 'defaults.yaml').open('w') as fp:
+        for entry in range(entries):
+            fp.write(f'default_{entry}: {{timeout: 30, retries: 3}}\n')
+    config_paths = []
+    for number in range(files):
+        config_path = root / f'tenant_{number}.yaml'
+        with config_path.open('w') as fp:
+            fp.write(f'name: tenant-{number}\n')
+            fp.write('defaults: !include defaults.yaml\n')
+            fp.write('services:\n')
+            for entry in range(entries):
+                fp.write(f'  service_{entry}: {{port: {entry}, '
+                         f'tags: [a, b, c]}}\n')
+        config_paths.append(config_path)
+    return config_paths
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_paths = generate_configs(
+            pathlib.Path(temp_dir), files, entries)
+
+        # Neither run uses process-wide fragment cache (it is opt-in),
+        # so both parse every file
+        start = time.perf_counter()
+        for config_path in config_paths:
+            Configuration.load(config_path, TenantSchema)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = list(Configuration.load_many(
+            config_paths, TenantSchema, max_workers=workers))
+        parallel = time.perf_counter() - start
+        assert all(result.error is None for result in results)
+
+    print(f'{files} files, {entries} entries each, {workers} workers')
+    print(f'Sequential load: {sequential:.2f} s '
+          f'({files / sequential:.1f} files/s)')
+    print(f'load_many:       {parallel:.2f} s '
+          f'({files / parallel:.1f} files/s, '
+          f'{sequential / parallel:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
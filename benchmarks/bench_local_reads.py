@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare reading large local file through default `open_uri` stream
+with `iter_uri_chunks` over raw and memory mapped file. Every chunk
+is checksummed, so all its bytes are touched.
+
+Usage: python benchmarks/bench_local_reads.py [MEGABYTES] [CHUNK_KB]
+"""
+
+import os
+import sys
+import time
+import zlib
+import tempfile
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.fs import open_uri, iter_uri_chunks  # noqa
+
+
+def read_stream(path: str, chunk_size: int) -> int:
+    total = checksum = 0
+    with open_uri(path) as fp:
+        while True:
+            data = fp.read(chunk_size)
+            if not data:
+                return total
+            checksum = zlib.crc32(data, checksum)
+            total += len(data)
+
+
+def read_chunks(path: str, chunk_size: int, local_mode: str) -> int:
+    total = checksum = 0
+    for chunk in iter_uri_chunks(
+            path, chunk_size=chunk_size, local_mode=local_mode):
+        checksum = zlib.crc32(chunk, checksum)
+        total += len(chunk)
+    return total
+
+
+def bench(name: str, function, *args):
+    function(*args)
+    start = time.perf_counter()
+    total = function(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<28} {elapsed:.3f} s ({total / elapsed / 2 ** 20:.0f} MiB/s)')
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    chunk_size = (int(sys.argv[2]) if len(sys.argv) > 2 else 1024) * 1024
+    with tempfile.NamedTemporaryFile(suffix='.bin') as fp:
+        block = os.urandom(1024 * 1024)
+        for _ in range(megabytes):
+            fp.write(block)
+        fp.flush()
+        print(f'{megabytes} MiB file, {chunk_size // 1024} KiB chunks '
+              f'(page cache warm)')
+        bench('open_uri read()', read_stream, fp.name, chunk_size)
+        bench('iter_uri_chunks raw', read_chunks, fp.name, chunk_size, 'raw')
+        bench('iter_uri_chunks mmap', read_chunks, fp.name, chunk_size, 'mmap')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare sequential `open_uri` loop with `open_uris` and
+`open_uris_async` against local server with simulated latency.
+
+Usage: python benchmarks/bench_open_uris.py [URIS] [LATENCY_MS] [CONCURRENCY]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import http.server
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.fs import open_uri, open_uris, open_uris_async  # noqa
+
+
+def make_handler(latency: float):
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = self.path.encode('ascii')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def sequential(uris):
+    for uri in uris:
+        with open_uri(uri) as response:
+            response.read()
+
+
+def threaded(uris, concurrency: int):
+    for result in open_uris(uris, max_concurrency=concurrency):
+        assert result.error is None
+
+
+def asynchronous(uris, concurrency: int):
+    async def fetch_all():
+        async for result in open_uris_async(
+                uris, max_concurrency=concurrency):
+            assert result.error is None
+
+    asyncio.run(fetch_all())
+
+
+def bench(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), make_handler(latency))
+    server.daemon_threads = True
+    server.request_queue_size = 128
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    uris = [f'{base_url}/{number}' for number in range(count)]
+    try:
+        print(f'{count} URIs, {latency * 1000:.0f} ms latency, '
+              f'concurrency {concurrency}')
+        loop_time = bench(sequential, uris)
+        print(f'open_uri loop:   {loop_time:.3f} s')
+        for name, function in (('open_uris:', threaded),
+                               ('open_uris_async:', asynchronous)):
+            elapsed = bench(function, uris, concurrency)
+            print(f'{name:16} {elapsed:.3f} s '
+                  f'({loop_time / elapsed:.1f}x)')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
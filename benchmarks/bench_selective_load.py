@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare full load and selective load of one top level section.
+
+Usage: python benchmarks/bench_selective_load.py [SECTIONS] [ENTRIES]
+"""
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.yamlinclude import DEFAULT_INCLUDE_LOADER, \
+    DEFAULT_SELECTIVE_LOADER, load, load_selected  # noqa
+from bench_yamlinclude import generate_tree  # noqa
+
+
+def generate_single_file(
+    root: pathlib.Path,
+    sections: int,
+    entries: int,
+) -> pathlib.Path:
+    config_path = root / 'single.yaml'
+    with config_path.open('w') as fp:
+        for section in range(sections):
+            fp.write(f'section_{section}:\n')
+            for entry in range(entries):
+                fp.write(
+                    f'  key_{entry}:\n'
+                    f'    name: "service {section}-{entry}"\n'
+                    f'    port: {8000 + entry}\n'
+                    f'    tags: [alpha, beta, gamma]\n')
+    return config_path
+
+
+def bench(function, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        trees = [
+            ('single file', generate_single_file(root, sections, entries)),
+            ('includes', generate_tree(root, sections, entries)),
+        ]
+        print(f'{sections} sections x {entries} entries, selecting one '
+              f'({DEFAULT_INCLUDE_LOADER.__name__}, '
+              f'{DEFAULT_SELECTIVE_LOADER.__name__})')
+        for name, config_path in trees:
+            with config_path.open('r') as fp:
+                full = bench(load, fp, fragment_cache=None)
+            with config_path.open('r') as fp:
+                selected = bench(
+                    load_selected, fp, ['section_0'], fragment_cache=None)
+            print(f'{name:12} full {full:7.3f} s, selected {selected:7.3f} s '
+                  f'({full / selected:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
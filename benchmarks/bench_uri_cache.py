@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare repeated downloads of large file with `open_uri` and with
+`URICache` revalidating it by ETag.
+
+Usage: python benchmarks/bench_uri_cache.py [MEGABYTES] [REPEAT]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import http.server
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.fs import open_uri  # noqa
+from tcutils.uricache import URICache  # noqa
+
+
+def make_handler(body: bytes):
+    etag = '"bench"'
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def bench(url: str, repeat: int, cache=None) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with open_uri(url, cache=cache) as fp:
+            while fp.read(1024 * 1024):
+                pass
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), make_handler(os.urandom(megabytes * 1024 * 1024)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/data'
+    try:
+        print(f'{megabytes} MiB body, {repeat} reads')
+        plain = bench(url, repeat)
+        print(f'open_uri:         {plain:.3f} s per read')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = URICache(cache_dir)
+            first = bench(url, 1, cache)
+            print(f'URICache (miss):  {first:.3f} s')
+            cached = bench(url, repeat, cache)
+            print(f'URICache (hit):   {cached:.3f} s per read '
+                  f'({plain / cached:.1f}x)')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Measure read throughput of VersionedConfiguration under concurrent
+readers and a writer, compared with a lock protected Configuration.
+
+Usage: python benchmarks/bench_versioned_reads.py [SECONDS]
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.config import Configuration, VersionedConfiguration, \
+    build_key_index  # noqa
+
+CONFIG = {
+    'database': {'host': 'localhost', 'port': 5432},
+    'services': {f'service_{n}': {'port': n} for n in range(100)},
+}
+
+
+def run(threads: int, duration: float, read, write) -> float:
+    """Run `threads` readers and one writer, return total reads/s."""
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def reader(number):
+        count = 0
+        while not stop.is_set():
+            for _ in range(100):
+                read()
+            count += 100
+        counts[number] = count
+
+    def writer():
+        port = 0
+        while not stop.wait(0.001):
+            port += 1
+            write(port)
+
+    workers = [threading.Thread(target=reader, args=(number,))
+               for number in range(threads)]
+    workers.append(threading.Thread(target=writer))
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / duration
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+
+    versioned = VersionedConfiguration(CONFIG, compiled=True)
+
+    def versioned_read():
+        return versioned.current().database.port
+
+    def versioned_write(port):
+        versioned.update({'database.port': port})
+
+    locked = Configuration({
+        'database': dict(CONFIG['database']),
+        'services': CONFIG['services']}, compiled=True)
+    lock = threading.Lock()
+
+    def locked_read():
+        with lock:
+            return locked.database.port
+
+    def locked_write(port):
+        with lock:
+            locked.config['database']['port'] = port
+            build_key_index(locked)
+
+    print(f'{"threads":>7} {"versioned reads/s":>18} {"locked reads/s":>15}')
+    for threads in (1, 2, 4, 8):
+        versioned_rate = run(threads, duration, versioned_read,
+                             versioned_write)
+        locked_rate = run(threads, duration, locked_read, locked_write)
+        print(f'{threads:>7} {versioned_rate:>18,.0f} {locked_rate:>15,.0f}')
+
+
+if __name__ == '__main__':
+    main()
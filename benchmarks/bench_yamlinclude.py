@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compare pure Python and libyaml based include loaders.
+
+Usage: python benchmarks/bench_yamlinclude.py [FRAGMENTS] [ENTRIES]
+"""
+
+import os
+import sys
+import time
+import pathlib
+import tempfile
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+
+from tcutils.yamlinclude import IncludeLoader, CIncludeLoader, load  # noqa
+
+
+def generate_tree(root: pathlib.Path, fragments: int, entries: int):
+    """Generate root config that includes `fragments` files."""
+    lines = []
+    for fragment in range(fragments):
+        fragment_name = f'fragment_{fragment}.yaml'
+        with (root / fragment_name).open('w') as fp:
+            for entry in range(entries):
+                fp.write(
+                    f'key_{entry}:\n'
+                    f'  name: "service {fragment}-{entry}"\n'
+                    f'  port: {8000 + entry}\n'
+                    f'  enabled: true\n'
+                    f'  tags: [alpha, beta, gamma]\n')
+        lines.append(f'section_{fragment}: !include {fragment_name}')
+    config_path = root / 'config.yaml'
+    config_path.write_text('\n'.join(lines) + '\n')
+    return config_path
+
+
+def tree_size(root: pathlib.Path) -> int:
+    return sum(path.stat().st_size for path in root.iterdir())
+
+
+def bench(loader_class, config_path: pathlib.Path, repeat: int = 1) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with config_path.open('r') as fp:
+            # Every run must parse all fragments
+            load(fp, loader_class, fragment_cache=None)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    fragments = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        config_path = generate_tree(root, fragments, entries)
+        size = tree_size(root) / 1024 / 1024
+        print(f'Config tree: {fragments} fragments, {size:.1f} MiB')
+        python_time = bench(IncludeLoader, config_path)
+        print(f'IncludeLoader:  {python_time:.3f} s')
+        if CIncludeLoader is None:
+            print('CIncludeLoader: libyaml is not available')
+            return
+        c_time = bench(CIncludeLoader, config_path)
+        print(f'CIncludeLoader: {c_time:.3f} s '
+              f'({python_time / c_time:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -48,5 +48,8 @@ setup(
     # }
     python_requires='>=3.6',
     install_requires=install_requires,
+    extras_require={
+        'msgpack': ['msgpack'],
+    },
     # dependency_links=dependencies,
 )
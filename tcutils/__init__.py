@@ -8,10 +8,15 @@
 
 import tcutils.adapters
 import tcutils.config
+import tcutils.configcache
+import tcutils.configreload
+import tcutils.configsnapshot
 import tcutils.const
 import tcutils.fs
 import tcutils.funcutils
+import tcutils.httppool
 import tcutils.paths
 import tcutils.types
+import tcutils.uricache
 import tcutils.user
 import tcutils.yamlinclude
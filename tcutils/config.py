@@ -9,21 +9,138 @@
 # Cannot be used with Python3.6
 #from __future__ import annotations
 
+import os
 import yaml
 import logging
+import json
+import time
+import types
 import typing
+import threading
+import contextlib
+import collections
+import collections.abc
+import concurrent.futures
+from dataclasses import dataclass
 
-from marshmallow import Schema
+from marshmallow import Schema, RAISE, EXCLUDE, missing
 from marshmallow.exceptions import ValidationError
 
 from tcutils.types import UniversalPath
 from tcutils.paths import check_path
 from tcutils.funcutils import class_prefixed_methods
-from tcutils.yamlinclude import IncludeLoader
+from tcutils.yamlinclude import DEFAULT_INCLUDE_LOADER, \
+    DEFAULT_SELECTIVE_LOADER, FragmentCache, LazyInclude, load_all, \
+    freeze_config
+from tcutils.configcache import ConfigurationCache
+from tcutils.schema import schema_config_class
 
 log = logging.getLogger(__file__)
 
 
+def load_config_file(
+    config_path: UniversalPath,
+    loader_class: typing.Optional[typing.Type[typing.Any]] = None,
+    **loader_kwargs: typing.Any,
+) -> typing.Tuple[typing.Any, typing.Any]:
+    """Parse configuration file and return tuple of used include loader
+    and parsed document.
+
+    `loader_kwargs` (e.g. `fragment_cache` or `include_workers`) are passed
+    to include loader.
+    """
+    if loader_class is None:
+        loader_class = DEFAULT_INCLUDE_LOADER
+    with open(config_path, 'r') as fp:
+        loader = loader_class(fp, **loader_kwargs)
+        try:
+            config_dict = loader.get_single_data()
+        except FileNotFoundError as e:
+            log.error(f'Configuration !include error: {e}')
+            raise e
+        finally:
+            loader.dispose()
+    return loader, config_dict
+
+
+def validate_config(
+    config_dict: typing.Dict[str, typing.Any],
+    schema_class: typing.Type[Schema],
+    *schema_args: typing.Iterable[typing.Any],
+    profile: typing.Optional['ConfigurationLoadProfile'] = None,
+    **schema_kwargs: typing.Mapping[typing.Any, typing.Any],
+) -> typing.Dict[str, typing.Any]:
+    """Validate parsed configuration against schema and return its dump.
+
+    If `profile` is given, `schema_load` and `schema_dump` phases are timed.
+    """
+    schema = schema_class(*schema_args, **schema_kwargs)
+    try:
+        if profile is None:
+            return schema.dump(schema.load(dict(config_dict)))
+        with profile.phase('schema_load'):
+            loaded = schema.load(dict(config_dict))
+        with profile.phase('schema_dump'):
+            return schema.dump(loaded)
+    except ValidationError as e:
+        log.error(f'Configuration file error: "{e.args}"')
+        raise e
+
+
+def configuration_diff(
+    old: typing.Dict[str, typing.Any],
+    new: typing.Dict[str, typing.Any],
+    prefix: typing.Tuple[str, ...] = (),
+) -> typing.List[typing.Tuple[str, ...]]:
+    """Return list of key paths that were added, removed or changed
+    between `old` and `new` configuration dictionaries.
+    """
+    changed = []
+    for key in list(old) + [key for key in new if key not in old]:
+        if key not in old or key not in new:
+            changed.append(prefix + (key,))
+            continue
+        old_value, new_value = old[key], new[key]
+        if old_value is new_value:
+            continue
+        if type(old_value) is dict and type(new_value) is dict:
+            changed.extend(
+                configuration_diff(old_value, new_value, prefix + (key,)))
+        elif old_value != new_value:
+            changed.append(prefix + (key,))
+    return changed
+
+
+# Include cache shared by all files loaded in `load_many` worker process
+_worker_include_cache = None
+
+
+def _init_load_many_worker():
+    global _worker_include_cache
+    _worker_include_cache = {}
+
+
+def _load_many_worker(
+    config_path: UniversalPath,
+    schema_class: typing.Type[Schema],
+    schema_args: typing.Iterable[typing.Any],
+    schema_kwargs: typing.Mapping[str, typing.Any],
+) -> typing.Dict[str, typing.Any]:
+    """Parse and validate configuration file in worker process."""
+    loader, config_dict = load_config_file(
+        check_path(config_path), include_cache=_worker_include_cache)
+    return validate_config(
+        config_dict, schema_class, *schema_args, **schema_kwargs)
+
+
+@dataclass
+class ConfigurationLoadResult:
+    """Result of loading single file with `Configuration.load_many`."""
+    path: UniversalPath
+    configuration: typing.Optional['Configuration'] = None
+    error: typing.Optional[BaseException] = None
+
+
 class BaseConfigSchema(Schema):
     """Placeholder base configuration schema.
 
@@ -32,11 +149,370 @@ class BaseConfigSchema(Schema):
     pass
 
 
+def _is_mapping(value: typing.Any) -> bool:
+    return type(value) is dict or \
+        isinstance(value, collections.abc.Mapping)
+
+
+def _resolve_key(
+    container: typing.Dict[str, typing.Any],
+    key: str,
+    reserved: typing.AbstractSet[str],
+    nested_reserved: typing.AbstractSet[str],
+) -> typing.Tuple[typing.Any, bool]:
+    """Resolve dotted `key` in `container` the same way attribute access
+    does, without wrapping intermediate dictionaries.
+
+    Return tuple of value and flag that is `True` if the last step matched
+    literal dotted key (e.g. `'a.b'`). Raise `KeyError` when `key` cannot
+    be resolved through mappings.
+    """
+    node = container
+    while True:
+        if not _is_mapping(node):
+            raise KeyError(key)
+        head, sep, suffix = key.partition('.')
+        if head in reserved:
+            raise KeyError(key)
+        if not sep:
+            if key not in node:
+                raise KeyError(key)
+            return node[key], False
+        if head in node:
+            node = node[head]
+            key = suffix
+            reserved = nested_reserved
+            continue
+        if key in node:
+            return node[key], True
+        raise KeyError(key)
+
+
+def _build_key_index(
+    container: typing.Dict[str, typing.Any],
+    reserved: typing.AbstractSet[str],
+    nested_reserved: typing.AbstractSet[str],
+    index: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    keys: typing.Optional[typing.Iterable[str]] = None,
+) -> typing.Dict[str, typing.Tuple[typing.Any, typing.Any, str]]:
+    """Build flattened index of all dotted keys in `container`.
+
+    Every entry maps dotted key to tuple of value, key index and key prefix
+    that should be used for wrapping value if it's a dictionary.
+    Literal dotted keys that shadow nested keys resolve exactly like
+    in `ConfigurationAttribute.__getattr__`.
+
+    If `index` and top level `keys` are given, only entries below these
+    keys are added to existing `index`.
+    """
+    if index is None:
+        index = {}
+    if keys is None:
+        stack = [('', container)]
+    else:
+        stack = [('', {key: container[key] for key in keys})]
+    while stack:
+        prefix, node = stack.pop()
+        for key, value in node.items():
+            if type(key) is not str:
+                continue
+            name = f'{prefix}.{key}' if prefix else key
+            if _is_mapping(value):
+                stack.append((name, value))
+            if name in index:
+                continue
+            try:
+                resolved, literal = _resolve_key(
+                    container, name, reserved, nested_reserved)
+            except KeyError:
+                continue
+            if not _is_mapping(resolved):
+                index[name] = (resolved, None, '')
+            elif literal:
+                index[name] = (resolved, _build_key_index(
+                    resolved, nested_reserved, nested_reserved), '')
+            else:
+                index[name] = (resolved, index, name)
+    return index
+
+
+def _key_names(value: typing.Any, prefix: str) -> typing.Iterator[str]:
+    """Iterate over dotted keys of all nodes in `value` below `prefix`."""
+    stack = [(prefix, value)]
+    while stack:
+        prefix, node = stack.pop()
+        for key, child in node.items():
+            if type(key) is not str:
+                continue
+            name = f'{prefix}.{key}'
+            yield name
+            if _is_mapping(child):
+                stack.append((name, child))
+
+
+def _cached_wrapper(
+    children: typing.Dict[typing.Any, 'ConfigurationAttribute'],
+    name: typing.Any,
+    value: typing.Dict[str, typing.Any],
+    key_index: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    key_prefix: str = '',
+) -> 'ConfigurationAttribute':
+    """Return wrapper of `value` memoized in `children` under `name`.
+
+    Memoized wrapper is reused only if it still wraps the same dictionary
+    with the same key index.
+    """
+    child = children.get(name)
+    if child is not None and child.value is value and \
+            child._key_index is key_index and child._key_prefix == key_prefix:
+        return child
+    child = ConfigurationAttribute(value, key_index, key_prefix)
+    children[name] = child
+    return child
+
+
+def _wrap_index_entry(
+    children: typing.Dict[typing.Any, 'ConfigurationAttribute'],
+    name: str,
+    entry: typing.Tuple[typing.Any, typing.Any, str]
+) -> typing.Any:
+    """Return value from key index entry, wrapping dictionaries."""
+    value, key_index, key_prefix = entry
+    if key_index is None:
+        if type(value) is LazyInclude:
+            return _wrap_child(children, None, '', name, value)
+        return value
+    return _cached_wrapper(children, name, value, key_index, key_prefix)
+
+
+def _wrap_child(
+    children: typing.Dict[typing.Any, 'ConfigurationAttribute'],
+    key_index: typing.Optional[typing.Dict[str, typing.Any]],
+    key_prefix: str,
+    key: typing.Any,
+    value: typing.Any,
+) -> typing.Any:
+    """Return direct child `value` under `key`, wrapping dictionaries
+    and other mappings. Lazy includes are resolved."""
+    if type(value) is LazyInclude:
+        value = value.resolve()
+    if not _is_mapping(value):
+        return value
+    if key_index is not None and type(key) is str:
+        entry = key_index.get(f'{key_prefix}.{key}' if key_prefix else key)
+        if entry is not None and entry[0] is value:
+            return _wrap_index_entry(children, key, entry)
+    return _cached_wrapper(children, key, value)
+
+
+def _walk_items(
+    items: typing.Iterable[typing.Tuple[typing.Any, typing.Any]],
+    prefix: str,
+) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    for key, value in items:
+        path = f'{prefix}.{key}' if prefix else str(key)
+        yield path, value
+        if isinstance(value, ConfigurationAttribute):
+            yield from _walk_items(iter_items(value), path)
+
+
+# Attribute names of configuration classes (see `_has_attribute`)
+_CLASS_ATTRIBUTES = {}
+
+
+def _has_attribute(instance: typing.Any, name: str) -> bool:
+    """Return `True` if `name` is in `dir(instance)`, without building
+    sorted list of all its attributes."""
+    if name in instance.__dict__:
+        return True
+    instance_class = type(instance)
+    names = _CLASS_ATTRIBUTES.get(instance_class)
+    if names is None:
+        names = _CLASS_ATTRIBUTES[instance_class] = frozenset(
+            dir(instance_class))
+    return name in names
+
+
+def _lookup_suffix(value: typing.Any, attr_suffix: str) -> typing.Any:
+    """Look up remaining part of dotted key without recording access."""
+    if isinstance(value, ConfigurationAttribute):
+        return value._lookup(attr_suffix)
+    return getattr(value, attr_suffix)
+
+
+def _leaf_paths(
+    tree: typing.Any,
+    prefix: str = '',
+) -> typing.Iterator[str]:
+    for key, value in tree.items():
+        path = f'{prefix}.{key}' if prefix else str(key)
+        if isinstance(value, collections.abc.Mapping) and value:
+            yield from _leaf_paths(value, path)
+        else:
+            yield path
+
+
+class ConfigurationAccessStats:
+    """Counters of configuration key accesses.
+
+    Every access through `Configuration` or `ConfigurationAttribute`
+    increments counter of its full dotted key and first access time
+    is remembered. Counting is not synchronized, so under heavy
+    concurrent access counts are approximate.
+    """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.first_access = {}
+        # Keys whose value was returned unwrapped, so accesses below them
+        # can't be seen
+        self._opaque_keys = set()
+
+    def attach(self, prefix: str, name: typing.Any, value: typing.Any) -> str:
+        """Make wrapped `value` report to these statistics."""
+        key = f'{prefix}.{name}' if prefix else str(name)
+        if isinstance(value, ConfigurationAttribute):
+            if value._stats is not self or value._path != key:
+                value._stats = self
+                value._path = key
+            if type(value) is ConfigurationAttribute:
+                value.__class__ = _InstrumentedConfigurationAttribute
+        return key
+
+    def record(self, prefix: str, name: typing.Any, value: typing.Any):
+        """Record access of key `name` below `prefix`."""
+        key = self.attach(prefix, name, value)
+        self.counts[key] += 1
+        if key not in self.first_access:
+            self.first_access[key] = time.time()
+            if not isinstance(value, ConfigurationAttribute):
+                self._opaque_keys.add(key)
+
+    def hottest(self, count: int = 10) -> typing.List[typing.Tuple[str, int]]:
+        """Return `count` most accessed keys with their access counts."""
+        return self.counts.most_common(count)
+
+    def unused_keys(self, config: typing.Any) -> typing.List[str]:
+        """Return dotted keys of leaf values in `config` (dictionary
+        or `Configuration`) that were never read."""
+        if isinstance(config, Configuration):
+            config = config.config
+        opaque_keys = self._opaque_keys
+        unused = []
+        for path in _leaf_paths(config):
+            prefix = path
+            while prefix not in opaque_keys:
+                prefix, sep, _ = prefix.rpartition('.')
+                if not sep:
+                    unused.append(path)
+                    break
+        return unused
+
+    def report(
+        self,
+        config: typing.Any,
+        count: int = 10,
+    ) -> typing.Dict[str, typing.Any]:
+        """Return report with hottest and unused keys."""
+        return {
+            'accessed': len(self.counts),
+            'hottest': self.hottest(count),
+            'unused': self.unused_keys(config),
+            'first_access': dict(self.first_access),
+        }
+
+    def dump(self, config: typing.Any, fp: typing.TextIO, count: int = 10):
+        """Write report (see `report()`) as JSON to `fp`."""
+        json.dump(self.report(config, count), fp, indent=2)
+
+
+class ConfigurationLoadProfile:
+    """Timings of configuration load in seconds.
+
+    `phases` holds time of every load phase that was run, in order:
+    `check_path`, `cache_get`, `parse` (Yaml parsing including includes),
+    `schema_load`, `schema_dump`, `parse_hooks`, `build_key_index`
+    and `cache_set`. `includes` holds time of every included file
+    (resolved path, including files it includes) and `hooks` time of every
+    `_parse_<section>` method.
+    """
+
+    def __init__(self, config_path: typing.Optional[UniversalPath] = None):
+        self.config_path = None if config_path is None else str(config_path)
+        self.phases = {}
+        self.includes = {}
+        self.hooks = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Add time spent in context to phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + \
+                time.perf_counter() - start
+
+    @property
+    def total(self) -> float:
+        """Time of all phases."""
+        return sum(self.phases.values())
+
+    def report(self) -> typing.Dict[str, typing.Any]:
+        """Return report with includes and hooks sorted from slowest."""
+        return {
+            'path': self.config_path,
+            'total': self.total,
+            'phases': dict(self.phases),
+            'includes': sorted(
+                self.includes.items(), key=lambda item: -item[1]),
+            'hooks': sorted(self.hooks.items(), key=lambda item: -item[1]),
+        }
+
+    def log(self, level: int = logging.DEBUG):
+        """Log summary of profile. Full report is attached to log record
+        as `configuration_profile` attribute."""
+        phases = ', '.join(
+            f'{name} {elapsed * 1000:.1f} ms'
+            for name, elapsed in self.phases.items())
+        log.log(
+            level,
+            f'Configuration "{self.config_path}" loaded in '
+            f'{self.total * 1000:.1f} ms ({phases})',
+            extra={'configuration_profile': self.report()},
+        )
+
+
+def _profile_phase(
+    load_profile: typing.Optional[ConfigurationLoadProfile],
+    name: str,
+) -> typing.ContextManager[None]:
+    if load_profile is None:
+        return contextlib.nullcontext()
+    return load_profile.phase(name)
+
+
 class ConfigurationAttribute:
-    """Configuration attribute for easy access."""
+    """Configuration attribute for easy access.
+
+    Wrappers of nested dictionaries are memoized, so repeated access
+    returns the same object. Positional access (`attribute[0]`) uses
+    ordered key array built on first use.
+    """
 
-    def __init__(self, value: typing.Any):
+    def __init__(
+        self,
+        value: typing.Any,
+        key_index: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        key_prefix: str = '',
+    ):
         self.value = value
+        self._key_index = key_index
+        self._key_prefix = key_prefix
+        self._children = {}
+        self._ordered_keys = None
+        self._stats = None
+        self._path = ''
 
     def __str__(self) -> str:
         return str(self.value)
@@ -50,48 +526,172 @@ class ConfigurationAttribute:
     def keys(self):
         return dict(self.value).keys()
 
-    def __getattr__(self, attr_name: str) -> typing.Any:
+    def _key_at(self, position: int) -> typing.Any:
+        ordered_keys = self._ordered_keys
+        value = self.value
+        if ordered_keys is not None and len(ordered_keys) == len(value):
+            key = ordered_keys[position]
+            # Keys replaced without changing their count
+            if key in value:
+                return key
+        ordered_keys = self._ordered_keys = tuple(value)
+        return ordered_keys[position]
+
+    def _lookup(self, attr_name: str) -> typing.Any:
+        key_index = self.__dict__.get('_key_index')
+        if key_index is not None and type(attr_name) is str:
+            key_prefix = self.__dict__['_key_prefix']
+            entry = key_index.get(
+                f'{key_prefix}.{attr_name}' if key_prefix else attr_name)
+            if entry is not None:
+                return _wrap_index_entry(self._children, attr_name, entry)
         attr_suffix = None
         if type(attr_name) == int:
             try:
-                value = object.__getattribute__(self, 'value')
-            except:
+                attr_name = self._key_at(attr_name)
+            except (AttributeError, TypeError):
                 raise IndexError(f'{self} value is not iterable.')
-            attr_name = list(value.items())[attr_name][0]
         if attr_name.find('.') > -1:
             attr_name, attr_suffix = attr_name.split('.', 1)
-        if attr_name not in dir(self):
+        if not _has_attribute(self, attr_name):
             if attr_name not in object.__getattribute__(self, 'value'):
                 long_attr_name = f'{attr_name}.{attr_suffix}'
-                if long_attr_name not in dir(self):
+                if not _has_attribute(self, long_attr_name):
                     if long_attr_name not in object.__getattribute__(self, 'value'):
                         raise AttributeError(f'No such attribute: {attr_name}')
                 attr_name = long_attr_name
                 attr_suffix = None
-            attr_value = getattr(self, 'value').get(attr_name)
-            if type(attr_value) is dict:
-                attr_value = ConfigurationAttribute(attr_value)
+            attr_value = _wrap_child(
+                self._children, self._key_index, self._key_prefix,
+                attr_name, getattr(self, 'value').get(attr_name))
         else:
             attr_value = super().__getattribute__(attr_name)
         if attr_suffix:
-            attr_value = getattr(attr_value, attr_suffix)
+            attr_value = _lookup_suffix(attr_value, attr_suffix)
         return attr_value
 
+    # Accesses are counted only by instrumented wrappers
+    # (see `ConfigurationAccessStats`)
+    __getattr__ = _lookup
+
     def __getitem__(self, item_name: str) -> typing.Any:
         return self.__getattr__(item_name)
 
 
+class _InstrumentedConfigurationAttribute(ConfigurationAttribute):
+    """Wrapper reporting accesses to its `ConfigurationAccessStats`."""
+
+    def __getattr__(self, attr_name: str) -> typing.Any:
+        value = self._lookup(attr_name)
+        if type(attr_name) is int:
+            attr_name = self._key_at(attr_name)
+        self._stats.record(self._path, attr_name, value)
+        return value
+
+
 class Configuration:
-    """Configuration class."""
+    """Configuration class.
+
+    If `compiled` is `True`, flattened index of dotted keys is built once
+    after parsing, so `config.a.b.c` and `getattr(config, 'a.b.c')` are
+    resolved with a single dictionary lookup. Item access
+    (`config['a']`) returns raw top level value in both modes. Call
+    `build_key_index(configuration)` again after modifying `config`
+    directly.
+
+    If `lazy_schema` instance is given, `config_dict` is treated as
+    unvalidated document. Only unknown and missing required top level
+    keys are checked up front; every top level section is validated
+    by its schema field on first access (see `validate_section`).
+    Schema level hooks and validators are run only by `validate_all`.
+
+    Helpers working with configuration (`iter_items`, `walk_items`,
+    `instrument`, `evolve`, `build_key_index`, ...) are module level
+    functions, so that configuration keys of the same names stay
+    reachable as attributes.
+
+    Values included with `!include_lazy` are parsed when they are first
+    accessed (declare them as `fields.Raw` in schema).
+    """
 
     def __init__(
         self,
         config_dict: typing.Dict[str, typing.Any],
-        schema: BaseConfigSchema = BaseConfigSchema
+        schema: BaseConfigSchema = BaseConfigSchema,
+        compiled: bool = False,
+        lazy_schema: typing.Optional[Schema] = None,
+        load_profile: typing.Optional[ConfigurationLoadProfile] = None,
     ):
         self.config = config_dict
         self.schema = schema
-        self._parse()
+        self._load_profile = load_profile
+        self._key_index = None
+        self._reserved_keys = None
+        self._children = {}
+        self._stats = None
+        self._lazy_schema = None
+        self._pending_sections = set()
+        if lazy_schema is not None:
+            self._init_lazy(lazy_schema)
+        if load_profile is None:
+            self._parse()
+            if compiled:
+                build_key_index(self)
+            return
+        with load_profile.phase('parse_hooks'):
+            self._parse()
+        if compiled:
+            with load_profile.phase('build_key_index'):
+                build_key_index(self)
+
+    def _init_lazy(self, lazy_schema: Schema):
+        """Check top level keys of unvalidated document and mark sections
+        for validation on first access.
+        """
+        self._lazy_schema = lazy_schema
+        self._lazy_document = self.config
+        self._lazy_fields = {
+            field.data_key or name: (name, field)
+            for name, field in lazy_schema.load_fields.items()
+        }
+        self.config = {}
+        errors = {}
+        for key, value in self._lazy_document.items():
+            if key in self._lazy_fields:
+                self.config[key] = value
+                self._pending_sections.add(key)
+            elif lazy_schema.unknown == RAISE:
+                errors[key] = ['Unknown field.']
+            elif lazy_schema.unknown != EXCLUDE:
+                self.config[key] = value
+        partial = lazy_schema.partial
+        for key, (name, field) in self._lazy_fields.items():
+            if key in self.config:
+                continue
+            if field.required and not (
+                    partial is True or (partial and name in partial)):
+                errors[key] = [field.error_messages['required']]
+                continue
+            default = getattr(field, 'load_default', missing)
+            if default is not missing:
+                if callable(default):
+                    default = default()
+                self.config[key] = field.serialize(
+                    field.attribute or name, {field.attribute or name: default})
+        if errors:
+            e = ValidationError(errors)
+            log.error(f'Configuration file error: "{e.args}"')
+            raise e
+
+    def _validate_pending(self, key: str):
+        """Validate pending top level section that `key` refers to."""
+        pending = self._pending_sections
+        if key in pending:
+            validate_section(self, key)
+        if '.' in key:
+            for section in list(pending):
+                if key.startswith(f'{section}.'):
+                    validate_section(self, section)
 
     def __str__(self) -> str:
         return f'Configuration({self.config})'
@@ -102,10 +702,24 @@ class Configuration:
     def keys(self):
         return dict(self.config).keys()
 
-    def __getitem__(self, k: str) -> typing.Any:
-        return self.config.get(k)
+    def _getitem(self, k: str) -> typing.Any:
+        # Item access returns raw values of top level keys regardless
+        # of `compiled`; key index is used only by attribute access
+        if self._pending_sections:
+            self._validate_pending(k)
+        value = self.config.get(k)
+        if type(value) is LazyInclude:
+            return value.resolve()
+        return value
 
-    def __getattr__(self, attr_name: str) -> typing.Any:
+    def _lookup(self, attr_name: str) -> typing.Any:
+        if self.__dict__.get('_pending_sections') and type(attr_name) is str:
+            self._validate_pending(attr_name)
+        key_index = self.__dict__.get('_key_index')
+        if key_index is not None and type(attr_name) is str:
+            entry = key_index.get(attr_name)
+            if entry is not None:
+                return _wrap_index_entry(self._children, attr_name, entry)
         attr_suffix = None
         if type(attr_name) == int:
             try:
@@ -115,55 +729,885 @@ class Configuration:
             attr_name = list(value.items())[attr_name][0]
         if attr_name.find('.') > -1:
             attr_name, attr_suffix = attr_name.split('.', 1)
-        if attr_name not in dir(self):
+        if not _has_attribute(self, attr_name):
             if attr_name not in object.__getattribute__(self, 'config'):
                 long_attr_name = f'{attr_name}.{attr_suffix}'
-                if long_attr_name not in dir(self):
+                if not _has_attribute(self, long_attr_name):
                     if long_attr_name not in object.__getattribute__(self, 'config'):
                         raise AttributeError(f'No such attribute: {attr_name}')
                 attr_name = long_attr_name
                 attr_suffix = None
-            attr_value = getattr(self, 'config').get(attr_name)
-            if type(attr_value) is dict:
-                attr_value = ConfigurationAttribute(attr_value)
+            attr_value = _wrap_child(
+                self._children, self._key_index, '',
+                attr_name, getattr(self, 'config').get(attr_name))
         else:
             attr_value = super().__getattribute__(attr_name)
         if attr_suffix:
-            attr_value = getattr(attr_value, attr_suffix)
+            attr_value = _lookup_suffix(attr_value, attr_suffix)
         return attr_value
 
+    # Accesses are counted only by instrumented configuration
+    # (see `instrument`)
+    __getitem__ = _getitem
+    __getattr__ = _lookup
+
+    def _update_key_index(self, key: str, old_value: typing.Any):
+        """Replace key index entries of top level `key`, whose value
+        was `old_value`."""
+        head = key
+        while '.' in head:
+            head = head.rpartition('.')[0]
+            if head in self.config:
+                # Literal dotted key is shadowed by other section
+                build_key_index(self)
+                return
+        index = self._key_index
+        index.pop(key, None)
+        if _is_mapping(old_value):
+            for name in _key_names(old_value, key):
+                index.pop(name, None)
+        _build_key_index(
+            self.config, *self._reserved_keys, index=index, keys=[key])
+
     @classmethod
     def load(
         cls: typing.Type[typing.Any],
         config_path: UniversalPath,
         schema_class: typing.Optional[BaseConfigSchema] = None,
         *schema_args: typing.Iterable[typing.Any],
+        compiled: bool = False,
+        cache: typing.Union[None, UniversalPath, ConfigurationCache] = None,
+        lazy: bool = False,
+        select: typing.Optional[typing.Iterable[str]] = None,
+        profile: bool = False,
+        fragment_cache: typing.Optional[FragmentCache] = None,
+        include_workers: typing.Optional[int] = 1,
         **schema_kwargs: typing.Mapping[typing.Any, typing.Any],
     ) -> typing.Type[typing.Any]:
-        """Load configuration file."""
+        """Load configuration file.
+
+        Pass `compiled=True` to build key index (see `Configuration`).
+
+        If `cache` (`ConfigurationCache` or cache directory) is given,
+        validated configuration is stored on disk and reused as long as
+        configuration file and all its includes are unchanged.
+
+        libyaml based loader is used if available.
+
+        Pass `lazy=True` to validate top level sections on first access
+        (see `Configuration`). Lazily validated configuration is never
+        written to `cache`.
+
+        If `select` dotted key paths are given, only these parts
+        of document are parsed (see `SelectiveLoaderMixin`) and validated
+        with `partial=True`. `cache` is not used for partial loads.
+
+        With `profile=True` time of every load phase and included file
+        is stored in returned configuration (see
+        `configuration_load_profile`) and logged.
+
+        If `fragment_cache` (e.g. process-wide `FRAGMENT_CACHE`) is given,
+        included files are parsed only once as long as they are unchanged
+        (see `tcutils.yamlinclude.FragmentCache`). Fragments
+        of `!include_glob` and `!include_dir` are loaded on thread pool
+        of `include_workers` threads unless it is 1.
+        """
+        load_profile = ConfigurationLoadProfile(config_path) \
+            if profile else None
+        with _profile_phase(load_profile, 'check_path'):
+            p = check_path(config_path)
+        if schema_class is None:
+            schema_class = BaseConfigSchema
+        if select is not None:
+            cache = None
+            schema_kwargs.setdefault('partial', True)
+        if cache is not None and not isinstance(cache, ConfigurationCache):
+            cache = ConfigurationCache(cache)
+        if cache is not None:
+            with _profile_phase(load_profile, 'cache_get'):
+                result = cache.get(
+                    p, schema_class, schema_args, schema_kwargs)
+            if result is not None:
+                return cls._loaded(
+                    result, schema_class, compiled, load_profile)
+        loader_kwargs = {
+            'fragment_cache': fragment_cache,
+            'include_workers': include_workers,
+        }
+        if select is not None:
+            loader_kwargs.update(
+                loader_class=DEFAULT_SELECTIVE_LOADER, select=select)
+        if profile:
+            loader_kwargs['include_times'] = load_profile.includes
+        with _profile_phase(load_profile, 'parse'):
+            loader, config_dict = load_config_file(p, **loader_kwargs)
+        if lazy:
+            return cls._loaded(
+                dict(config_dict), schema_class, compiled, load_profile,
+                lazy_schema=schema_class(*schema_args, **schema_kwargs))
+        result = validate_config(
+            config_dict, schema_class, *schema_args,
+            profile=load_profile, **schema_kwargs)
+        if cache is not None:
+            with _profile_phase(load_profile, 'cache_set'):
+                cache.set(p, schema_class, result,
+                          [p] + loader.included_files,
+                          schema_args, schema_kwargs,
+                          globs=loader.included_globs)
+        return cls._loaded(result, schema_class, compiled, load_profile)
+
+    @classmethod
+    def _loaded(
+        cls: typing.Type[typing.Any],
+        result: typing.Dict[str, typing.Any],
+        schema_class: BaseConfigSchema,
+        compiled: bool,
+        load_profile: typing.Optional[ConfigurationLoadProfile],
+        **kwargs: typing.Any,
+    ) -> typing.Any:
+        """Create loaded configuration, logging its `load_profile`."""
+        if load_profile is None:
+            return cls(result, schema=schema_class, compiled=compiled,
+                       **kwargs)
+        configuration = cls(
+            result, schema=schema_class, compiled=compiled,
+            load_profile=load_profile, **kwargs)
+        load_profile.log()
+        return configuration
+
+    @classmethod
+    def load_all(
+        cls: typing.Type[typing.Any],
+        config_path: UniversalPath,
+        schema_class: typing.Optional[BaseConfigSchema] = None,
+        *schema_args: typing.Iterable[typing.Any],
+        compiled: bool = False,
+        **schema_kwargs: typing.Mapping[typing.Any, typing.Any],
+    ) -> typing.Iterator[typing.Any]:
+        """Load multi-document configuration file and yield one validated
+        configuration per document as it is parsed.
+        """
         p = check_path(config_path)
+        if schema_class is None:
+            schema_class = BaseConfigSchema
         with p.open('r') as fp:
             try:
-                config_dict = yaml.load(fp, IncludeLoader)
+                for config_dict in load_all(fp):
+                    result = validate_config(
+                        config_dict, schema_class,
+                        *schema_args, **schema_kwargs)
+                    yield cls(result, schema=schema_class, compiled=compiled)
             except FileNotFoundError as e:
                 log.error(f'Configuration !include error: {e}')
                 raise e
+
+    @classmethod
+    def load_many(
+        cls: typing.Type[typing.Any],
+        config_paths: typing.Iterable[UniversalPath],
+        schema_class: typing.Optional[BaseConfigSchema] = None,
+        *schema_args: typing.Iterable[typing.Any],
+        max_workers: typing.Optional[int] = None,
+        compiled: bool = False,
+        **schema_kwargs: typing.Mapping[typing.Any, typing.Any],
+    ) -> typing.Iterator[ConfigurationLoadResult]:
+        """Load many configuration files concurrently in process pool.
+
+        Files are parsed and validated in worker processes, which share
+        include cache between files they load. Results are yielded as
+        they complete; errors are reported in `ConfigurationLoadResult`
+        instead of aborting the whole batch. `schema_class` must be
+        picklable (defined at module level).
+        """
         if schema_class is None:
             schema_class = BaseConfigSchema
-        schema = schema_class(*schema_args, **schema_kwargs)
-        try:
-            result = schema.dump(schema.load(dict(config_dict)))
-        except ValidationError as e:
-            log.error(f'Configuration file error: "{e.args}"')
-            raise e
-        if schema_class:
-            return cls(result, schema=schema_class)
-        else:
-            return cls(result)
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_load_many_worker,
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _load_many_worker, config_path, schema_class,
+                    schema_args, schema_kwargs): config_path
+                for config_path in config_paths
+            }
+            for future in concurrent.futures.as_completed(futures):
+                config_path = futures[future]
+                try:
+                    configuration = cls(
+                        future.result(), schema=schema_class,
+                        compiled=compiled)
+                except Exception as e:
+                    log.error(
+                        f'Configuration "{config_path}" load error: {e}')
+                    yield ConfigurationLoadResult(config_path, error=e)
+                else:
+                    yield ConfigurationLoadResult(
+                        config_path, configuration=configuration)
+
+    @classmethod
+    def load_typed(
+        cls: typing.Type[typing.Any],
+        config_path: UniversalPath,
+        schema_class: typing.Type[BaseConfigSchema],
+        *schema_args: typing.Iterable[typing.Any],
+        cache: typing.Union[None, UniversalPath, ConfigurationCache] = None,
+        **schema_kwargs: typing.Mapping[typing.Any, typing.Any],
+    ) -> typing.Any:
+        """Load configuration file into instance of frozen slotted class
+        generated from `schema_class` (see `schema_config_class`).
+        """
+        configuration = Configuration.load(
+            config_path, schema_class, *schema_args, cache=cache,
+            **schema_kwargs)
+        return schema_config_class(schema_class).from_dict(
+            configuration.config)
+
+    def _parse(self, sections: typing.Optional[typing.Iterable[str]] = None):
+        """Parse configuration and trigger events if necessary.
 
-    def _parse(self):
-        """Parse configuration and trigger events if necessary."""
+        If `sections` is given, `_parse_<section>` methods of top level
+        sections not in `sections` are skipped. Methods that don't match
+        any top level section are always run.
+        """
+        if sections is not None:
+            sections = set(sections)
+        load_profile = self.__dict__.get('_load_profile')
         parsing_methods = class_prefixed_methods(self.__class__, '_parse_')
         for parsing_method in parsing_methods:
+            if sections is not None:
+                section = parsing_method[len('_parse_'):]
+                if section in self.config and section not in sections:
+                    continue
             method = getattr(self, parsing_method)
+            if load_profile is None:
+                method()
+                continue
+            start = time.perf_counter()
             method()
+            load_profile.hooks[parsing_method] = \
+                time.perf_counter() - start
+
+
+def iter_items(
+    config: typing.Union['Configuration', ConfigurationAttribute],
+) -> typing.Iterator[typing.Tuple[typing.Any, typing.Any]]:
+    """Iterate over keys and values of configuration or its nested
+    attribute, dictionaries are wrapped.
+
+    Pending sections of lazily validated configuration are validated
+    first.
+    """
+    if isinstance(config, Configuration):
+        for section in list(config._pending_sections):
+            validate_section(config, section)
+        value = config.config
+        key_prefix = path = ''
+    else:
+        value = config.value
+        key_prefix = config._key_prefix
+        path = config._path
+    children = config._children
+    key_index = config._key_index
+    stats = config._stats
+    for key, item in value.items():
+        item = _wrap_child(children, key_index, key_prefix, key, item)
+        if stats is not None:
+            stats.attach(path, key, item)
+        yield key, item
+
+
+def walk_items(
+    config: typing.Union['Configuration', ConfigurationAttribute],
+) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+    """Iterate depth first over dotted key paths and values of all nodes
+    of configuration or its nested attribute."""
+    return _walk_items(iter_items(config), '')
+
+
+class _InstrumentedConfiguration:
+    """Mixin reporting accesses of configuration to its
+    `ConfigurationAccessStats`."""
+
+    def __getitem__(self, k: str) -> typing.Any:
+        value = self._getitem(k)
+        self._stats.record('', k, value)
+        return value
+
+    def __getattr__(self, attr_name: str) -> typing.Any:
+        value = self._lookup(attr_name)
+        self._stats.record('', attr_name, value)
+        return value
+
+
+# Instrumented subclasses of configuration classes
+_INSTRUMENTED_CLASSES = {}
+
+
+def instrument(
+    configuration: 'Configuration',
+    stats: typing.Optional[ConfigurationAccessStats] = None,
+) -> ConfigurationAccessStats:
+    """Start counting accesses to configuration keys and return
+    statistics object (see `ConfigurationAccessStats`).
+
+    Configuration becomes instance of instrumented subclass of its class,
+    so configurations that are not instrumented pay nothing for counting.
+    """
+    if stats is None:
+        stats = ConfigurationAccessStats()
+    configuration._stats = stats
+    configuration_class = type(configuration)
+    if not issubclass(configuration_class, _InstrumentedConfiguration):
+        instrumented_class = _INSTRUMENTED_CLASSES.get(configuration_class)
+        if instrumented_class is None:
+            instrumented_class = type(
+                configuration_class.__name__,
+                (_InstrumentedConfiguration, configuration_class),
+                {'__module__': configuration_class.__module__,
+                 '__qualname__': configuration_class.__qualname__},
+            )
+            _INSTRUMENTED_CLASSES[configuration_class] = instrumented_class
+        configuration.__class__ = instrumented_class
+    return stats
+
+
+def configuration_load_profile(
+    configuration: 'Configuration',
+) -> typing.Optional[ConfigurationLoadProfile]:
+    """Return load profile of configuration loaded with `profile=True`."""
+    return configuration._load_profile
+
+
+def build_key_index(configuration: 'Configuration'):
+    """Build flattened index of dotted configuration keys
+    (see `Configuration`)."""
+    configuration._key_index = None
+    configuration._reserved_keys = (
+        frozenset(dir(configuration)),
+        frozenset(dir(ConfigurationAttribute({}))),
+    )
+    configuration._key_index = _build_key_index(
+        configuration.config, *configuration._reserved_keys)
+
+
+def validate_section(configuration: 'Configuration', key: str):
+    """Validate top level section of lazily validated configuration
+    and replace its raw value with validated one.
+    """
+    if key not in configuration._pending_sections:
+        return
+    name, field = configuration._lazy_fields[key]
+    attribute = field.attribute or name
+    raw_value = configuration.config[key]
+    try:
+        value = field.deserialize(
+            raw_value, key, configuration._lazy_document)
+    except ValidationError as e:
+        e = ValidationError({key: e.messages})
+        log.error(f'Configuration file error: "{e.args}"')
+        raise e
+    configuration.config[key] = field.serialize(
+        attribute, {attribute: value})
+    configuration._pending_sections.discard(key)
+    if configuration._key_index is not None:
+        configuration._update_key_index(key, raw_value)
+
+
+def validate_all(configuration: 'Configuration'):
+    """Validate whole lazily validated configuration at once,
+    including schema level validators.
+
+    Does nothing if configuration was validated on load.
+    """
+    schema = configuration._lazy_schema
+    if schema is None:
+        return
+    try:
+        result = schema.dump(schema.load(dict(configuration._lazy_document)))
+    except ValidationError as e:
+        log.error(f'Configuration file error: "{e.args}"')
+        raise e
+    configuration.config.update(result)
+    configuration._pending_sections.clear()
+    if configuration._key_index is not None:
+        build_key_index(configuration)
+
+
+def evolve(
+    configuration: 'Configuration',
+    config_dict: typing.Dict[str, typing.Any],
+    sections: typing.Optional[typing.Iterable[str]] = None,
+) -> 'Configuration':
+    """Return new configuration of the same class as `configuration`
+    with `config_dict`.
+
+    State set by parsing hooks is carried over and only hooks for
+    `sections` that changed are run again (see `Configuration._parse`).
+    `configuration` is left untouched.
+    """
+    configuration_class = configuration.__class__
+    evolved = configuration_class.__new__(configuration_class)
+    evolved.__dict__.update(configuration.__dict__)
+    evolved.config = config_dict
+    evolved._key_index = None
+    evolved._children = {}
+    evolved._lazy_schema = None
+    evolved._pending_sections = set()
+    evolved._load_profile = None
+    evolved._parse(sections)
+    if configuration._key_index is not None:
+        build_key_index(evolved)
+    return evolved
+
+
+KeyPath = typing.Tuple[str, ...]
+
+# Marker for key paths that are missing from configuration tree
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class Provenance:
+    """Source of configuration value: file path (or other source name)
+    and line number, if known."""
+    source: str
+    line: typing.Optional[int] = None
+
+
+@dataclass
+class ConfigurationLayer:
+    """Single source of layered configuration."""
+    name: str
+    data: typing.Dict[str, typing.Any]
+    provenance: typing.Dict[KeyPath, Provenance]
+    reader: typing.Optional[typing.Callable[[], typing.Tuple[
+        typing.Dict[str, typing.Any],
+        typing.Dict[KeyPath, Provenance]]]] = None
+
+
+def _key_path(key: typing.Union[str, KeyPath]) -> KeyPath:
+    return tuple(key.split('.')) if type(key) is str else tuple(key)
+
+
+def _get_path(tree: typing.Any, path: KeyPath) -> typing.Any:
+    """Return value at `path` of `tree` or `_MISSING`.
+
+    Return `_MISSING` also if some parent of `path` is not a dictionary.
+    """
+    for key in path:
+        if type(tree) is not dict or key not in tree:
+            return _MISSING
+        tree = tree[key]
+    return tree
+
+
+def _overrides_path(tree: typing.Any, path: KeyPath) -> bool:
+    """Check if `tree` replaces `path` with non-dictionary value set at one
+    of its parents."""
+    for key in path[:-1]:
+        if type(tree) is not dict or key not in tree:
+            return False
+        tree = tree[key]
+        if type(tree) is not dict:
+            return True
+    return False
+
+
+def _assoc_path(
+    tree: typing.Dict[str, typing.Any],
+    path: KeyPath,
+    value: typing.Any,
+) -> typing.Dict[str, typing.Any]:
+    """Return copy of `tree` with `value` set at `path`.
+
+    Only dictionaries along `path` are copied, everything else is shared.
+    If `value` is `_MISSING`, key at `path` is removed instead.
+    """
+    key = path[0]
+    result = dict(tree)
+    if len(path) == 1:
+        if value is _MISSING:
+            result.pop(key, None)
+        else:
+            result[key] = value
+        return result
+    child = tree.get(key)
+    if type(child) is not dict:
+        if value is _MISSING:
+            return tree
+        child = {}
+    result[key] = _assoc_path(child, path[1:], value)
+    return result
+
+
+def merge_configs(
+    base: typing.Any,
+    overlay: typing.Any,
+) -> typing.Any:
+    """Deep merge `overlay` into `base` and return result.
+
+    Neither argument is modified. Subtrees that exist only in one of them
+    are shared with the result rather than copied.
+    """
+    if type(base) is not dict or type(overlay) is not dict:
+        return overlay
+    if not base:
+        return overlay
+    if not overlay:
+        return base
+    result = dict(base)
+    for key, value in overlay.items():
+        if key in result:
+            result[key] = merge_configs(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def _collect_provenance(
+    node: yaml.Node,
+    source: str,
+    root: str,
+    include_nodes: typing.Dict[str, yaml.Node],
+    prefix: KeyPath,
+    provenance: typing.Dict[KeyPath, Provenance],
+):
+    """Record source line of every leaf in composed Yaml `node`,
+    following !include directives into included files."""
+    if isinstance(node, yaml.ScalarNode) and node.tag == '!include':
+        included_path = os.path.realpath(os.path.join(root, node.value))
+        included_node = include_nodes.get(included_path)
+        if included_node is not None:
+            _collect_provenance(
+                included_node, included_path,
+                os.path.dirname(included_path), include_nodes, prefix,
+                provenance)
+            return
+    if isinstance(node, yaml.MappingNode):
+        for key_node, value_node in node.value:
+            if isinstance(key_node, yaml.ScalarNode):
+                _collect_provenance(
+                    value_node, source, root, include_nodes,
+                    prefix + (key_node.value,), provenance)
+        return
+    provenance[prefix] = Provenance(source, node.start_mark.line + 1)
+
+
+def read_config_layer(
+    config_path: UniversalPath,
+) -> typing.Tuple[typing.Dict[str, typing.Any],
+                  typing.Dict[KeyPath, Provenance]]:
+    """Parse configuration file and return its document together with
+    provenance of every leaf value."""
+    p = check_path(config_path)
+    include_nodes = {}
+    with p.open('r') as fp:
+        loader = DEFAULT_INCLUDE_LOADER(fp, include_nodes=include_nodes)
+        try:
+            node = loader.get_single_node()
+            config_dict = {} if node is None else \
+                loader.construct_document(node)
+        except FileNotFoundError as e:
+            log.error(f'Configuration !include error: {e}')
+            raise e
+        finally:
+            loader.dispose()
+    provenance = {}
+    if node is not None:
+        _collect_provenance(
+            node, str(p), str(p.parent), include_nodes, (), provenance)
+    return config_dict, provenance
+
+
+def read_env_layer(
+    prefix: str,
+    separator: str = '__',
+    environ: typing.Optional[typing.Mapping[str, str]] = None,
+) -> typing.Tuple[typing.Dict[str, typing.Any],
+                  typing.Dict[KeyPath, Provenance]]:
+    """Build configuration from environment variables starting with
+    `prefix`.
+
+    Variable name without prefix is lowercased and split by `separator`
+    into key path (`APP_DATABASE__HOST` is `database.host` for `APP_`
+    prefix). Values are parsed as Yaml scalars.
+    """
+    if environ is None:
+        environ = os.environ
+    config_dict = {}
+    provenance = {}
+    for name in sorted(environ):
+        if not name.startswith(prefix) or name == prefix:
+            continue
+        path = tuple(name[len(prefix):].lower().split(separator))
+        value = yaml.safe_load(environ[name])
+        config_dict = _assoc_path(config_dict, path, value)
+        provenance[path] = Provenance(f'env:{name}')
+    return config_dict, provenance
+
+
+class LayeredConfigurationLoader:
+    """Merge configuration from any number of ordered layers (files,
+    environment variables, dictionaries). Later layers override earlier
+    ones.
+
+    Merged tree shares all untouched subtrees with layers, so layers
+    and `merged` must be treated as read only. Replacing a layer
+    (`update_layer()`, `reload()`) recomputes only key paths that differ
+    in that layer and publishes new `merged` tree; old tree stays intact.
+    Source file and line of every value is available from `source_of()`.
+    """
+
+    def __init__(self):
+        self.layers = []
+        self.merged = {}
+
+    def _layer(self, name: str) -> ConfigurationLayer:
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(f'No such configuration layer: {name}')
+
+    def add_layer(self, layer: ConfigurationLayer) -> ConfigurationLayer:
+        """Add layer on top of existing ones."""
+        if any(existing.name == layer.name for existing in self.layers):
+            raise ValueError(f'Configuration layer "{layer.name}" exists')
+        self.layers.append(layer)
+        self.merged = merge_configs(self.merged, layer.data)
+        return layer
+
+    def add_dict(
+        self,
+        name: str,
+        config_dict: typing.Dict[str, typing.Any],
+    ) -> ConfigurationLayer:
+        """Add layer from dictionary."""
+        return self.add_layer(ConfigurationLayer(name, config_dict, {}))
+
+    def add_file(
+        self,
+        config_path: UniversalPath,
+        name: typing.Optional[str] = None,
+    ) -> ConfigurationLayer:
+        """Add layer from configuration file. Layer is named by file path,
+        unless `name` is given."""
+        def reader():
+            return read_config_layer(config_path)
+        config_dict, provenance = reader()
+        return self.add_layer(ConfigurationLayer(
+            name or str(config_path), config_dict, provenance, reader))
+
+    def add_env(
+        self,
+        prefix: str,
+        separator: str = '__',
+        name: str = 'env',
+        environ: typing.Optional[typing.Mapping[str, str]] = None,
+    ) -> ConfigurationLayer:
+        """Add layer from environment variables (see `read_env_layer`)."""
+        def reader():
+            return read_env_layer(prefix, separator, environ)
+        config_dict, provenance = reader()
+        return self.add_layer(ConfigurationLayer(
+            name, config_dict, provenance, reader))
+
+    def _merged_value(self, path: KeyPath) -> typing.Any:
+        """Compute merged value at `path` from all layers."""
+        value = _MISSING
+        for layer in self.layers:
+            if _overrides_path(layer.data, path):
+                value = _MISSING
+                continue
+            layer_value = _get_path(layer.data, path)
+            if layer_value is _MISSING:
+                continue
+            value = layer_value if value is _MISSING else \
+                merge_configs(value, layer_value)
+        return value
+
+    def update_layer(
+        self,
+        name: str,
+        config_dict: typing.Dict[str, typing.Any],
+        provenance: typing.Optional[typing.Dict[KeyPath, Provenance]] = None,
+    ) -> typing.List[KeyPath]:
+        """Replace data of layer `name` and re-merge affected subtrees.
+
+        Return list of key paths that changed in the layer.
+        """
+        layer = self._layer(name)
+        changed = configuration_diff(layer.data, config_dict)
+        layer.data = config_dict
+        if provenance is not None:
+            layer.provenance = provenance
+        merged = self.merged
+        for path in changed:
+            merged = _assoc_path(merged, path, self._merged_value(path))
+        self.merged = merged
+        return changed
+
+    def reload(self, name: str) -> typing.List[KeyPath]:
+        """Read layer `name` from its source again (see `update_layer`)."""
+        layer = self._layer(name)
+        if layer.reader is None:
+            raise ValueError(f'Configuration layer "{name}" has no source')
+        config_dict, provenance = layer.reader()
+        return self.update_layer(name, config_dict, provenance)
+
+    def source_of(
+        self,
+        key: typing.Union[str, KeyPath],
+    ) -> typing.Optional[Provenance]:
+        """Return provenance of merged value at dotted `key` (or key path).
+        """
+        path = _key_path(key)
+        if _get_path(self.merged, path) is _MISSING:
+            return None
+        for layer in reversed(self.layers):
+            if _get_path(layer.data, path) is not _MISSING:
+                return layer.provenance.get(path, Provenance(layer.name))
+        return None
+
+    def load(
+        self,
+        schema_class: typing.Optional[BaseConfigSchema] = None,
+        *schema_args: typing.Iterable[typing.Any],
+        configuration_class: typing.Type[Configuration] = Configuration,
+        compiled: bool = False,
+        **schema_kwargs: typing.Mapping[typing.Any, typing.Any],
+    ) -> Configuration:
+        """Validate merged configuration and return `configuration_class`
+        instance."""
+        if schema_class is None:
+            schema_class = BaseConfigSchema
+        result = validate_config(
+            self.merged, schema_class, *schema_args, **schema_kwargs)
+        return configuration_class(
+            result, schema=schema_class, compiled=compiled)
+
+
+def _assoc_frozen_path(
+    tree: typing.Any,
+    path: KeyPath,
+    value: typing.Any,
+) -> typing.Any:
+    """Return frozen copy of `tree` with `value` set at `path` (removed
+    if `value` is `_MISSING`). Only mappings along `path` are copied."""
+    if not isinstance(tree, collections.abc.Mapping):
+        if value is _MISSING:
+            return tree
+        tree = {}
+    node = dict(tree)
+    key = path[0]
+    if len(path) == 1:
+        if value is _MISSING:
+            node.pop(key, None)
+        else:
+            node[key] = value
+    else:
+        node[key] = _assoc_frozen_path(node.get(key), path[1:], value)
+    return types.MappingProxyType(node)
+
+
+class VersionedConfiguration:
+    """Copy-on-write holder of immutable configuration versions.
+
+    Every version is `configuration_class` instance over frozen tree
+    (see `freeze_config`), so reads need no locks. `update()` builds new
+    version sharing all untouched subtrees with the current one, runs
+    `_parse_<section>` hooks of changed sections on it (hooks may still
+    set top level keys of the new version) and publishes it with single
+    attribute assignment. Use `pin()` to keep one version for the whole
+    request.
+
+    With `compiled=True` every version gets key index (see
+    `Configuration`), which is rebuilt on every update.
+    """
+
+    def __init__(
+        self,
+        config_dict: typing.Mapping[str, typing.Any],
+        schema: BaseConfigSchema = BaseConfigSchema,
+        configuration_class: typing.Type[Configuration] = Configuration,
+        compiled: bool = False,
+    ):
+        self._write_lock = threading.Lock()
+        configuration = configuration_class(
+            {key: freeze_config(value) for key, value in config_dict.items()},
+            schema=schema, compiled=compiled)
+        self._publish(configuration, 0)
+
+    @classmethod
+    def from_configuration(
+        cls,
+        configuration: Configuration,
+    ) -> 'VersionedConfiguration':
+        """Create versioned configuration with data of `configuration`."""
+        return cls(configuration.config, schema=configuration.schema,
+                   configuration_class=configuration.__class__,
+                   compiled=configuration._key_index is not None)
+
+    def _publish(self, configuration: Configuration, version: int):
+        configuration.config = types.MappingProxyType(configuration.config)
+        self._current = (version, configuration)
+
+    @property
+    def version(self) -> int:
+        """Number of current version."""
+        return self._current[0]
+
+    def current(self) -> Configuration:
+        """Return current configuration version."""
+        return self._current[1]
+
+    @contextlib.contextmanager
+    def pin(self) -> typing.Iterator[Configuration]:
+        """Context manager yielding current version, which stays
+        unchanged for the whole block."""
+        yield self._current[1]
+
+    def update(
+        self,
+        changes: typing.Mapping[typing.Union[str, KeyPath], typing.Any],
+    ) -> int:
+        """Publish new version with values of dotted keys (or key paths)
+        in `changes` replaced. Return new version number.
+        """
+        with self._write_lock:
+            version, current = self._current
+            config_dict = dict(current.config)
+            sections = set()
+            for key, value in changes.items():
+                path = _key_path(key)
+                if value is not _MISSING:
+                    value = freeze_config(value)
+                sections.add(path[0])
+                if len(path) == 1:
+                    if value is _MISSING:
+                        config_dict.pop(path[0], None)
+                    else:
+                        config_dict[path[0]] = value
+                else:
+                    config_dict[path[0]] = _assoc_frozen_path(
+                        config_dict.get(path[0]), path[1:], value)
+            configuration = evolve(current, config_dict, sections)
+            self._publish(configuration, version + 1)
+            return version + 1
+
+    def remove(self, *keys: typing.Union[str, KeyPath]) -> int:
+        """Publish new version without dotted `keys`."""
+        return self.update({key: _MISSING for key in keys})
+
+    def __getitem__(self, k: str) -> typing.Any:
+        return self._current[1][k]
+
+    def __getattr__(self, attr_name: str) -> typing.Any:
+        try:
+            current = self.__dict__['_current']
+        except KeyError:
+            raise AttributeError(f'No such attribute: {attr_name}')
+        return getattr(current[1], attr_name)
+
+    def __str__(self) -> str:
+        return str(self._current[1])
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import os
+import pickle
+import hashlib
+import logging
+import pathlib
+import tempfile
+import types
+import typing
+
+from marshmallow import Schema, fields, validate, class_registry
+from marshmallow.exceptions import RegistryError
+
+from tcutils.types import UniversalPath, UniversalPathCollection
+from tcutils.paths import normalize_path
+from tcutils.yamlinclude import GlobPattern, glob_signature
+
+log = logging.getLogger(__file__)
+
+CACHE_FORMAT_VERSION = 3
+CACHE_FILE_SUFFIX = '.cfgcache'
+
+FileSignature = typing.Tuple[str, int, int, typing.Optional[str]]
+
+
+def file_signature(
+    path: UniversalPath,
+    use_hash: bool = False
+) -> FileSignature:
+    """Return signature of file: path, mtime, size and optionally
+    SHA-256 hash of its contents.
+    """
+    path = pathlib.Path(path)
+    stat = path.stat()
+    digest = None
+    if use_hash:
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    return (str(path), stat.st_mtime_ns, stat.st_size, digest)
+
+
+# Field attributes that don't affect loaded data
+_IGNORED_FIELD_ATTRIBUTES = ('parent', 'root', 'name', 'metadata')
+# Validator attributes joined from other attributes in iteration order,
+# which for sets depends on hash seed
+_IGNORED_VALIDATOR_ATTRIBUTES = ('choices_text', 'labels_text', 'values_text')
+
+
+def _code_repr(code: types.CodeType) -> str:
+    """Return stable representation of code object."""
+    consts = tuple(
+        _code_repr(const) if isinstance(const, types.CodeType) else
+        # Order of frozenset depends on hash seed
+        repr(sorted(map(repr, const))) if isinstance(const, frozenset) else
+        repr(const)
+        for const in code.co_consts)
+    return f'{code.co_code.hex()}:{consts}:{code.co_names}'
+
+
+def _schema_repr(
+    schema_class: typing.Any,
+    seen: typing.Set[typing.Any],
+) -> str:
+    """Return stable representation of schema class: its fields with
+    their options, nested schemas, hooks and `Meta` options."""
+    if not isinstance(schema_class, type):
+        schema_class = type(schema_class)
+    name = f'{schema_class.__module__}.{schema_class.__qualname__}'
+    if schema_class in seen:
+        return name
+    seen = seen | {schema_class}
+    declared_fields = getattr(schema_class, '_declared_fields', {})
+    fields_repr = [
+        (field_name, _value_repr(field, seen))
+        for field_name, field in sorted(declared_fields.items())
+    ]
+    hooks_repr = [
+        (tag, [
+            (hook[0], _value_repr(getattr(schema_class, hook[0], None), seen))
+            + tuple(repr(item) for item in hook[1:])
+            for hook in hooks
+        ])
+        for tag, hooks in sorted(getattr(schema_class, '_hooks', {}).items())
+    ]
+    opts = getattr(schema_class, 'opts', None)
+    opts_repr = sorted(
+        (key, _value_repr(value, seen)) for key, value in vars(opts).items()
+    ) if opts is not None else []
+    return f'{name}:{fields_repr}:{hooks_repr}:{opts_repr}'
+
+
+def _value_repr(value: typing.Any, seen: typing.Set[typing.Any]) -> str:
+    """Return stable representation of field, its option or hook."""
+    if isinstance(value, type) and issubclass(value, Schema) or \
+            isinstance(value, Schema):
+        return _schema_repr(value, seen)
+    if isinstance(value, validate.Validator):
+        attributes = [
+            (key, _value_repr(item, seen))
+            for key, item in sorted(vars(value).items())
+            if key not in _IGNORED_VALIDATOR_ATTRIBUTES
+        ]
+        return f'{type(value).__module__}.{type(value).__qualname__}' \
+            f'{attributes}'
+    if isinstance(value, fields.Field):
+        attributes = [
+            (key, _value_repr(item, seen))
+            for key, item in sorted(vars(value).items())
+            if key not in _IGNORED_FIELD_ATTRIBUTES
+            and not key.startswith('_')
+        ]
+        if isinstance(value, fields.Nested):
+            nested = value.nested
+            if isinstance(nested, str) and nested != 'self':
+                try:
+                    nested = class_registry.get_class(nested, all=False)
+                except RegistryError:
+                    pass
+            elif callable(nested) and not isinstance(nested, type):
+                nested = nested()
+            attributes.append(('schema', _value_repr(nested, seen)))
+        return f'{type(value).__module__}.{type(value).__qualname__}' \
+            f'{attributes}'
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_value_repr(item, seen) for item in value]
+        return repr(sorted(items) if isinstance(
+            value, (set, frozenset)) else items)
+    if isinstance(value, dict):
+        return repr(sorted(
+            (repr(key), _value_repr(item, seen))
+            for key, item in value.items()))
+    function = getattr(value, '__func__', value)
+    code = getattr(function, '__code__', None)
+    if code is not None:
+        closure = []
+        for cell in getattr(function, '__closure__', None) or ():
+            try:
+                closure.append(_value_repr(cell.cell_contents, seen))
+            except ValueError:
+                closure.append('<empty>')
+        return f'{function.__module__}.{function.__qualname__}' \
+            f':{_code_repr(code)}:{closure}'
+    if isinstance(value, type) or callable(value) and \
+            type(value).__repr__ is object.__repr__:
+        # Default repr contains memory address
+        value_type = value if isinstance(value, type) else type(value)
+        return f'{value_type.__module__}.{value_type.__qualname__}'
+    return repr(value)
+
+
+def schema_signature(schema_class: typing.Type[typing.Any]) -> str:
+    """Return string identifying schema class: its name and digest
+    of its declared fields with their options and nested schemas,
+    processing hooks and `Meta` options.
+    """
+    digest = hashlib.sha256(
+        _schema_repr(schema_class, set()).encode('utf-8')).hexdigest()
+    return f'{schema_class.__module__}.{schema_class.__qualname__}:{digest}'
+
+
+class ConfigurationCache:
+    """Persistent on-disk cache of validated configuration.
+
+    Cache entry is stored per root configuration file and schema class,
+    so entry written for older version of schema is overwritten.
+    Entry is valid only if it was written for the same schema signature
+    (see `schema_signature`), root file and every transitively included file
+    has the same signature as when the entry was written, and every glob
+    pattern of `!include_glob`/`!include_dir` still matches the same files.
+    With `use_hash` file contents are compared instead of modification
+    time and size.
+
+    Entries are pickled, so `cache_dir` must not be writable by untrusted
+    users.
+    """
+
+    def __init__(self, cache_dir: UniversalPath, use_hash: bool = False):
+        self.cache_dir = normalize_path(cache_dir)
+        self.use_hash = use_hash
+
+    def _entry_path(
+        self,
+        config_path: UniversalPath,
+        schema_class: typing.Type[typing.Any],
+        schema_args: typing.Iterable[typing.Any],
+        schema_kwargs: typing.Mapping[str, typing.Any],
+    ) -> pathlib.Path:
+        key = repr((
+            str(normalize_path(config_path)),
+            f'{schema_class.__module__}.{schema_class.__qualname__}',
+            tuple(schema_args),
+            sorted(schema_kwargs.items()),
+        ))
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.cache_dir / f'{digest}{CACHE_FILE_SUFFIX}'
+
+    def _is_fresh(self, signatures: typing.Iterable[FileSignature]) -> bool:
+        for signature in signatures:
+            path, mtime, size, digest = signature
+            try:
+                current = file_signature(path, use_hash=digest is not None)
+            except OSError:
+                return False
+            if digest is not None:
+                if current[3] != digest:
+                    return False
+            elif current != signature:
+                return False
+        return True
+
+    def _globs_fresh(self, signatures: typing.Iterable[typing.Any]) -> bool:
+        return all(
+            glob_signature(signature[:2]) == tuple(signature)
+            for signature in signatures)
+
+    def get(
+        self,
+        config_path: UniversalPath,
+        schema_class: typing.Type[typing.Any],
+        schema_args: typing.Iterable[typing.Any] = (),
+        schema_kwargs: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+    ) -> typing.Optional[typing.Any]:
+        """Return cached validated configuration or `None` if there is no
+        fresh entry.
+        """
+        entry_path = self._entry_path(
+            config_path, schema_class, schema_args, schema_kwargs or {})
+        try:
+            with entry_path.open('rb') as fp:
+                entry = pickle.load(fp)
+        except (OSError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError) as e:
+            # Entry may refer to classes that were renamed or removed
+            log.debug(f'Configuration cache entry "{entry_path}" '
+                      f'is unreadable: {e}')
+            return None
+        if entry.get('version') != CACHE_FORMAT_VERSION:
+            return None
+        if entry['schema'] != schema_signature(schema_class):
+            log.debug(f'Configuration cache entry "{entry_path}" was written '
+                      f'for other version of schema')
+            return None
+        if not self._is_fresh(entry['dependencies']) or \
+                not self._globs_fresh(entry['globs']):
+            log.debug(f'Configuration cache entry "{entry_path}" is stale')
+            return None
+        return entry['result']
+
+    def set(
+        self,
+        config_path: UniversalPath,
+        schema_class: typing.Type[typing.Any],
+        result: typing.Any,
+        dependencies: UniversalPathCollection,
+        schema_args: typing.Iterable[typing.Any] = (),
+        schema_kwargs: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+        globs: typing.Iterable[GlobPattern] = (),
+    ):
+        """Store validated configuration together with signatures
+        of all `dependencies` and files matched by `globs` patterns.
+        """
+        entry_path = self._entry_path(
+            config_path, schema_class, schema_args, schema_kwargs or {})
+        entry = {
+            'version': CACHE_FORMAT_VERSION,
+            'schema': schema_signature(schema_class),
+            'dependencies': [
+                file_signature(path, self.use_hash)
+                for path in dict.fromkeys(
+                    str(normalize_path(path)) for path in dependencies)
+            ],
+            'globs': [
+                glob_signature(glob_pattern)
+                for glob_pattern in dict.fromkeys(
+                    tuple(glob_pattern) for glob_pattern in globs)
+            ],
+            'result': result,
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to temporary file first, so concurrent readers never
+        # see partially written entry
+        fd, temp_name = tempfile.mkstemp(
+            dir=str(self.cache_dir), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                pickle.dump(entry, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_name, str(entry_path))
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+    def clear(self):
+        """Remove all cache entries."""
+        if not self.cache_dir.exists():
+            return
+        for entry_path in self.cache_dir.glob(f'*{CACHE_FILE_SUFFIX}'):
+            entry_path.unlink()
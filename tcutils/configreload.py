@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import os
+import types
+import logging
+import threading
+import typing
+
+from tcutils.types import UniversalPath
+from tcutils.paths import check_path
+from tcutils.config import BaseConfigSchema, Configuration, \
+    load_config_file, validate_config, configuration_diff, evolve
+from tcutils.yamlinclude import fragment_signature, glob_signature, \
+    freeze_config
+
+log = logging.getLogger(__file__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class ReloadableConfiguration:
+    """Configuration that is reloaded when its file or any of its
+    included files change.
+
+    Files are watched by polling their stat signature every
+    `poll_interval` seconds in background thread (see `start()`),
+    or on demand with `check()`. Patterns of `!include_glob` and
+    `!include_dir` are watched for added and removed files. Only changed
+    fragments (and fragments that include them) are parsed again.
+
+    Every reload builds new `configuration_class` instance with
+    `tcutils.config.evolve`, so only `_parse_<section>` hooks of changed
+    sections are run. New snapshot holds frozen configuration tree (see
+    `freeze_config`) and is published with single attribute assignment;
+    readers that need consistent view for a longer time should keep
+    result of `snapshot()`.
+    """
+
+    def __init__(
+        self,
+        config_path: UniversalPath,
+        schema_class: typing.Optional[BaseConfigSchema] = None,
+        *schema_args: typing.Iterable[typing.Any],
+        configuration_class: typing.Type[Configuration] = Configuration,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        compiled: bool = False,
+        on_reload: typing.Optional[typing.Callable[
+            [Configuration, typing.List[typing.Tuple[str, ...]]], None]] = None,
+        **schema_kwargs: typing.Mapping[typing.Any, typing.Any],
+    ):
+        self.config_path = check_path(config_path)
+        self.schema_class = schema_class or BaseConfigSchema
+        self.schema_args = schema_args
+        self.schema_kwargs = schema_kwargs
+        self.poll_interval = poll_interval
+        self.on_reload = on_reload
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._fragments = {}
+        self._include_graph = {}
+        self._include_globs = {}
+        self._signatures = {}
+        self._glob_signatures = []
+        self._result = self._load(set())
+        self._publish(configuration_class(
+            self._frozen(self._result), schema=self.schema_class,
+            compiled=compiled))
+
+    @staticmethod
+    def _frozen(
+        result: typing.Dict[str, typing.Any],
+    ) -> typing.Dict[str, typing.Any]:
+        """Return top level dictionary of frozen section values."""
+        return {key: freeze_config(value) for key, value in result.items()}
+
+    def _publish(self, configuration: Configuration):
+        configuration.config = types.MappingProxyType(configuration.config)
+        self._snapshot = configuration
+
+    def _load(self, dirty: typing.Set[str]) -> typing.Dict[str, typing.Any]:
+        """Parse and validate configuration reusing fragments that are not
+        `dirty`.
+        """
+        include_cache = {
+            path: data for path, data in self._fragments.items()
+            if path not in dirty
+        }
+        # Reused fragments are not parsed again, so their includes and
+        # globs are not recorded by loader
+        include_graph = {
+            path: list(children)
+            for path, children in self._include_graph.items()
+            if path in include_cache
+        }
+        include_globs = {
+            path: list(globs)
+            for path, globs in self._include_globs.items()
+            if path in include_cache
+        }
+        # Signatures are taken before files are read, so changes made
+        # while loading are noticed by next check
+        root = os.path.realpath(self.config_path)
+        signatures = {root: fragment_signature(root)}
+        loader, config_dict = load_config_file(
+            self.config_path,
+            include_cache=include_cache,
+            include_graph=include_graph,
+            include_globs=include_globs,
+            include_signatures=signatures,
+            copy_includes=True,
+            # Fragments are reused through include_cache above
+            fragment_cache=None,
+        )
+        # Reused fragments keep signatures from load that parsed them
+        previous_globs = {
+            (path, signature[:2]): signature
+            for path, signature in self._glob_signatures
+        }
+        paths = self._included_paths(root, include_graph)
+        self._signatures = {
+            path: signatures.get(path) or self._signatures.get(path) or
+            fragment_signature(path)
+            for path in paths
+        }
+        self._glob_signatures = [
+            (path, signatures.get(glob_pattern) or
+             previous_globs.get((path, glob_pattern)) or
+             glob_signature(glob_pattern))
+            for path in paths
+            for glob_pattern in dict.fromkeys(include_globs.get(path, ()))
+        ]
+        self._fragments = include_cache
+        self._include_graph = include_graph
+        self._include_globs = include_globs
+        return validate_config(
+            config_dict, self.schema_class,
+            *self.schema_args, **self.schema_kwargs)
+
+    @staticmethod
+    def _included_paths(
+        root: str,
+        include_graph: typing.Dict[str, typing.List[str]],
+    ) -> typing.List[str]:
+        """Return `root` and all files it transitively includes."""
+        paths = {root: None}
+        pending = [root]
+        while pending:
+            for child in include_graph.get(pending.pop(), ()):
+                if child not in paths:
+                    paths[child] = None
+                    pending.append(child)
+        return list(paths)
+
+    def _changed_files(self) -> typing.Set[str]:
+        """Return changed files, and files whose glob patterns match
+        different files now."""
+        changed = set()
+        for path, signature in self._signatures.items():
+            try:
+                if fragment_signature(path) != signature:
+                    changed.add(path)
+            except OSError:
+                changed.add(path)
+        for path, signature in self._glob_signatures:
+            if glob_signature(signature[:2]) != signature:
+                changed.add(path)
+        return changed
+
+    def _dirty_files(self, changed: typing.Set[str]) -> typing.Set[str]:
+        """Return changed files together with all files that include them.
+        """
+        parents = {}
+        for parent, children in self._include_graph.items():
+            for child in children:
+                parents.setdefault(child, set()).add(parent)
+        dirty = set()
+        pending = list(changed)
+        while pending:
+            path = pending.pop()
+            if path in dirty:
+                continue
+            dirty.add(path)
+            pending.extend(parents.get(path, ()))
+        return dirty
+
+    def snapshot(self) -> Configuration:
+        """Return current configuration snapshot."""
+        return self._snapshot
+
+    def check(self) -> bool:
+        """Reload configuration if any of its files changed.
+
+        Return `True` if new snapshot was published.
+        """
+        with self._lock:
+            changed = self._changed_files()
+            if not changed:
+                return False
+            log.info(f'Configuration files changed: {sorted(changed)}')
+            result = self._load(self._dirty_files(changed))
+            diff = configuration_diff(self._result, result)
+            self._result = result
+            if not diff:
+                return False
+            sections = {path[0] for path in diff}
+            config_dict = self._frozen(result)
+            # Keep top level keys set by hooks that are not run again
+            for key, value in self._snapshot.config.items():
+                if key not in config_dict and key not in sections:
+                    config_dict[key] = value
+            self._publish(evolve(self._snapshot, config_dict, sections))
+        if self.on_reload is not None:
+            self.on_reload(self._snapshot, diff)
+        return True
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                log.error(f'Configuration reload error: {e}')
+
+    def start(self):
+        """Start watching configuration files in background thread."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name='ReloadableConfiguration', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching configuration files."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def __getitem__(self, k: str) -> typing.Any:
+        return self._snapshot[k]
+
+    def __getattr__(self, attr_name: str) -> typing.Any:
+        try:
+            snapshot = self.__dict__['_snapshot']
+        except KeyError:
+            raise AttributeError(f'No such attribute: {attr_name}')
+        return getattr(snapshot, attr_name)
+
+    def __str__(self) -> str:
+        return str(self._snapshot)
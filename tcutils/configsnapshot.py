@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+"""Compact read-only binary images of configuration.
+
+Image layout (little endian): 16 byte header (magic, format version,
+root value offset) followed by encoded values. Every value starts with
+one byte tag:
+
+* `N`, `T`, `F` - None, True, False
+* `i` - 64-bit integer, `I` - big integer as decimal string
+* `f` - 64-bit float
+* `s` - UTF-8 string, `y` - bytes (32-bit length and data)
+* `l` - list (32-bit count and 64-bit item offsets)
+* `d` - dict (32-bit count, 32-bit count of string keys, 64-bit key and
+  value offsets in insertion order, positions of string keys sorted
+  by their UTF-8 encoding for binary search)
+
+Values are decoded only when accessed, so attaching to an image costs
+nothing regardless of its size. Container views are decoded once and
+kept by their parent.
+"""
+
+import mmap
+import struct
+import typing
+import collections.abc
+
+from tcutils.types import UniversalPath
+from tcutils.config import BaseConfigSchema, Configuration
+
+SNAPSHOT_MAGIC = b'TCCS'
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct('<4sB3xQ')
+_LENGTH = struct.Struct('<I')
+_DICT_HEADER = struct.Struct('<II')
+_OFFSET = struct.Struct('<Q')
+_ENTRY = struct.Struct('<QQ')
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+
+_INT_MIN = -2 ** 63
+_INT_MAX = 2 ** 63 - 1
+
+
+class _SnapshotWriter:
+    """Encode configuration tree into snapshot image."""
+
+    def __init__(self):
+        self.buffer = bytearray(_HEADER.size)
+        self._strings = {}
+
+    def _append(self, data: bytes) -> int:
+        offset = len(self.buffer)
+        self.buffer += data
+        return offset
+
+    def _write_str(self, value: str) -> int:
+        offset = self._strings.get(value)
+        if offset is None:
+            data = value.encode('utf-8')
+            offset = self._append(b's' + _LENGTH.pack(len(data)) + data)
+            self._strings[value] = offset
+        return offset
+
+    def write(self, value: typing.Any) -> int:
+        """Encode `value` and return its offset."""
+        if value is None:
+            return self._append(b'N')
+        if value is True:
+            return self._append(b'T')
+        if value is False:
+            return self._append(b'F')
+        if isinstance(value, int):
+            if _INT_MIN <= value <= _INT_MAX:
+                return self._append(b'i' + _INT.pack(value))
+            data = str(value).encode('ascii')
+            return self._append(b'I' + _LENGTH.pack(len(data)) + data)
+        if isinstance(value, float):
+            return self._append(b'f' + _FLOAT.pack(value))
+        if isinstance(value, str):
+            return self._write_str(value)
+        if isinstance(value, (bytes, bytearray)):
+            return self._append(
+                b'y' + _LENGTH.pack(len(value)) + bytes(value))
+        if isinstance(value, collections.abc.Mapping):
+            entries = [
+                (self.write(key), self.write(item))
+                for key, item in value.items()
+            ]
+            sorted_keys = sorted(
+                (key.encode('utf-8'), position)
+                for position, key in enumerate(value) if isinstance(key, str))
+            data = bytearray(b'd')
+            data += _DICT_HEADER.pack(len(entries), len(sorted_keys))
+            for key_offset, value_offset in entries:
+                data += _ENTRY.pack(key_offset, value_offset)
+            for _, position in sorted_keys:
+                data += _LENGTH.pack(position)
+            return self._append(bytes(data))
+        if isinstance(value, (list, tuple)):
+            offsets = [self.write(item) for item in value]
+            data = bytearray(b'l')
+            data += _LENGTH.pack(len(offsets))
+            for offset in offsets:
+                data += _OFFSET.pack(offset)
+            return self._append(bytes(data))
+        raise TypeError(
+            f'Cannot store {type(value).__name__} in configuration snapshot')
+
+    def finish(self, root_offset: int) -> bytes:
+        _HEADER.pack_into(
+            self.buffer, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, root_offset)
+        return bytes(self.buffer)
+
+
+def encode_snapshot(config: typing.Any) -> bytes:
+    """Encode configuration dictionary (or `Configuration`) into snapshot
+    image."""
+    if isinstance(config, Configuration):
+        config = config.config
+    writer = _SnapshotWriter()
+    return writer.finish(writer.write(config))
+
+
+def _decode(buffer: typing.Any, offset: int) -> typing.Any:
+    """Decode value at `offset`, containers are returned as lazy views."""
+    tag = buffer[offset]
+    if tag == 0x73:  # s
+        length, = _LENGTH.unpack_from(buffer, offset + 1)
+        start = offset + 1 + _LENGTH.size
+        return str(buffer[start:start + length], 'utf-8')
+    if tag == 0x69:  # i
+        return _INT.unpack_from(buffer, offset + 1)[0]
+    if tag == 0x64:  # d
+        return SnapshotMapping(buffer, offset)
+    if tag == 0x4e:  # N
+        return None
+    if tag == 0x54:  # T
+        return True
+    if tag == 0x46:  # F
+        return False
+    if tag == 0x66:  # f
+        return _FLOAT.unpack_from(buffer, offset + 1)[0]
+    if tag == 0x6c:  # l
+        return SnapshotSequence(buffer, offset)
+    if tag in (0x49, 0x79):  # I, y
+        length, = _LENGTH.unpack_from(buffer, offset + 1)
+        start = offset + 1 + _LENGTH.size
+        data = bytes(buffer[start:start + length])
+        return int(data) if tag == 0x49 else data
+    raise ValueError(f'Invalid configuration snapshot value at {offset}')
+
+
+def _decode_child(
+    views: typing.Dict[int, typing.Any],
+    buffer: typing.Any,
+    offset: int,
+) -> typing.Any:
+    """Decode value at `offset`, reusing container views already decoded
+    by parent."""
+    view = views.get(offset)
+    if view is None:
+        view = _decode(buffer, offset)
+        if isinstance(view, (SnapshotMapping, SnapshotSequence)):
+            views[offset] = view
+    return view
+
+
+class SnapshotMapping(collections.abc.Mapping):
+    """Read-only dictionary view of snapshot image."""
+
+    __slots__ = ('_buffer', '_offset', '_length', '_sorted_length', '_views')
+
+    def __init__(self, buffer: typing.Any, offset: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._views = {}
+        self._length, self._sorted_length = _DICT_HEADER.unpack_from(
+            buffer, offset + 1)
+
+    def _entry(self, position: int) -> typing.Tuple[int, int]:
+        return _ENTRY.unpack_from(
+            self._buffer,
+            self._offset + 1 + _DICT_HEADER.size + position * _ENTRY.size)
+
+    def _str_key(self, key_offset: int) -> bytes:
+        buffer = self._buffer
+        length, = _LENGTH.unpack_from(buffer, key_offset + 1)
+        start = key_offset + 1 + _LENGTH.size
+        return bytes(buffer[start:start + length])
+
+    def _find(self, key: typing.Any) -> typing.Optional[int]:
+        """Return value offset for `key` or `None`."""
+        if isinstance(key, str):
+            key_bytes = key.encode('utf-8')
+            sorted_start = self._offset + 1 + _DICT_HEADER.size + \
+                self._length * _ENTRY.size
+            low, high = 0, self._sorted_length
+            while low < high:
+                middle = (low + high) // 2
+                position, = _LENGTH.unpack_from(
+                    self._buffer, sorted_start + middle * _LENGTH.size)
+                key_offset, value_offset = self._entry(position)
+                current = self._str_key(key_offset)
+                if current == key_bytes:
+                    return value_offset
+                if current < key_bytes:
+                    low = middle + 1
+                else:
+                    high = middle
+            return None
+        for position in range(self._length):
+            key_offset, value_offset = self._entry(position)
+            if _decode(self._buffer, key_offset) == key:
+                return value_offset
+        return None
+
+    def __getitem__(self, key: typing.Any) -> typing.Any:
+        value_offset = self._find(key)
+        if value_offset is None:
+            raise KeyError(key)
+        return _decode_child(self._views, self._buffer, value_offset)
+
+    def __contains__(self, key: typing.Any) -> bool:
+        return self._find(key) is not None
+
+    def __iter__(self) -> typing.Iterator[typing.Any]:
+        for position in range(self._length):
+            yield _decode(self._buffer, self._entry(position)[0])
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class SnapshotSequence(collections.abc.Sequence):
+    """Read-only list view of snapshot image."""
+
+    __slots__ = ('_buffer', '_offset', '_length', '_views')
+
+    def __init__(self, buffer: typing.Any, offset: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._views = {}
+        self._length, = _LENGTH.unpack_from(buffer, offset + 1)
+
+    def __getitem__(self, index: typing.Union[int, slice]) -> typing.Any:
+        if isinstance(index, slice):
+            return [self[position]
+                    for position in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('snapshot sequence index out of range')
+        item_offset, = _OFFSET.unpack_from(
+            self._buffer,
+            self._offset + 1 + _LENGTH.size + index * _OFFSET.size)
+        return _decode_child(self._views, self._buffer, item_offset)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if isinstance(other, collections.abc.Sequence) and \
+                not isinstance(other, (str, bytes)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class ConfigurationSnapshot:
+    """Read-only configuration image in shared memory or memory mapped
+    file.
+
+    Create image once in parent process with `create()` (shared memory)
+    or `write()` (file), then `attach()` or `open()` it in worker processes
+    and use `configuration()` as ordinary `Configuration`. Nothing is
+    decoded until accessed and pages are shared between processes.
+    """
+
+    def __init__(
+        self,
+        buffer: typing.Any,
+        shared_memory: typing.Any = None,
+        mapped_file: typing.Optional[mmap.mmap] = None,
+    ):
+        magic, version, root_offset = _HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError('Invalid configuration snapshot image')
+        self.buffer = buffer
+        self.shared_memory = shared_memory
+        self.mapped_file = mapped_file
+        self.mapping = _decode(buffer, root_offset)
+
+    @property
+    def name(self) -> typing.Optional[str]:
+        """Shared memory block name."""
+        return self.shared_memory.name if self.shared_memory else None
+
+    @classmethod
+    def create(
+        cls,
+        config: typing.Any,
+        name: typing.Optional[str] = None,
+    ) -> 'ConfigurationSnapshot':
+        """Encode configuration into new shared memory block."""
+        from multiprocessing import shared_memory
+        image = encode_snapshot(config)
+        block = shared_memory.SharedMemory(
+            name=name, create=True, size=len(image))
+        block.buf[:len(image)] = image
+        return cls(block.buf, shared_memory=block)
+
+    @classmethod
+    def attach(cls, name: str) -> 'ConfigurationSnapshot':
+        """Attach to shared memory block created by `create()`."""
+        from multiprocessing import shared_memory, resource_tracker
+        block = shared_memory.SharedMemory(name=name)
+        # Only creator owns the block, don't let tracker unlink it when
+        # attached process exits
+        try:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        except Exception:
+            pass
+        return cls(block.buf, shared_memory=block)
+
+    @staticmethod
+    def write(config: typing.Any, snapshot_path: UniversalPath):
+        """Encode configuration into file."""
+        with open(snapshot_path, 'wb') as fp:
+            fp.write(encode_snapshot(config))
+
+    @classmethod
+    def open(cls, snapshot_path: UniversalPath) -> 'ConfigurationSnapshot':
+        """Memory map snapshot file written by `write()`."""
+        with open(snapshot_path, 'rb') as fp:
+            mapped_file = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped_file, mapped_file=mapped_file)
+
+    def configuration(
+        self,
+        configuration_class: typing.Type[Configuration] = Configuration,
+        schema: typing.Type[BaseConfigSchema] = BaseConfigSchema,
+    ) -> Configuration:
+        """Return configuration reading values from snapshot.
+
+        Top level dictionary is copied, so `_parse_<section>` hooks can set
+        keys; section values stay read-only snapshot views.
+        """
+        return configuration_class(dict(self.mapping), schema=schema)
+
+    def close(self):
+        """Detach from snapshot. Values read from it become invalid."""
+        self.mapping = None
+        self.buffer = None
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+        if self.mapped_file is not None:
+            self.mapped_file.close()
+
+    def unlink(self):
+        """Destroy shared memory block (creator only)."""
+        if self.shared_memory is not None:
+            self.shared_memory.unlink()
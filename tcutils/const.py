@@ -16,5 +16,7 @@ DEFAULT_REPLACEMENT_CHAR = '_'
 CLASS_METHOD_TYPES = [types.FunctionType, classmethod, staticmethod]
 
 DEFAULT_URI_SCHEME = 'file'
+DEFAULT_URI_CONCURRENCY = 8
+DEFAULT_URI_CHUNK_SIZE = 1024 * 1024
 
 DEFAULT_ADAPTER_METHOD = 'execute'
@@ -10,20 +10,45 @@ import logging
 import os
 import sys
 import io
+import gzip
+import bz2
+import lzma
+import mmap
 import unicodedata
 import pathlib
 import typing
 import tempfile
+import asyncio
+import functools
+import collections
+import concurrent.futures
 import urllib.request
 import urllib.response
 from dataclasses import dataclass
 from tcutils.const import VALID_FILENAME_CHARS, DEFAULT_REPLACEMENT_CHAR, \
-    DEFAULT_URI_SCHEME
+    DEFAULT_URI_SCHEME, DEFAULT_URI_CONCURRENCY, DEFAULT_URI_CHUNK_SIZE
 from tcutils.types import CharsList, UniversalPath, KeywordArgsType
 from tcutils.paths import normalize_path
 
 log = logging.getLogger(__file__)
 
+LOCAL_URI_MODES = ('mmap', 'raw')
+
+# Compression codecs by magic bytes and file extension
+COMPRESSION_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bz2',
+    b'\xfd7zXZ\x00': 'xz',
+}
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.tgz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.lzma': 'xz',
+}
+COMPRESSION_MAGIC_SIZE = max(len(magic) for magic in COMPRESSION_MAGIC)
+
 
 @dataclass
 class PosixPermissionTriad:
@@ -138,9 +163,36 @@ def open_uri(
     uri: str,
     default_uri_scheme: str=DEFAULT_URI_SCHEME,
     default_input_stream: io.StringIO=sys.stdin,
-    *args, **kwargs
-) -> typing.Union[urllib.response.addinfourl, io.StringIO]:
-    """Open URI and return stream handle."""
+    *args,
+    opener: typing.Optional[typing.Callable[..., typing.Any]] = None,
+    cache: typing.Optional[typing.Any] = None,
+    local_mode: typing.Optional[str] = None,
+    decompress: typing.Union[bool, str] = False,
+    **kwargs
+) -> typing.Union[urllib.response.addinfourl, io.StringIO, io.FileIO,
+                  mmap.mmap, 'DecompressedStream']:
+    """Open URI and return stream handle.
+
+    URL is opened by `opener` (e.g. `tcutils.httppool.PooledHTTPOpener`
+    to reuse keep-alive connections), `urllib.request.urlopen` by default.
+    If `cache` (`tcutils.uricache.URICache`) is given, remote URLs are
+    served from it and only keyword `kwargs` are passed to opener.
+
+    Local files (`file` URIs and paths) are opened directly when
+    `local_mode` is set: `raw` returns unbuffered `io.FileIO` and `mmap`
+    returns read-only `mmap.mmap` of the whole file (`io.FileIO` for empty
+    files, which can't be mapped). Other URIs ignore `local_mode`.
+
+    With `decompress` gzip, bzip2 and xz compressed contents are
+    decompressed on the fly (see `decompress_stream`); codec name
+    (`gzip`, `bz2` or `xz`) can be given instead of `True` to skip
+    detection.
+    """
+    if local_mode is not None and local_mode not in LOCAL_URI_MODES:
+        raise ValueError(f'Invalid local URI mode: {local_mode}')
+    if isinstance(decompress, str) and \
+            decompress not in COMPRESSION_MAGIC.values():
+        raise ValueError(f'Unsupported compression codec: {decompress}')
     if uri == '-':
         # Reading from stream
         if not hasattr(default_input_stream, 'name'):
@@ -163,4 +215,333 @@ def open_uri(
                 if not uri_path.startswith('/'):
                     uri_path = str(pathlib.Path().cwd() / uri_path)
                     parsed_uri = parsed_uri._replace(path=uri_path)
-    return urllib.request.urlopen(parsed_uri.geturl(), *args, **kwargs)
+    if local_mode is not None and parsed_uri.scheme == 'file' and \
+            parsed_uri.netloc in ('', 'localhost'):
+        stream = open_local_file(
+            urllib.request.url2pathname(parsed_uri.path), local_mode)
+    elif cache is not None:
+        if args:
+            raise TypeError(
+                'Positional opener arguments are not supported with cache')
+        stream = cache.open(parsed_uri.geturl(), opener=opener, **kwargs)
+    else:
+        if opener is None:
+            opener = urllib.request.urlopen
+        stream = opener(parsed_uri.geturl(), *args, **kwargs)
+    if not decompress:
+        return stream
+    return decompress_stream(
+        stream,
+        codec=None if decompress is True else decompress,
+        name=parsed_uri.path,
+    )
+
+
+def open_local_file(
+    path: UniversalPath,
+    local_mode: str = 'raw',
+) -> typing.Union[io.FileIO, mmap.mmap]:
+    """Open local file as unbuffered `io.FileIO` (`raw`) or read-only
+    `mmap.mmap` (`mmap`)."""
+    raw_file = io.FileIO(path, 'r')
+    if local_mode == 'raw':
+        return raw_file
+    try:
+        if os.fstat(raw_file.fileno()).st_size == 0:
+            return raw_file
+        mapped_file = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except BaseException:
+        raw_file.close()
+        raise
+    # Mapping stays valid after its file descriptor is closed
+    raw_file.close()
+    return mapped_file
+
+
+class DecompressedStream(io.BufferedIOBase):
+    """Streaming decompressing reader of compressed `source` stream.
+
+    Data is decompressed in small blocks as it is read, so memory use
+    doesn't depend on stream size. Closing it closes `source` too.
+    """
+
+    def __init__(self, source: typing.Any, codec: str):
+        super(DecompressedStream, self).__init__()
+        if codec == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=source, mode='rb')
+        elif codec == 'bz2':
+            self._stream = bz2.BZ2File(source)
+        elif codec == 'xz':
+            self._stream = lzma.LZMAFile(source)
+        else:
+            raise ValueError(f'Unsupported compression codec: {codec}')
+        self.source = source
+        self.codec = codec
+        self.name = getattr(source, 'name', None)
+        self.url = getattr(source, 'url', None)
+        self.headers = getattr(source, 'headers', None)
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: typing.Optional[int] = -1) -> bytes:
+        return self._stream.read(-1 if size is None else size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self._stream.read1(size)
+
+    def readinto(self, buffer: typing.Any) -> int:
+        return self._stream.readinto(buffer)
+
+    def readline(self, size: typing.Optional[int] = -1) -> bytes:
+        return self._stream.readline(-1 if size is None else size)
+
+    def peek(self, size: int = 0) -> bytes:
+        return self._stream.peek(size)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._stream.close()
+        finally:
+            try:
+                self.source.close()
+            finally:
+                super(DecompressedStream, self).close()
+
+
+def _peek_magic(stream: typing.Any) -> typing.Optional[bytes]:
+    """Return leading bytes of stream without consuming them or `None`
+    if stream can't be peeked."""
+    if isinstance(stream, mmap.mmap):
+        position = stream.tell()
+        return stream[position:position + COMPRESSION_MAGIC_SIZE]
+    if hasattr(stream, 'peek'):
+        return stream.peek(COMPRESSION_MAGIC_SIZE)[:COMPRESSION_MAGIC_SIZE]
+    if hasattr(stream, 'seekable') and stream.seekable():
+        position = stream.tell()
+        data = stream.read(COMPRESSION_MAGIC_SIZE)
+        stream.seek(position)
+        return data
+    return None
+
+
+def compression_codec(
+    stream: typing.Any,
+    name: typing.Optional[str] = None,
+) -> typing.Optional[str]:
+    """Detect compression codec of binary stream by its magic bytes.
+
+    File extension of `name` is used only when stream can't be peeked,
+    or its beginning is too short to tell.
+    """
+    magic = _peek_magic(stream)
+    if magic is not None:
+        for codec_magic, codec in COMPRESSION_MAGIC.items():
+            if magic.startswith(codec_magic):
+                return codec
+        if len(magic) >= COMPRESSION_MAGIC_SIZE:
+            return None
+    if name:
+        return COMPRESSION_EXTENSIONS.get(
+            os.path.splitext(name)[1].lower())
+    return None
+
+
+def decompress_stream(
+    stream: typing.Any,
+    codec: typing.Optional[str] = None,
+    name: typing.Optional[str] = None,
+) -> typing.Any:
+    """Return `DecompressedStream` of compressed binary stream, or stream
+    itself if it's not compressed (or is text stream).
+
+    Codec is detected with `compression_codec` unless given.
+    """
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    if codec is None:
+        codec = compression_codec(
+            stream, name or getattr(stream, 'name', None))
+        if codec is None:
+            return stream
+    return DecompressedStream(stream, codec)
+
+
+def iter_chunks(
+    stream: typing.Any,
+    chunk_size: int = DEFAULT_URI_CHUNK_SIZE,
+) -> typing.Iterator[memoryview]:
+    """Iterate over stream (e.g. result of `open_uri`) in chunks of at most
+    `chunk_size` bytes without copying them.
+
+    Memory mapped files are sliced directly, other binary streams are read
+    with `readinto` into single reused buffer. Every chunk is released when
+    next one is requested, so copy it (`bytes(chunk)`) to keep it longer.
+    Text streams are encoded as UTF-8.
+    """
+    if isinstance(stream, mmap.mmap):
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            stream.madvise(mmap.MADV_SEQUENTIAL)
+        with memoryview(stream) as view:
+            position = stream.tell()
+            while position < len(view):
+                with view[position:position + chunk_size] as chunk:
+                    position += len(chunk)
+                    stream.seek(position)
+                    yield chunk
+        return
+    if hasattr(stream, 'readinto') and not isinstance(stream, io.TextIOBase):
+        with memoryview(bytearray(chunk_size)) as buffer:
+            while True:
+                size = stream.readinto(buffer)
+                if not size:
+                    return
+                with buffer[:size] as chunk:
+                    yield chunk
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        yield memoryview(data)
+
+
+def iter_uri_chunks(
+    uri: str,
+    *args,
+    chunk_size: int = DEFAULT_URI_CHUNK_SIZE,
+    local_mode: typing.Optional[str] = 'mmap',
+    **kwargs
+) -> typing.Iterator[memoryview]:
+    """Open URI (see `open_uri`) and iterate over its contents with
+    `iter_chunks`. Local files are memory mapped by default."""
+    stream = open_uri(uri, *args, local_mode=local_mode, **kwargs)
+    try:
+        yield from iter_chunks(stream, chunk_size)
+    finally:
+        # Don't close standard input
+        if uri != '-':
+            stream.close()
+
+
+@dataclass
+class URIResult:
+    """Result of fetching single URI with `open_uris`."""
+    uri: str
+    index: int
+    data: typing.Union[None, bytes, str] = None
+    error: typing.Optional[BaseException] = None
+
+
+def fetch_uri(
+    uri: str,
+    index: int = 0,
+    *args,
+    **kwargs
+) -> URIResult:
+    """Read whole URI (see `open_uri`), returning error in result instead
+    of raising it."""
+    try:
+        stream = open_uri(uri, *args, **kwargs)
+        try:
+            data = stream.read()
+        finally:
+            # Don't close standard input
+            if uri != '-':
+                stream.close()
+    except Exception as e:
+        log.error(f'Error fetching URI "{uri}": {e}')
+        return URIResult(uri, index, error=e)
+    return URIResult(uri, index, data=data)
+
+
+def open_uris(
+    uris: typing.Iterable[str],
+    *args,
+    max_concurrency: int = DEFAULT_URI_CONCURRENCY,
+    ordered: bool = False,
+    **kwargs
+) -> typing.Iterator[URIResult]:
+    """Fetch many URIs concurrently on thread pool.
+
+    At most `max_concurrency` URIs are fetched at once and no more are
+    read from `uris` until there is a free slot. Results are yielded
+    as they complete, or in input order if `ordered` is `True`. Errors are
+    reported in `URIResult` instead of aborting the whole batch. `args`
+    and `kwargs` are passed to `open_uri` (e.g. shared `opener`).
+    """
+    uris = iter(uris)
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency) as executor:
+        pending = collections.deque()
+        for index, uri in enumerate(uris):
+            pending.append(executor.submit(
+                fetch_uri, uri, index, *args, **kwargs))
+            if len(pending) < max_concurrency:
+                continue
+            if ordered:
+                yield pending.popleft().result()
+                continue
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield future.result()
+        if ordered:
+            for future in pending:
+                yield future.result()
+        else:
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
+
+
+async def open_uris_async(
+    uris: typing.Iterable[str],
+    *args,
+    max_concurrency: int = DEFAULT_URI_CONCURRENCY,
+    ordered: bool = False,
+    **kwargs
+) -> typing.AsyncIterator[URIResult]:
+    """Asynchronous variant of `open_uris`.
+
+    Blocking fetches run in event loop default executor, at most
+    `max_concurrency` at once, so event loop is never blocked. Like
+    `open_uris`, no more URIs are read from `uris` until there is a free
+    slot.
+    """
+    loop = asyncio.get_running_loop()
+    pending = collections.deque()
+
+    def submit(index: int, uri: str) -> asyncio.Future:
+        return loop.run_in_executor(None, functools.partial(
+            fetch_uri, uri, index, *args, **kwargs))
+
+    async def completed() -> typing.AsyncIterator[URIResult]:
+        done, _ = await asyncio.wait(
+            pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+    try:
+        for index, uri in enumerate(uris):
+            pending.append(submit(index, uri))
+            if len(pending) < max_concurrency:
+                continue
+            if ordered:
+                yield await pending.popleft()
+                continue
+            async for result in completed():
+                yield result
+        while pending:
+            if ordered:
+                yield await pending.popleft()
+                continue
+            async for result in completed():
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
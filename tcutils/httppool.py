@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import io
+import ssl
+import logging
+import threading
+import typing
+import collections
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+
+log = logging.getLogger(__file__)
+
+# Idle keep-alive connections kept per host
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_REDIRECTS = 10
+DEFAULT_USER_AGENT = 'tcutils'
+# Unread response body up to this size is drained on close, so connection
+# can be reused; connections with more unread data are closed
+DRAIN_LIMIT = 64 * 1024
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+PoolKey = typing.Tuple[str, str, int]
+
+# Errors of reused idle connection that server has already closed
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class HTTPConnectionPool:
+    """Thread safe pool of idle keep-alive HTTP(S) connections.
+
+    Up to `pool_size` idle connections are kept per (scheme, host, port).
+    When all are in use new connection is opened; connections released
+    to full pool are closed.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: typing.Optional[float] = None,
+        ssl_context: typing.Optional[ssl.SSLContext] = None,
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(
+        self,
+        key: PoolKey,
+    ) -> typing.Tuple[http.client.HTTPConnection, bool]:
+        """Return connection for `key` and flag that is `True` if it was
+        reused."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.created += 1
+        scheme, host, port = key
+        if scheme == 'https':
+            connection = http.client.HTTPSConnection(
+                host, port, timeout=self.timeout, context=self.ssl_context)
+        else:
+            connection = http.client.HTTPConnection(
+                host, port, timeout=self.timeout)
+        return connection, False
+
+    def release(self, key: PoolKey, connection: http.client.HTTPConnection):
+        """Return idle connection to pool."""
+        with self._lock:
+            idle = self._idle.setdefault(key, collections.deque())
+            if len(idle) < self.pool_size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def clear(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class PooledHTTPResponse(io.BufferedIOBase):
+    """Response of `PooledHTTPOpener`, compatible with `urlopen` result.
+
+    Connection goes back to pool when response is closed after its body
+    was read.
+    """
+
+    def __init__(
+        self,
+        response: http.client.HTTPResponse,
+        url: str,
+        pool: HTTPConnectionPool,
+        key: PoolKey,
+        connection: http.client.HTTPConnection,
+    ):
+        super(PooledHTTPResponse, self).__init__()
+        self._response = response
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self.url = url
+        self.headers = response.headers
+        self.status = self.code = response.status
+        self.reason = self.msg = response.reason
+        self.name = url
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: typing.Optional[int] = -1) -> bytes:
+        return self._response.read(None if size is None or size < 0 else size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self._response.read1(size)
+
+    def readinto(self, buffer: typing.Any) -> int:
+        return self._response.readinto(buffer)
+
+    def readline(self, size: typing.Optional[int] = -1) -> bytes:
+        return self._response.readline(-1 if size is None else size)
+
+    def peek(self, size: int = 0) -> bytes:
+        return self._response.peek(size)
+
+    def geturl(self) -> str:
+        return self.url
+
+    def getcode(self) -> int:
+        return self.status
+
+    def info(self) -> http.client.HTTPMessage:
+        return self.headers
+
+    def getheader(
+        self,
+        name: str,
+        default: typing.Optional[str] = None,
+    ) -> typing.Optional[str]:
+        return self._response.getheader(name, default)
+
+    def close(self):
+        if self.closed:
+            return
+        response = self._response
+        connection = self._connection
+        self._connection = None
+        try:
+            if connection is not None:
+                if not response.isclosed() and response.length is not None \
+                        and response.length <= DRAIN_LIMIT:
+                    try:
+                        response.read()
+                    except (OSError, http.client.HTTPException):
+                        pass
+                if response.isclosed() and not response.will_close:
+                    self._pool.release(self._key, connection)
+                else:
+                    connection.close()
+            response.close()
+        finally:
+            super(PooledHTTPResponse, self).close()
+
+
+class PooledHTTPOpener:
+    """URL opener reusing keep-alive connections for `http` and `https`
+    URLs (see `HTTPConnectionPool`). Other schemes are opened
+    by `urllib.request.urlopen`.
+
+    Like `urlopen`, redirects are followed and `urllib.error.HTTPError`
+    is raised for error responses. Proxy settings from environment are
+    not used. Can be passed as `opener` to `tcutils.fs.open_uri`.
+
+    Of other `urlopen` arguments only `timeout` is accepted; TLS options
+    are set once with `ssl_context`.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: typing.Optional[float] = None,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        max_redirects: int = DEFAULT_MAX_REDIRECTS,
+        ssl_context: typing.Optional[ssl.SSLContext] = None,
+    ):
+        self.pool = HTTPConnectionPool(pool_size, timeout, ssl_context)
+        self.headers = {'User-Agent': DEFAULT_USER_AGENT}
+        self.headers.update(headers or {})
+        self.max_redirects = max_redirects
+
+    def __call__(
+        self,
+        url: str,
+        data: typing.Optional[bytes] = None,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        method: typing.Optional[str] = None,
+        timeout: typing.Optional[float] = None,
+    ) -> typing.Any:
+        """Open `url` and return response.
+
+        `timeout` (seconds) overrides pool timeout for this request.
+        """
+        if timeout is None:
+            timeout = self.pool.timeout
+        scheme = urllib.parse.urlsplit(url).scheme
+        if scheme not in ('http', 'https'):
+            if timeout is None:
+                return urllib.request.urlopen(url, data)
+            return urllib.request.urlopen(url, data, timeout)
+        if method is None:
+            method = 'GET' if data is None else 'POST'
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        for _ in range(self.max_redirects + 1):
+            response = self._request(
+                method, url, data, request_headers, timeout)
+            location = response.getheader('Location')
+            if response.status in REDIRECT_CODES and location:
+                response.close()
+                url = urllib.parse.urljoin(url, location)
+                if response.status == 303 or (
+                        response.status in (301, 302) and method == 'POST'):
+                    method, data = 'GET', None
+                continue
+            if response.status >= 400:
+                raise urllib.error.HTTPError(
+                    url, response.status, response.reason,
+                    response.headers, response)
+            return response
+        response.close()
+        raise urllib.error.HTTPError(
+            url, response.status, 'Too many redirects',
+            response.headers, None)
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        data: typing.Optional[bytes],
+        headers: typing.Mapping[str, str],
+        timeout: typing.Optional[float],
+    ) -> PooledHTTPResponse:
+        parsed_url = urllib.parse.urlsplit(url)
+        port = parsed_url.port or (
+            443 if parsed_url.scheme == 'https' else 80)
+        key = (parsed_url.scheme, parsed_url.hostname, port)
+        path = parsed_url.path or '/'
+        if parsed_url.query:
+            path = f'{path}?{parsed_url.query}'
+        while True:
+            connection, reused = self.pool.acquire(key)
+            # Pooled connection may have been used with other timeout
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+            except _STALE_CONNECTION_ERRORS as e:
+                connection.close()
+                if reused:
+                    log.debug(f'Reconnecting stale connection to {key}: {e}')
+                    continue
+                raise urllib.error.URLError(e)
+            except OSError as e:
+                connection.close()
+                raise urllib.error.URLError(e)
+            return PooledHTTPResponse(
+                response, url, self.pool, key, connection)
+
+    def close(self):
+        """Close all idle connections."""
+        self.pool.clear()
+
+    def __enter__(self) -> 'PooledHTTPOpener':
+        return self
+
+    def __exit__(self, *exc_info: typing.Any):
+        self.close()
@@ -7,10 +7,14 @@
 #
 
 import pathlib
-from marshmallow import fields, ValidationError
+import typing
+import dataclasses
+from marshmallow import Schema, fields, ValidationError
 
 from tcutils.fs import PosixPermissions
 
+_SCHEMA_CONFIG_CLASSES = {}
+
 
 class PathField(fields.Field):
     """Field that serializes Path to string and deserializes to pathlib.Path.
@@ -43,3 +47,67 @@ class PosixPermissionsField(fields.Field):
             return PosixPermissions.from_octal(value)
         except Exception as e:
             raise ValidationError(f'{e}')
+
+
+def _field_converter(field: fields.Field) -> typing.Callable:
+    """Return function converting dumped field value to its typed
+    counterpart."""
+    if isinstance(field, fields.Nested):
+        nested_class = type(field.schema)
+
+        def convert_nested(value):
+            if value is None:
+                return None
+            config_class = schema_config_class(nested_class)
+            if field.many:
+                return tuple(config_class.from_dict(item) for item in value)
+            return config_class.from_dict(value)
+        return convert_nested
+    if isinstance(field, fields.List):
+        convert_item = _field_converter(field.inner)
+        return lambda value: None if value is None else tuple(
+            convert_item(item) for item in value)
+    if isinstance(field, fields.Dict) and field.value_field is not None:
+        convert_value = _field_converter(field.value_field)
+        return lambda value: None if value is None else {
+            key: convert_value(item) for key, item in value.items()}
+    return lambda value: value
+
+
+def schema_config_class(schema_class: typing.Type[Schema]) -> typing.Type:
+    """Return frozen slotted dataclass generated from `schema_class`.
+
+    Class has one attribute per dumped schema field and `from_dict`
+    class method that builds instance from dumped configuration. Nested
+    schemas become nested classes, lists become tuples. Generated
+    classes are cached per schema class.
+    """
+    if schema_class in _SCHEMA_CONFIG_CLASSES:
+        return _SCHEMA_CONFIG_CLASSES[schema_class]
+    schema = schema_class()
+    converters = {
+        name: (field.data_key or name, _field_converter(field))
+        for name, field in schema.dump_fields.items()
+    }
+
+    def from_dict(cls, data: typing.Mapping[str, typing.Any]):
+        return cls(**{
+            name: convert(data.get(key))
+            for name, (key, convert) in converters.items()
+        })
+
+    class_name = schema_class.__name__
+    if class_name.endswith('Schema') and class_name != 'Schema':
+        class_name = class_name[:-len('Schema')]
+    config_class = dataclasses.make_dataclass(
+        class_name,
+        [(name, typing.Any) for name in converters],
+        namespace={
+            '__slots__': tuple(converters),
+            'from_dict': classmethod(from_dict),
+        },
+        frozen=True,
+    )
+    config_class.__module__ = schema_class.__module__
+    _SCHEMA_CONFIG_CLASSES[schema_class] = config_class
+    return config_class
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import contextlib
+import typing
+import urllib.error
+import urllib.parse
+import urllib.request
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from tcutils.types import UniversalPath
+from tcutils.paths import normalize_path
+
+log = logging.getLogger(__file__)
+
+DEFAULT_URI_CACHE_SIZE = 1024 * 1024 * 1024
+META_FILE_SUFFIX = '.meta'
+BODY_FILE_SUFFIX = '.body'
+COPY_BUFFER_SIZE = 1024 * 1024
+
+CACHED_SCHEMES = ('http', 'https')
+# Entries share lock files by first hex digits of their key, so number
+# of lock files stays bounded
+LOCK_BUCKET_DIGITS = 2
+
+
+class URICache:
+    """On-disk cache of remote (`http` and `https`) URIs.
+
+    Every entry is a body file and a JSON metadata file with `ETag`
+    and `Last-Modified` of the response. Cached entries are revalidated
+    with conditional request (unless younger than `max_age` seconds) and
+    served from local file handle when unchanged. If revalidation fails,
+    stale entry is served.
+
+    Total size of bodies is kept under `max_size` bytes by evicting least
+    recently used entries. Entries are written to temporary files and
+    renamed, and downloads and evictions are serialized with `fcntl` file
+    locks (one per bucket of entries), so cache directory can be shared
+    by many processes (without `fcntl` only single process use is safe).
+
+    URL is opened by `opener` (it must accept `headers` keyword, e.g.
+    `tcutils.httppool.PooledHTTPOpener`), `urllib.request.urlopen`
+    by default.
+    """
+
+    def __init__(
+        self,
+        cache_dir: UniversalPath,
+        max_size: typing.Optional[int] = DEFAULT_URI_CACHE_SIZE,
+        max_age: typing.Optional[float] = None,
+        opener: typing.Optional[typing.Callable[..., typing.Any]] = None,
+    ):
+        self.cache_dir = normalize_path(cache_dir)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.opener = opener
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _entry_lock(self, key: str) -> typing.ContextManager[None]:
+        """Hold lock of bucket of entry `key`."""
+        return self._lock(f'bucket-{key[:LOCK_BUCKET_DIGITS]}')
+
+    @contextlib.contextmanager
+    def _lock(self, name: str) -> typing.Iterator[None]:
+        """Hold exclusive lock of `name` lock file."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.cache_dir / f'{name}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_meta(self, key: str) -> typing.Optional[typing.Dict]:
+        try:
+            with open(self.cache_dir / f'{key}{META_FILE_SUFFIX}') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, meta: typing.Dict[str, typing.Any]):
+        fd, temp_name = tempfile.mkstemp(
+            dir=str(self.cache_dir), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(meta, fp)
+            os.replace(
+                temp_name, str(self.cache_dir / f'{key}{META_FILE_SUFFIX}'))
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+    def _open_body(
+        self,
+        meta: typing.Dict[str, typing.Any],
+    ) -> typing.Optional[typing.BinaryIO]:
+        try:
+            return open(self.cache_dir / meta['body'], 'rb')
+        except OSError:
+            return None
+
+    def _touch(self, key: str):
+        """Mark entry as recently used."""
+        try:
+            os.utime(self.cache_dir / f'{key}{META_FILE_SUFFIX}')
+        except OSError:
+            pass
+
+    def _request(
+        self,
+        url: str,
+        headers: typing.Dict[str, str],
+        opener: typing.Optional[typing.Callable[..., typing.Any]],
+        opener_kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        """Open `url`, return `None` if it was not modified."""
+        try:
+            if opener is not None:
+                response = opener(url, headers=headers, **opener_kwargs)
+            else:
+                response = urllib.request.urlopen(
+                    urllib.request.Request(url, headers=headers),
+                    **opener_kwargs)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                e.close()
+                return None
+            raise e
+        if getattr(response, 'status', None) == 304:
+            response.close()
+            return None
+        return response
+
+    def _store(
+        self,
+        key: str,
+        url: str,
+        response: typing.Any,
+        old_meta: typing.Optional[typing.Dict[str, typing.Any]],
+    ) -> typing.Dict[str, typing.Any]:
+        """Write response body and metadata of new entry."""
+        fd, temp_name = tempfile.mkstemp(
+            dir=str(self.cache_dir), prefix=f'{key}-',
+            suffix=BODY_FILE_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                shutil.copyfileobj(response, fp, COPY_BUFFER_SIZE)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+        finally:
+            response.close()
+        headers = response.headers
+        meta = {
+            'url': url,
+            'body': os.path.basename(temp_name),
+            'size': os.path.getsize(temp_name),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'validated': time.time(),
+        }
+        self._write_meta(key, meta)
+        # Readers that opened previous body keep their handles
+        if old_meta is not None and old_meta['body'] != meta['body']:
+            with contextlib.suppress(OSError):
+                os.unlink(self.cache_dir / old_meta['body'])
+        return meta
+
+    def open(
+        self,
+        url: str,
+        opener: typing.Optional[typing.Callable[..., typing.Any]] = None,
+        **opener_kwargs: typing.Any,
+    ) -> typing.Any:
+        """Return binary file handle of cached `url` body, downloading
+        or revalidating it first if needed.
+
+        `opener_kwargs` (e.g. `timeout`) are passed to opener. URLs of other
+        than `http` and `https` schemes are opened directly.
+        """
+        if opener is None:
+            opener = self.opener
+        if urllib.parse.urlsplit(url).scheme not in CACHED_SCHEMES:
+            return (opener or urllib.request.urlopen)(url, **opener_kwargs)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        key = self._key(url)
+        with self._entry_lock(key):
+            meta = self._read_meta(key)
+            if meta is not None and self.max_age is not None and \
+                    time.time() - meta['validated'] < self.max_age:
+                body = self._open_body(meta)
+                if body is not None:
+                    self.hits += 1
+                    self._touch(key)
+                    return body
+            headers = {}
+            if meta is not None:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+            try:
+                response = self._request(url, headers, opener, opener_kwargs)
+            except (urllib.error.URLError, OSError) as e:
+                # Serve stale entry only if server can't be reached
+                if isinstance(e, urllib.error.HTTPError) and e.code < 500:
+                    raise e
+                body = None if meta is None else self._open_body(meta)
+                if body is None:
+                    log.error(f'Error fetching URI "{url}": {e}')
+                    raise e
+                log.warning(f'Serving stale cached "{url}": {e}')
+                if isinstance(e, urllib.error.HTTPError):
+                    e.close()
+                self.hits += 1
+                return body
+            if response is None:
+                body = self._open_body(meta)
+                if body is not None:
+                    self.hits += 1
+                    meta['validated'] = time.time()
+                    self._write_meta(key, meta)
+                    return body
+                # Body is gone, fetch it again unconditionally
+                response = self._request(url, {}, opener, opener_kwargs)
+            self.misses += 1
+            meta = self._store(key, url, response, meta)
+            body = self._open_body(meta)
+        self.evict()
+        return body
+
+    def entries(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Return metadata of all entries, least recently used first."""
+        entries = []
+        for meta_path in self.cache_dir.glob(f'*{META_FILE_SUFFIX}'):
+            try:
+                used = meta_path.stat().st_mtime
+            except OSError:
+                continue
+            meta = self._read_meta(meta_path.name[:-len(META_FILE_SUFFIX)])
+            if meta is not None:
+                entries.append((used, meta_path.name, meta))
+        entries.sort(key=lambda entry: entry[:2])
+        return [meta for _, _, meta in entries]
+
+    def size(self) -> int:
+        """Return total size of cached bodies."""
+        return sum(meta['size'] for meta in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries above `max_size`."""
+        if self.max_size is None or not self.cache_dir.exists():
+            return
+        with self._lock('evict'):
+            entries = self.entries()
+            total = sum(meta['size'] for meta in entries)
+            for meta in entries:
+                if total <= self.max_size:
+                    break
+                self.remove(meta['url'])
+                total -= meta['size']
+
+    def remove(self, url: str):
+        """Remove cached `url`. Lock file of its bucket is kept, since
+        other processes may be waiting for it."""
+        key = self._key(url)
+        with self._entry_lock(key):
+            meta = self._read_meta(key)
+            with contextlib.suppress(OSError):
+                os.unlink(self.cache_dir / f'{key}{META_FILE_SUFFIX}')
+            if meta is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(self.cache_dir / meta['body'])
+
+    def clear(self):
+        """Remove all entries."""
+        for meta in self.entries():
+            self.remove(meta['url'])
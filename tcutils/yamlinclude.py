@@ -6,29 +6,947 @@
 # Copyright (c) 2019-2020 TropiCoders Karol Tomala
 #
 
+import copy
+import glob
+import json
 import yaml
 import os.path
 import pathlib
+import threading
+import time
+import types
+import typing
+import collections
+import collections.abc
+import concurrent.futures
+from dataclasses import dataclass
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
-class IncludeLoader(yaml.SafeLoader):
+# Default file patterns of !include_dir
+INCLUDE_DIR_PATTERNS = ('*.yaml', '*.yml')
 
-    """Yaml Loader that allows for !include directive within Yaml file.
+# Default bounds of process-wide FRAGMENT_CACHE
+DEFAULT_FRAGMENT_CACHE_ENTRIES = 1024
+DEFAULT_FRAGMENT_CACHE_SIZE = 64 * 1024 * 1024
+
+
+def decode_json(file_handle: typing.BinaryIO) -> typing.Any:
+    """Decode JSON include."""
+    return json.loads(file_handle.read())
+
+
+def decode_msgpack(file_handle: typing.BinaryIO) -> typing.Any:
+    """Decode MessagePack include (requires `msgpack` package)."""
+    if msgpack is None:
+        raise ImportError(
+            f'msgpack package is required to include "{file_handle.name}"')
+    return msgpack.unpackb(
+        file_handle.read(), raw=False, strict_map_key=False)
+
+
+# Decoders of included files by lowercase file suffix, other files are
+# parsed as Yaml. Pickle is deliberately not supported, since loading it
+# executes arbitrary code.
+INCLUDE_DECODERS = {
+    '.json': decode_json,
+    '.msgpack': decode_msgpack,
+}
+
+
+class IncludeCycleError(yaml.YAMLError):
+
+    """Raised when file includes itself, directly or through other files.
+    """
+
+    def __init__(self, chain: typing.Sequence[str]):
+        self.chain = tuple(chain)
+        super(IncludeCycleError, self).__init__(
+            'Include cycle detected: ' + ' -> '.join(self.chain))
+
+
+def freeze_config(value: typing.Any) -> typing.Any:
+    """Return deep read-only copy of configuration value.
+
+    Mappings become `types.MappingProxyType`, lists become tuples.
+    Values that are already frozen are returned unchanged.
     """
+    if isinstance(value, types.MappingProxyType):
+        return value
+    if isinstance(value, collections.abc.Mapping):
+        return types.MappingProxyType({
+            key: freeze_config(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_config(item) for item in value)
+    return value
+
+
+FragmentSignature = typing.Tuple[str, int, int]
+
+# Glob pattern of !include_glob or !include_dir and whether `**` in it
+# matches subdirectories
+GlobPattern = typing.Tuple[str, bool]
+GlobSignature = typing.Tuple[str, bool, typing.Tuple[str, ...]]
+
+
+def glob_files(pattern: str, recursive: bool = True) -> typing.List[str]:
+    """Return sorted paths of files matching glob `pattern`."""
+    return sorted(
+        filename for filename in glob.glob(pattern, recursive=recursive)
+        if os.path.isfile(filename))
+
+
+def glob_signature(glob_pattern: GlobPattern) -> GlobSignature:
+    """Return glob pattern together with paths of files it matches."""
+    pattern, recursive = glob_pattern
+    return (pattern, recursive, tuple(glob_files(pattern, recursive)))
+
+
+def fragment_signature(path: str) -> FragmentSignature:
+    """Return path, mtime and size of file."""
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass(frozen=True)
+class FragmentCacheInfo:
+    """Statistics of `FragmentCache`."""
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_entries: typing.Optional[int]
+    max_size: typing.Optional[int]
+
+
+class FragmentCache:
+    """Thread safe LRU cache of parsed Yaml files.
+
+    Entry is keyed by resolved path and holds stat signatures of the file
+    and of every file it transitively includes, and files matched by every
+    `!include_glob`/`!include_dir` pattern; it is used only while all
+    of them are unchanged. Cache is bounded by number of entries and
+    by approximate size (sum of file sizes in bytes); `None` means
+    no limit.
+
+    Every `get()` returns deep copy of cached data, unless cache is
+    `frozen`, in which case read-only data (see `freeze_config`) is
+    stored and shared without copying.
+    """
+
+    def __init__(
+        self,
+        max_entries: typing.Optional[int] = DEFAULT_FRAGMENT_CACHE_ENTRIES,
+        max_size: typing.Optional[int] = DEFAULT_FRAGMENT_CACHE_SIZE,
+        frozen: bool = False,
+    ):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.frozen = frozen
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
-    def __init__(self, stream):
+    def __contains__(self, path: str) -> bool:
+        return os.path.realpath(path) in self._entries
+
+    def _remove(self, resolved_path: str):
+        entry = self._entries.pop(resolved_path)
+        self._size -= entry[3]
+
+    def get(
+        self,
+        resolved_path: str,
+    ) -> typing.Optional[typing.Tuple[
+            typing.Any, typing.List[str], typing.List[GlobPattern]]]:
+        """Return data, dependencies and glob patterns of cached file
+        or `None` if it is not cached or any of its files changed."""
+        with self._lock:
+            entry = self._entries.get(resolved_path)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(resolved_path)
+        signatures, data, dependencies, _, glob_signatures = entry
+        try:
+            fresh = all(
+                fragment_signature(signature[0]) == signature
+                for signature in signatures) and all(
+                glob_signature(signature[:2]) == signature
+                for signature in glob_signatures)
+        except OSError:
+            fresh = False
+        with self._lock:
+            if not fresh:
+                self.misses += 1
+                if self._entries.get(resolved_path) is entry:
+                    self._remove(resolved_path)
+                return None
+            self.hits += 1
+        if not self.frozen:
+            data = copy.deepcopy(data)
+        return data, list(dependencies), \
+            [signature[:2] for signature in glob_signatures]
+
+    def set(
+        self,
+        resolved_path: str,
+        signature: FragmentSignature,
+        data: typing.Any,
+        dependencies: typing.Sequence[str],
+        globs: typing.Iterable[GlobPattern] = (),
+    ) -> typing.Any:
+        """Store parsed file with `signature` taken before it was read,
+        signatures of its `dependencies` and files matched by `globs`.
+
+        Return data that should be used by caller: `data` itself,
+        or its read-only copy if cache is `frozen`.
+        """
+        if self.frozen:
+            data = freeze_config(data)
+        try:
+            signatures = (signature,) + tuple(
+                fragment_signature(path)
+                for path in dict.fromkeys(dependencies)
+                if path != resolved_path)
+            glob_signatures = tuple(
+                glob_signature(tuple(glob_pattern))
+                for glob_pattern in dict.fromkeys(
+                    tuple(glob_pattern) for glob_pattern in globs))
+        except OSError:
+            return data
+        size = sum(signature[2] for signature in signatures)
+        if self.max_size is not None and size > self.max_size:
+            return data
+        entry = (
+            signatures,
+            data if self.frozen else copy.deepcopy(data),
+            tuple(dependencies),
+            size,
+            glob_signatures,
+        )
+        with self._lock:
+            if resolved_path in self._entries:
+                self._remove(resolved_path)
+            self._entries[resolved_path] = entry
+            self._size += size
+            while self._entries and (
+                    (self.max_entries is not None
+                     and len(self._entries) > self.max_entries)
+                    or (self.max_size is not None
+                        and self._size > self.max_size)):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return data
+
+    def invalidate(self, path: typing.Optional[str] = None):
+        """Forget `path` and every cached file that includes it, or whole
+        cache if `path` is not given."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            resolved_path = os.path.realpath(path)
+            for cached_path, entry in list(self._entries.items()):
+                if cached_path == resolved_path or \
+                        resolved_path in entry[2]:
+                    self._remove(cached_path)
+
+    def info(self) -> FragmentCacheInfo:
+        """Return cache statistics."""
+        with self._lock:
+            return FragmentCacheInfo(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                size=self._size,
+                max_entries=self.max_entries,
+                max_size=self.max_size,
+            )
+
+    def reset_stats(self):
+        """Zero hit, miss and eviction counters."""
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+
+# Process-wide cache that include loaders can share (see `fragment_cache`)
+FRAGMENT_CACHE = FragmentCache()
+
+# Marks loader argument that was not given
+_MISSING = object()
+
+
+class IncludeLoaderMixin:
+
+    """Mixin implementing !include directive for Yaml loaders.
+
+    Every distinct file is parsed only once per load; repeated includes
+    reuse result from `include_cache` which is shared with loaders
+    of included files. Every include gets its own deep copy, unless
+    `copy_includes` is `False` and the same object is shared.
+
+    Direct includes of every file are recorded in `include_graph`
+    (resolved path to list of resolved included paths). If `include_nodes`
+    dictionary is given, composed root node of every included file is
+    stored in it under resolved path (e.g. for source line lookup).
+    If `include_times` dictionary is given, time spent loading every
+    included file (including files it includes) is added to it
+    under resolved path.
+
+    `!include_glob` and `!include_dir` load many fragment files, serially
+    or on thread pool if `include_workers` is not 1 (`None` means
+    `ThreadPoolExecutor` default). Their glob patterns
+    are collected in `included_globs` (files they matched are
+    in `included_files`), so callers can notice added or removed
+    fragments; if `include_globs` dictionary is given, patterns are also
+    stored in it under resolved path of file that uses them.
+    If `include_signatures` dictionary is given, stat signature of every
+    parsed file (taken before it is read) is stored in it under resolved
+    path and glob signature of every glob pattern (taken before matched
+    files are read) under `(pattern, recursive)` tuple.
+    `!include_lazy` returns `LazyInclude` proxy parsed on first access.
+
+    Files with suffix registered in `INCLUDE_DECODERS` (`.json`,
+    `.msgpack`) are decoded by their decoder instead of Yaml parser.
+
+    If `fragment_cache` is given (e.g. process-wide `FRAGMENT_CACHE`),
+    parsed files are also kept in it, so later loads do not parse
+    unchanged files again.
+    """
+
+    copy_includes = True
+    # Threads loading !include_glob and !include_dir fragments (None means
+    # ThreadPoolExecutor default). Parsing holds the GIL, so threads only
+    # help when fragments are on slow (e.g. network) storage.
+    include_workers = 1
+    # Cache of parsed files shared between loads (None disables it)
+    fragment_cache = None
+
+    def __init__(
+        self,
+        stream,
+        include_cache: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        include_chain: typing.Optional[typing.Sequence[str]] = None,
+        copy_includes: typing.Optional[bool] = None,
+        include_graph: typing.Optional[
+            typing.Dict[str, typing.List[str]]] = None,
+        include_nodes: typing.Optional[
+            typing.Dict[str, yaml.Node]] = None,
+        fragment_cache: typing.Optional[FragmentCache] = _MISSING,
+        include_times: typing.Optional[typing.Dict[str, float]] = None,
+        include_globs: typing.Optional[
+            typing.Dict[str, typing.List[GlobPattern]]] = None,
+        include_signatures: typing.Optional[typing.Dict[
+            typing.Any, typing.Union[
+                FragmentSignature, GlobSignature]]] = None,
+        include_workers: typing.Optional[int] = _MISSING,
+    ):
         """Input Yaml stream."""
         self._root = os.path.split(stream.name)[0]
-        super(IncludeLoader, self).__init__(stream)
+        self.included_files = []
+        self.included_globs = []
+        self.include_globs = {} if include_globs is None else include_globs
+        self.include_cache = {} if include_cache is None else include_cache
+        self.include_graph = {} if include_graph is None else include_graph
+        self.include_nodes = include_nodes
+        self.include_times = include_times
+        self.include_signatures = include_signatures
+        if include_chain is None:
+            include_chain = (os.path.realpath(stream.name),)
+        self.include_chain = tuple(include_chain)
+        if copy_includes is not None:
+            self.copy_includes = copy_includes
+        if fragment_cache is not _MISSING:
+            self.fragment_cache = fragment_cache
+        if include_workers is not _MISSING:
+            self.include_workers = include_workers
+        super(IncludeLoaderMixin, self).__init__(stream)
 
     def include(self, node):
         """Take Yaml node and extract filename, then load Yaml file of that
-        name."""
+        name.
+
+        Paths of all transitively included files are collected
+        in `included_files`.
+        """
+        return self._include_file(
+            os.path.join(self._root, self.construct_scalar(node)))
+
+    def include_lazy(self, node):
+        """Return `LazyInclude` proxy of file that is parsed only when
+        configuration value is first accessed."""
         filename = os.path.join(self._root, self.construct_scalar(node))
+        return LazyInclude(
+            filename,
+            loader_class=self.__class__,
+            include_chain=self.include_chain,
+            fragment_cache=self.fragment_cache,
+        )
+
+    def include_glob(self, node):
+        """Load all files matching glob pattern (relative to including
+        file).
+
+        Node is either pattern scalar or mapping with `pattern` and
+        optional `merge` keys. Fragments are returned in sorted path order
+        as list, or deep-merged into single mapping if `merge` is true.
+        """
+        options = self._fragment_options(node, 'pattern')
+        pattern = os.path.join(self._root, options['pattern'])
+        filenames = self._glob(pattern, True)
+        return self._include_fragments(filenames, options.get('merge', False))
+
+    def include_dir(self, node):
+        """Load all Yaml files from directory (relative to including file).
+
+        Node is either directory scalar or mapping with `path` and optional
+        `pattern` (default `*.yaml` and `*.yml`) and `merge` keys.
+        See `include_glob`.
+        """
+        options = self._fragment_options(node, 'path')
+        directory = os.path.join(self._root, options['path'])
+        patterns = options.get('pattern', INCLUDE_DIR_PATTERNS)
+        if isinstance(patterns, str):
+            patterns = (patterns,)
+        directory = glob.escape(directory)
+        filenames = sorted({
+            filename
+            for pattern in patterns
+            for filename in self._glob(os.path.join(directory, pattern), False)
+        })
+        return self._include_fragments(filenames, options.get('merge', False))
+
+    def _glob(self, pattern: str, recursive: bool) -> typing.List[str]:
+        """Record glob pattern as dependency and return files it matches.
+        """
+        glob_pattern = (pattern, recursive)
+        self.included_globs.append(glob_pattern)
+        self.include_globs.setdefault(
+            self.include_chain[-1], []).append(glob_pattern)
+        if self.include_signatures is None:
+            return glob_files(pattern, recursive)
+        signature = glob_signature(glob_pattern)
+        self.include_signatures[glob_pattern] = signature
+        return list(signature[2])
+
+    def _fragment_options(
+        self,
+        node: yaml.Node,
+        key: str,
+    ) -> typing.Dict[str, typing.Any]:
+        if isinstance(node, yaml.MappingNode):
+            options = self.construct_mapping(node, deep=True)
+            if key not in options:
+                raise yaml.constructor.ConstructorError(
+                    None, None, f'{node.tag} requires "{key}" key',
+                    node.start_mark)
+            return options
+        return {key: self.construct_scalar(node)}
+
+    def _include_fragments(
+        self,
+        filenames: typing.Sequence[str],
+        merge: bool,
+    ) -> typing.Any:
+        """Load `filenames` (on thread pool unless `include_workers` is 1),
+        preserving their order."""
+        if len(filenames) > 1 and self.include_workers != 1:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.include_workers) as executor:
+                fragments = list(executor.map(self._include_file, filenames))
+        else:
+            fragments = [
+                self._include_file(filename) for filename in filenames]
+        if not merge:
+            return fragments
+        merged = {}
+        for fragment in fragments:
+            if fragment is None:
+                continue
+            if not isinstance(fragment, collections.abc.Mapping):
+                raise yaml.YAMLError(
+                    f'Cannot merge non-mapping fragment: {fragment!r}')
+            merged = _merge_fragment(merged, fragment)
+        return merged
+
+    def _include_file(self, filename: str):
+        """Load included file, timing it if `include_times` is set."""
+        if self.include_times is None:
+            return self._load_include(filename)
+        start = time.perf_counter()
+        try:
+            return self._load_include(filename)
+        finally:
+            resolved_path = os.path.realpath(filename)
+            self.include_times[resolved_path] = \
+                self.include_times.get(resolved_path, 0.0) + \
+                time.perf_counter() - start
+
+    def _load_include(self, filename: str):
+        """Load included file unless it is already in `include_cache`.
+
+        Parsed files are also kept in `fragment_cache` if it is set,
+        and are not parsed again until stat signature of the file (or of any
+        file it includes) or files matched by its glob patterns change.
+        """
         filepath = pathlib.Path(filename)
+        resolved_path = os.path.realpath(filename)
+        if resolved_path in self.include_chain:
+            raise IncludeCycleError(self.include_chain + (resolved_path,))
+        self.included_files.append(filepath)
+        self.include_graph.setdefault(
+            self.include_chain[-1], []).append(resolved_path)
+        if resolved_path in self.include_cache:
+            # Includes of already loaded file are dependencies of this one
+            dependencies, globs = self._dependencies(resolved_path)
+            self.included_files.extend(
+                pathlib.Path(path) for path in dependencies)
+            self.included_globs.extend(globs)
+            return self._included(self.include_cache[resolved_path])
+        # Cached entries carry no composed nodes
+        fragment_cache = self.fragment_cache \
+            if self.include_nodes is None else None
+        if fragment_cache is not None:
+            cached = fragment_cache.get(resolved_path)
+            if cached is not None:
+                data, dependencies, globs = cached
+                self.included_files.extend(
+                    pathlib.Path(path) for path in dependencies)
+                self.included_globs.extend(globs)
+                if dependencies:
+                    self.include_graph.setdefault(
+                        resolved_path, []).extend(dependencies)
+                if globs:
+                    self.include_globs.setdefault(
+                        resolved_path, []).extend(globs)
+                self.include_cache[resolved_path] = data
+                return self._included(data)
+        signature = fragment_signature(resolved_path)
+        if self.include_signatures is not None:
+            self.include_signatures[resolved_path] = signature
+        decoder = INCLUDE_DECODERS.get(filepath.suffix.lower())
+        if decoder is not None:
+            with filepath.open('rb') as file_handle:
+                data = decoder(file_handle)
+            dependencies = []
+            globs = []
+        else:
+            data, dependencies, globs = self._load_yaml(
+                filepath, resolved_path)
+        self.included_files.extend(dependencies)
+        self.included_globs.extend(globs)
+        if fragment_cache is not None:
+            data = fragment_cache.set(
+                resolved_path, signature, data,
+                [os.path.realpath(path) for path in dependencies], globs)
+        self.include_cache[resolved_path] = data
+        return self._included(data)
+
+    def _dependencies(
+        self,
+        resolved_path: str,
+    ) -> typing.Tuple[typing.List[str], typing.List[GlobPattern]]:
+        """Return resolved paths of files transitively included by loaded
+        file and glob patterns they use (from `include_graph` and
+        `include_globs`)."""
+        dependencies = {}
+        globs = list(self.include_globs.get(resolved_path, ()))
+        pending = [resolved_path]
+        while pending:
+            for child in self.include_graph.get(pending.pop(), ()):
+                if child not in dependencies:
+                    dependencies[child] = None
+                    globs.extend(self.include_globs.get(child, ()))
+                    pending.append(child)
+        return list(dependencies), globs
+
+    def _load_yaml(
+        self,
+        filepath: pathlib.Path,
+        resolved_path: str,
+    ) -> typing.Tuple[
+            typing.Any, typing.List[pathlib.Path], typing.List[GlobPattern]]:
+        """Parse included Yaml file and return its data, paths of files
+        it includes and glob patterns it uses."""
         with filepath.open('r') as file_handle:
-            return yaml.load(file_handle, IncludeLoader)
+            loader = self.__class__(
+                file_handle,
+                include_cache=self.include_cache,
+                include_chain=self.include_chain + (resolved_path,),
+                copy_includes=self.copy_includes,
+                include_graph=self.include_graph,
+                include_nodes=self.include_nodes,
+                fragment_cache=self.fragment_cache,
+                include_times=self.include_times,
+                include_globs=self.include_globs,
+                include_signatures=self.include_signatures,
+                include_workers=self.include_workers,
+            )
+            try:
+                if self.include_nodes is None:
+                    data = loader.get_single_data()
+                else:
+                    included_node = loader.get_single_node()
+                    self.include_nodes[resolved_path] = included_node
+                    data = None if included_node is None else \
+                        loader.construct_document(included_node)
+            finally:
+                loader.dispose()
+        return data, loader.included_files, loader.included_globs
+
+    def _included(self, data: typing.Any) -> typing.Any:
+        """Return `data` or its copy if `copy_includes` is set. Frozen
+        data is never copied."""
+        if not self.copy_includes or \
+                isinstance(data, (types.MappingProxyType, tuple)):
+            return data
+        return copy.deepcopy(data)
+
+
+class LazyInclude:
+
+    """Proxy of file included with !include_lazy.
+
+    File is parsed by `resolve()` on first call and the result is
+    memoized. `Configuration` resolves proxies transparently when their
+    value is accessed. Lazily included files are not watched
+    for changes and are not dependencies of cached configuration.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        loader_class: typing.Optional[typing.Type[IncludeLoaderMixin]] = None,
+        include_chain: typing.Sequence[str] = (),
+        fragment_cache: typing.Optional[FragmentCache] = _MISSING,
+    ):
+        self.filename = filename
+        self.loader_class = loader_class
+        self.include_chain = tuple(include_chain)
+        self.fragment_cache = fragment_cache
+        self._lock = threading.Lock()
+        self._resolved = False
+        self._value = None
+
+    @property
+    def resolved(self) -> bool:
+        """`True` if file was already parsed."""
+        return self._resolved
+
+    def resolve(self) -> typing.Any:
+        """Parse file on first call and return its data."""
+        if self._resolved:
+            return self._value
+        with self._lock:
+            if not self._resolved:
+                resolved_path = os.path.realpath(self.filename)
+                if resolved_path in self.include_chain:
+                    raise IncludeCycleError(
+                        self.include_chain + (resolved_path,))
+                decoder = INCLUDE_DECODERS.get(
+                    os.path.splitext(self.filename)[1].lower())
+                if decoder is not None:
+                    with open(self.filename, 'rb') as fp:
+                        self._value = decoder(fp)
+                else:
+                    with open(self.filename, 'r') as fp:
+                        self._value = load(
+                            fp, self.loader_class,
+                            include_chain=self.include_chain + (
+                                resolved_path,),
+                            fragment_cache=self.fragment_cache,
+                        )
+                self._resolved = True
+        return self._value
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        # Locks and caches are process local
+        return {
+            'filename': self.filename,
+            'loader_class': self.loader_class,
+            'include_chain': self.include_chain,
+        }
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]):
+        self.__init__(**state)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if not isinstance(other, LazyInclude):
+            return NotImplemented
+        return os.path.realpath(self.filename) == \
+            os.path.realpath(other.filename)
+
+    def __hash__(self) -> int:
+        return hash(os.path.realpath(self.filename))
+
+    def __repr__(self) -> str:
+        return f'LazyInclude({self.filename!r})'
+
+
+def _merge_fragment(
+    base: typing.Mapping[typing.Any, typing.Any],
+    fragment: typing.Mapping[typing.Any, typing.Any],
+) -> typing.Dict[typing.Any, typing.Any]:
+    """Return new dictionary with `fragment` deep-merged over `base`."""
+    merged = dict(base)
+    for key, value in fragment.items():
+        current = merged.get(key)
+        if isinstance(current, collections.abc.Mapping) and \
+                isinstance(value, collections.abc.Mapping):
+            merged[key] = _merge_fragment(current, value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class IncludeLoader(IncludeLoaderMixin, yaml.SafeLoader):
+
+    """Yaml Loader that allows for !include directive within Yaml file.
+    """
+
+
+if yaml.__with_libyaml__:
+    class CIncludeLoader(IncludeLoaderMixin, yaml.CSafeLoader):
+
+        """libyaml based Yaml Loader that allows for !include directive
+        within Yaml file.
+        """
+else:
+    CIncludeLoader = None
+
+# Fastest available include loader
+DEFAULT_INCLUDE_LOADER = CIncludeLoader or IncludeLoader
+
+
+Selector = typing.Optional[typing.Dict[str, typing.Any]]
+
+
+def _selector_tree(paths: typing.Iterable[str]) -> Selector:
+    """Build tree of selected keys from dotted paths. `None` selects
+    whole subtree."""
+    tree = {}
+    for path in paths:
+        node = tree
+        *parents, last = path.split('.')
+        for key in parents:
+            if key in node and node[key] is None:
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[last] = None
+    return tree
 
 
+def _select_data(data: typing.Any, selector: Selector) -> typing.Any:
+    """Return mappings of `data` without keys outside of `selector`.
+    Mappings with no selected keys left are removed."""
+    selected = {}
+    for key, value in data.items():
+        name = str(key)
+        if name not in selector:
+            continue
+        child = selector[name]
+        if child is None:
+            selected[key] = value
+        elif isinstance(value, collections.abc.Mapping):
+            value = _select_data(value, child)
+            if value:
+                selected[key] = value
+    return selected
+
+
+class SelectiveLoaderMixin:
+
+    """Mixin that composes only selected parts of Yaml document.
+
+    `select` is an iterable of dotted key paths (e.g. `database` or
+    `server.port`). Values of other keys are skipped event by event
+    without being composed, so !include directives in them are never
+    followed. Anchored nodes are always composed whole, since aliases may
+    refer to them. Non-selected keys brought in by merge keys (`<<`)
+    are removed after construction.
+    """
+
+    def __init__(
+        self,
+        stream,
+        select: typing.Optional[typing.Iterable[str]] = None,
+        **loader_kwargs: typing.Any,
+    ):
+        self.select = None if select is None else _selector_tree(select)
+        self._selector = self.select
+        super(SelectiveLoaderMixin, self).__init__(stream, **loader_kwargs)
+
+    def get_single_data(self):
+        data = super(SelectiveLoaderMixin, self).get_single_data()
+        if self.select is None or \
+                not isinstance(data, collections.abc.Mapping):
+            return data
+        return _select_data(data, self.select)
+
+    def compose_mapping_node(self, anchor):
+        selector = self._selector
+        if selector is None or anchor is not None:
+            self._selector = None
+            try:
+                return super(SelectiveLoaderMixin, self).compose_mapping_node(
+                    anchor)
+            finally:
+                self._selector = selector
+        start_event = self.get_event()
+        tag = start_event.tag
+        if tag is None or tag == '!':
+            tag = self.resolve(yaml.MappingNode, None, start_event.implicit)
+        node = yaml.MappingNode(
+            tag, [], start_event.start_mark, None,
+            flow_style=start_event.flow_style)
+        try:
+            while not self.check_event(yaml.MappingEndEvent):
+                self._selector = None
+                item_key = self.compose_node(node, None)
+                if isinstance(item_key, yaml.ScalarNode) and \
+                        item_key.tag != 'tag:yaml.org,2002:merge':
+                    if item_key.value not in selector:
+                        self._skip_node()
+                        continue
+                    child = selector[item_key.value]
+                    # Only mappings can be composed selectively, other
+                    # values (e.g. !include) are filtered after construction
+                    if self.check_event(yaml.MappingStartEvent):
+                        self._selector = child
+                item_value = self.compose_node(node, item_key)
+                node.value.append((item_key, item_value))
+        finally:
+            self._selector = selector
+        end_event = self.get_event()
+        node.end_mark = end_event.end_mark
+        return node
+
+    def _skip_node(self):
+        """Consume events of next node without composing it."""
+        depth = 0
+        while True:
+            event = self.peek_event()
+            if isinstance(event, yaml.NodeEvent) and \
+                    event.anchor is not None and \
+                    not isinstance(event, yaml.AliasEvent):
+                self.compose_node(None, None)
+            else:
+                self.get_event()
+                if isinstance(
+                        event, (yaml.MappingStartEvent,
+                                yaml.SequenceStartEvent)):
+                    depth += 1
+                elif isinstance(
+                        event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                    depth -= 1
+            if depth == 0:
+                return
+
+
+class SelectiveIncludeLoader(SelectiveLoaderMixin, IncludeLoader):
+
+    """Include loader that constructs only selected keys."""
+
+
+if CIncludeLoader is not None:
+    class _CComposerSafeLoader(yaml.composer.Composer, yaml.CSafeLoader):
+
+        """libyaml parser with pure Python composer."""
+
+        def __init__(self, stream):
+            yaml.CSafeLoader.__init__(self, stream)
+            yaml.composer.Composer.__init__(self)
+
+    class CSelectiveIncludeLoader(
+            SelectiveLoaderMixin, IncludeLoaderMixin, _CComposerSafeLoader):
+
+        """Include loader that constructs only selected keys, with
+        events parsed by libyaml."""
+else:
+    CSelectiveIncludeLoader = None
+
+# Fastest available selective include loader
+DEFAULT_SELECTIVE_LOADER = CSelectiveIncludeLoader or SelectiveIncludeLoader
+
+
+def load(
+    stream,
+    loader_class: typing.Optional[typing.Type[IncludeLoaderMixin]] = None,
+    **loader_kwargs: typing.Any,
+) -> typing.Any:
+    """Load single Yaml document from `stream` resolving !include directives.
+
+    `loader_kwargs` are passed to loader (e.g. `copy_includes`).
+    """
+    if loader_class is None:
+        loader_class = DEFAULT_INCLUDE_LOADER
+    loader = loader_class(stream, **loader_kwargs)
+    try:
+        return loader.get_single_data()
+    finally:
+        loader.dispose()
+
+
+def load_selected(
+    stream,
+    select: typing.Iterable[str],
+    loader_class: typing.Optional[typing.Type[SelectiveLoaderMixin]] = None,
+    **loader_kwargs: typing.Any,
+) -> typing.Any:
+    """Load only `select` dotted key paths from single Yaml document.
+
+    See `SelectiveLoaderMixin`.
+    """
+    if loader_class is None:
+        loader_class = DEFAULT_SELECTIVE_LOADER
+    return load(stream, loader_class, select=select, **loader_kwargs)
+
+
+def load_all(
+    stream,
+    loader_class: typing.Optional[typing.Type[IncludeLoaderMixin]] = None,
+    **loader_kwargs: typing.Any,
+) -> typing.Iterator[typing.Any]:
+    """Load Yaml documents from `stream` one by one, resolving !include
+    directives in each of them.
+
+    Only one document is constructed at a time.
+    """
+    if loader_class is None:
+        loader_class = DEFAULT_INCLUDE_LOADER
+    loader = loader_class(stream, **loader_kwargs)
+    try:
+        while loader.check_data():
+            yield loader.get_data()
+    finally:
+        loader.dispose()
+
 # Make sure we load IncludeLoader on module import
 IncludeLoader.add_constructor('!include', IncludeLoader.include)
+IncludeLoader.add_constructor('!include_glob', IncludeLoader.include_glob)
+IncludeLoader.add_constructor('!include_dir', IncludeLoader.include_dir)
+IncludeLoader.add_constructor('!include_lazy', IncludeLoader.include_lazy)
+for _loader_class in (CIncludeLoader, CSelectiveIncludeLoader):
+    if _loader_class is None:
+        continue
+    _loader_class.add_constructor('!include', _loader_class.include)
+    _loader_class.add_constructor(
+        '!include_glob', _loader_class.include_glob)
+    _loader_class.add_constructor(
+        '!include_dir', _loader_class.include_dir)
+    _loader_class.add_constructor(
+        '!include_lazy', _loader_class.include_lazy)
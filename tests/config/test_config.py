@@ -7,6 +7,7 @@
 #
 
 import pytest
+from marshmallow import fields, EXCLUDE
 
 from ..context import tcutils
 
@@ -35,6 +36,31 @@ CONFIG_ITEMS = [
 ]
 
 
+class LazySectionSchema(tcutils.config.BaseConfigSchema):
+    port = fields.Integer(required=True)
+
+
+class LazySchema(tcutils.config.BaseConfigSchema):
+    server = fields.Nested(LazySectionSchema)
+    database = fields.Nested(LazySectionSchema)
+    debug = fields.Boolean(load_default=False)
+
+
+class LazyIncludeSchema(tcutils.config.BaseConfigSchema):
+    server = fields.Nested(LazySectionSchema)
+    table = fields.Raw()
+
+
+class HookedConfiguration(tcutils.config.Configuration):
+
+    def _parse_nested(self):
+        self.config['nested_count'] = len(self.config['nested'])
+        self.nested_calls = getattr(self, 'nested_calls', 0) + 1
+
+    def _parse_number(self):
+        self.number_calls = getattr(self, 'number_calls', 0) + 1
+
+
 class TestConfig:
 
     @pytest.fixture
@@ -66,3 +92,395 @@ class TestConfig:
         for item_part in items:
             item_attr = item_attr[item_part]
         assert item_attr == result
+
+    @pytest.fixture
+    def compiled_configuration(self):
+        config = tcutils.config.Configuration(DUMMY_CONFIG, compiled=True)
+        return config
+
+    @pytest.mark.parametrize(
+        "item, result", CONFIG_ITEMS
+    )
+    def test_compiled_configuration_attr_access(
+        self, compiled_configuration, item, result
+    ):
+        assert getattr(compiled_configuration, item) == result
+        # Item access doesn't depend on compiled mode
+        dynamic = tcutils.config.Configuration(DUMMY_CONFIG)
+        assert compiled_configuration[item] == dynamic[item]
+        top_level = item.split('.')[0]
+        assert compiled_configuration[top_level] == dynamic[top_level]
+        assert type(compiled_configuration[top_level]) is \
+            type(dynamic[top_level])
+
+    def test_compiled_configuration_nested_access(self, compiled_configuration):
+        nested = compiled_configuration.nested
+        assert nested.inception.full == 'stars'
+        assert nested['inception.nice'] == 1
+        with pytest.raises(AttributeError):
+            getattr(compiled_configuration, 'nested.missing')
+
+    def test_compiled_configuration_literal_dotted_keys(self):
+        config_dict = {
+            'a.b': {'c': 1},
+            'x': {'y': 2},
+            'x.y': 3,
+        }
+        dynamic = tcutils.config.Configuration(config_dict)
+        compiled = tcutils.config.Configuration(config_dict, compiled=True)
+        for item in ['a.b', 'x.y']:
+            assert str(getattr(compiled, item)) == str(getattr(dynamic, item))
+        assert getattr(compiled, 'a.b').c == 1
+        assert getattr(compiled, 'x.y') == 2
+
+    def test_configuration_diff(self):
+        new_config = dict(DUMMY_CONFIG, number=43, extra=True)
+        new_config['nested'] = dict(DUMMY_CONFIG['nested'], one=2)
+        diff = tcutils.config.configuration_diff(DUMMY_CONFIG, new_config)
+        assert diff == [('number',), ('nested', 'one'), ('extra',)]
+
+    @pytest.fixture
+    def lazy_config_path(self, tmp_path):
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server:\n  port: "8080"\n'
+            'database:\n  port: invalid\n')
+        return config_path
+
+    def test_lazy_configuration(self, lazy_config_path):
+        config = tcutils.config.Configuration.load(
+            lazy_config_path, LazySchema, lazy=True)
+        assert config.server.port == 8080
+        assert config['server']['port'] == 8080
+        assert config.debug is False
+        with pytest.raises(tcutils.config.ValidationError) as e:
+            config.database
+        assert 'database' in e.value.messages
+        with pytest.raises(tcutils.config.ValidationError):
+            tcutils.config.validate_all(config)
+
+    def test_lazy_compiled_configuration(self, tmp_path, monkeypatch):
+        class Section(tcutils.config.BaseConfigSchema):
+            class Meta:
+                unknown = EXCLUDE
+            port = fields.Integer()
+            options = fields.Dict()
+
+        class Schema(tcutils.config.BaseConfigSchema):
+            server = fields.Nested(Section)
+            database = fields.Nested(Section)
+
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server:\n  port: "8080"\n  stale: {deep: 1}\n'
+            'database:\n  port: 1\n  options: {pool: {size: 2}}\n')
+        config = tcutils.config.Configuration.load(
+            config_path, Schema, lazy=True, compiled=True)
+
+        def fail(configuration):
+            raise AssertionError('Whole key index was rebuilt')
+
+        monkeypatch.setattr(tcutils.config, 'build_key_index', fail)
+        assert config.server.port == 8080
+        assert getattr(config, 'database.options.pool.size') == 2
+        index = config._key_index
+        monkeypatch.undo()
+        tcutils.config.build_key_index(config)
+        assert sorted(index) == sorted(config._key_index)
+        assert 'server.stale' not in index
+        assert all(
+            index[name][0] == entry[0]
+            for name, entry in config._key_index.items())
+
+    def test_lazy_configuration_unknown_key(self, tmp_path):
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('server:\n  port: 1\nunknown: 1\n')
+        with pytest.raises(tcutils.config.ValidationError) as e:
+            tcutils.config.Configuration.load(config_path, LazySchema, lazy=True)
+        assert 'unknown' in e.value.messages
+
+    def test_load_typed(self, tmp_path):
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server:\n  port: 80\ndatabase:\n  port: 5432\n')
+        config = tcutils.config.Configuration.load_typed(
+            config_path, LazySchema)
+        assert config.server.port == 80
+        assert config.database.port == 5432
+        assert config.debug is False
+        assert not hasattr(config, '__dict__')
+        with pytest.raises(AttributeError):
+            config.server.port = 8080
+
+    @pytest.mark.parametrize("compiled", [False, True])
+    def test_lazy_include(self, tmp_path, compiled):
+        (tmp_path / 'table.yaml').write_text('codes:\n  a: 1\n  b: 2\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server:\n  port: 80\ntable: !include_lazy table.yaml\n')
+        config = tcutils.config.Configuration.load(
+            config_path, LazyIncludeSchema, compiled=compiled)
+        proxy = config.config['table']
+        assert isinstance(proxy, tcutils.yamlinclude.LazyInclude)
+        assert config.server.port == 80
+        assert not proxy.resolved
+        assert config.table.codes.b == 2
+        assert proxy.resolved
+        assert config.table is config.table
+        assert config.table.value == {'codes': {'a': 1, 'b': 2}}
+
+    @pytest.mark.parametrize("lazy", [False, True])
+    def test_load_selected(self, tmp_path, lazy):
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server:\n  port: 80\ndatabase: !include missing.yaml\n')
+        config = tcutils.config.Configuration.load(
+            config_path, LazySchema, select=['server'], lazy=lazy)
+        assert config.server.port == 80
+        assert 'database' not in config.keys()
+
+    def test_load_fragment_cache(self, tmp_path):
+        (tmp_path / 'server.yaml').write_text('port: 80\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server: !include server.yaml\ndatabase:\n  port: 1\n')
+        cache = tcutils.yamlinclude.FragmentCache()
+        for _ in range(2):
+            config = tcutils.config.Configuration.load(
+                config_path, LazySchema, fragment_cache=cache)
+            assert config.server.port == 80
+        assert (cache.info().hits, cache.info().misses) == (1, 1)
+        tcutils.config.Configuration.load(config_path, LazySchema)
+        assert cache.info().hits == 1
+
+    @pytest.mark.parametrize("include_workers", [1, 4])
+    def test_load_include_workers(self, tmp_path, include_workers):
+        fragments_dir = tmp_path / 'conf.d'
+        fragments_dir.mkdir()
+        for number in range(4):
+            (fragments_dir / f'{number}.yaml').write_text(
+                f'port_{number}: {number}\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server: !include_dir {path: conf.d, merge: true}\n')
+        class Schema(tcutils.config.BaseConfigSchema):
+            server = fields.Dict()
+
+        config = tcutils.config.Configuration.load(
+            config_path, Schema, include_workers=include_workers)
+        assert config.config['server'] == {
+            f'port_{number}': number for number in range(4)}
+
+    def test_load_profile(self, tmp_path, caplog):
+        (tmp_path / 'server.yaml').write_text('port: 80\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'server: !include server.yaml\ndatabase:\n  port: 1\n')
+
+        class ProfiledConfiguration(tcutils.config.Configuration):
+            def _parse_server(self):
+                pass
+
+        with caplog.at_level('DEBUG'):
+            config = ProfiledConfiguration.load(
+                config_path, LazySchema, compiled=True, profile=True)
+        profile = tcutils.config.configuration_load_profile(config)
+        assert list(profile.phases) == [
+            'check_path', 'parse', 'schema_load', 'schema_dump',
+            'parse_hooks', 'build_key_index']
+        assert list(profile.includes) == [
+            str((tmp_path / 'server.yaml').resolve())]
+        assert list(profile.hooks) == ['_parse_server']
+        assert profile.total == pytest.approx(sum(profile.phases.values()))
+        records = [
+            record for record in caplog.records
+            if hasattr(record, 'configuration_profile')]
+        assert len(records) == 1
+        assert records[0].configuration_profile['path'] == str(config_path)
+        assert tcutils.config.configuration_load_profile(
+            tcutils.config.Configuration.load(config_path, LazySchema)) is None
+
+    def test_load_many(self, tmp_path):
+        (tmp_path / 'server.yaml').write_text('port: 80\n')
+        config_paths = []
+        for number in range(4):
+            config_path = tmp_path / f'config_{number}.yaml'
+            config_path.write_text(
+                f'server: !include server.yaml\n'
+                f'database:\n  port: {number}\n')
+            config_paths.append(config_path)
+        broken_path = tmp_path / 'broken.yaml'
+        broken_path.write_text('server:\n  port: invalid\n')
+        config_paths.append(broken_path)
+
+        results = {
+            result.path: result
+            for result in tcutils.config.Configuration.load_many(
+                config_paths, LazySchema, max_workers=2)
+        }
+        assert len(results) == 5
+        assert isinstance(
+            results[broken_path].error, tcutils.config.ValidationError)
+        for number, config_path in enumerate(config_paths[:-1]):
+            assert results[config_path].error is None
+            configuration = results[config_path].configuration
+            assert configuration.server.port == 80
+            assert configuration.database.port == number
+
+    def test_load_all(self, tmp_path):
+        (tmp_path / 'server.yaml').write_text('port: 80\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('\n'.join(
+            f'---\nserver: !include server.yaml\ndatabase:\n  port: {number}'
+            for number in range(3)) + '\n')
+        configurations = tcutils.config.Configuration.load_all(
+            config_path, LazySchema)
+        for number, configuration in enumerate(configurations):
+            assert configuration.server.port == 80
+            assert configuration.database.port == number
+        assert number == 2
+
+    def test_layered_configuration(self, tmp_path):
+        (tmp_path / 'server.yaml').write_text('host: localhost\nport: 80\n')
+        base_path = tmp_path / 'base.yaml'
+        base_path.write_text(
+            'server: !include server.yaml\n'
+            'database:\n'
+            '  port: 5432\n'
+            '  options: {timeout: 5}\n')
+        env_path = tmp_path / 'env.yaml'
+        env_path.write_text('server:\n  port: 8080\n')
+        layers = tcutils.config.LayeredConfigurationLoader()
+        base_layer = layers.add_file(base_path, name='base')
+        layers.add_file(env_path, name='production')
+        layers.add_env('APP_', environ={'APP_DATABASE__PORT': '6543'})
+
+        assert layers.merged == {
+            'server': {'host': 'localhost', 'port': 8080},
+            'database': {'port': 6543, 'options': {'timeout': 5}},
+        }
+        assert layers.merged['database']['options'] is \
+            base_layer.data['database']['options']
+        assert layers.source_of('server.host') == tcutils.config.Provenance(
+            str(tmp_path / 'server.yaml'), 1)
+        assert layers.source_of('server.port') == tcutils.config.Provenance(
+            str(env_path), 2)
+        assert layers.source_of('database.port') == tcutils.config.Provenance(
+            'env:APP_DATABASE__PORT')
+        assert layers.source_of('missing') is None
+
+        merged = layers.merged
+        env_path.write_text('server:\n  port: 9090\n')
+        assert layers.reload('production') == [('server', 'port')]
+        assert layers.merged['server'] == {'host': 'localhost', 'port': 9090}
+        assert layers.merged['database'] is merged['database']
+        assert merged['server']['port'] == 8080
+
+        env_path.write_text('server: disabled\n')
+        layers.reload('production')
+        assert layers.merged['server'] == 'disabled'
+        env_path.write_text('{}\n')
+        layers.reload('production')
+        assert layers.merged['server'] == {'host': 'localhost', 'port': 80}
+
+    @pytest.mark.parametrize("compiled", [False, True])
+    def test_configuration_memoized_wrappers(self, compiled):
+        config = tcutils.config.Configuration(DUMMY_CONFIG, compiled=compiled)
+        nested = config.nested
+        assert config.nested is nested
+        assert nested.inception is nested.inception
+        assert dict(tcutils.config.iter_items(config))['nested'] is nested
+        assert nested[0] == 1
+        assert nested[2] == 'something'
+        assert nested[3] is nested.inception
+        with pytest.raises(IndexError):
+            nested[4]
+        # Positional keys follow replaced keys
+        attribute = tcutils.config.ConfigurationAttribute({'x': 1, 'y': 2})
+        assert attribute[1] == 2
+        del attribute.value['y']
+        attribute.value['z'] = 3
+        assert attribute[1] == 3
+
+    @pytest.mark.parametrize("compiled", [False, True])
+    def test_configuration_method_names_keys(self, compiled):
+        names = [
+            'items', 'walk', 'iter_items', 'walk_items', 'instrument',
+            'evolve', 'validate_all', 'validate_section', 'build_key_index',
+            'load_profile',
+        ]
+        config_dict = {name: f'{name} value' for name in names}
+        config_dict['walk'] = {name: name for name in names}
+        config = tcutils.config.Configuration(config_dict, compiled=compiled)
+        for name in names:
+            if name != 'walk':
+                assert getattr(config, name) == f'{name} value'
+                assert getattr(config.walk, name) == name
+        assert list(tcutils.config.iter_items(config.walk)) == [
+            (name, name) for name in names]
+
+    def test_configuration_walk(self, dummy_configuration):
+        paths = dict(tcutils.config.walk_items(dummy_configuration))
+        assert paths['nested.inception.full'] == 'stars'
+        assert paths['nested.inception'] is dummy_configuration.nested.inception
+        assert len(paths) == 10
+
+    @pytest.mark.parametrize("compiled", [False, True])
+    def test_configuration_access_stats(self, compiled):
+        config = tcutils.config.Configuration(DUMMY_CONFIG, compiled=compiled)
+        stats = tcutils.config.instrument(config)
+        for _ in range(3):
+            assert config.nested.inception.full == 'stars'
+        assert getattr(config, 'nested.one') == 1
+        assert config['string'] == 'foo'
+        assert stats.counts['nested.inception.full'] == 3
+        assert stats.counts['nested'] == 3
+        assert stats.counts['nested.one'] == 1
+        assert stats.hottest(2) == [('nested', 3), ('nested.inception', 3)]
+        assert 'nested.inception.full' in stats.first_access
+        assert stats.unused_keys(config) == [
+            'number', 'flag', 'nested.two', 'nested.three',
+            'nested.inception.nice']
+        report = stats.report(config)
+        assert report['unused'] == stats.unused_keys(config)
+
+    @pytest.mark.parametrize("compiled", [False, True])
+    def test_configuration_access_stats_opt_in(self, compiled):
+        config = HookedConfiguration(DUMMY_CONFIG, compiled=compiled)
+        # Configuration that is not instrumented has no counting wrappers
+        assert type(config) is HookedConfiguration
+        assert type(config.nested) is tcutils.config.ConfigurationAttribute
+        stats = tcutils.config.instrument(config)
+        assert isinstance(config, HookedConfiguration)
+        assert type(config).__name__ == 'HookedConfiguration'
+        assert config.nested.inception.full == 'stars'
+        assert config['number'] == 42
+        assert tcutils.config.instrument(config, stats) is stats
+        assert type(config).__mro__.count(HookedConfiguration) == 1
+        other = HookedConfiguration(DUMMY_CONFIG, compiled=compiled)
+        assert other.nested.inception.full == 'stars'
+        assert stats.counts['nested.inception.full'] == 1
+        assert stats.counts['number'] == 1
+
+    @pytest.mark.parametrize("compiled", [False, True])
+    def test_versioned_configuration(self, compiled):
+        versioned = tcutils.config.VersionedConfiguration(
+            DUMMY_CONFIG, configuration_class=HookedConfiguration,
+            compiled=compiled)
+        assert versioned.nested_count == 4
+        with versioned.pin() as pinned:
+            assert versioned.update({'nested.one': 10, 'extra': [1]}) == 1
+            assert pinned.nested.one == 1
+            assert 'extra' not in pinned.keys()
+        assert versioned.version == 1
+        assert versioned.nested.one == 10
+        assert versioned.extra == (1,)
+        assert versioned.current().nested_calls == 2
+        assert versioned.current().number_calls == 1
+        assert versioned.config['nested']['inception'] is \
+            pinned.config['nested']['inception']
+        with pytest.raises(TypeError):
+            versioned.config['nested']['one'] = 5
+        versioned.remove('nested.inception')
+        assert list(versioned.nested.keys()) == ['one', 'two', 'three']
+        assert pinned.nested.inception.full == 'stars'
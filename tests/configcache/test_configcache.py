@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import os
+import sys
+import pytest
+import subprocess
+from marshmallow import fields, validate, post_load
+
+from ..context import tcutils
+
+
+class DummySchema(tcutils.config.BaseConfigSchema):
+    name = fields.String()
+    included = fields.Dict()
+
+
+class TestConfigurationCache:
+
+    @pytest.fixture
+    def config_path(self, tmp_path):
+        (tmp_path / 'included.yaml').write_text('foo: bar\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'name: test\nincluded: !include included.yaml\n')
+        return config_path
+
+    def test_cache_hit_skips_parsing(self, config_path, tmp_path, monkeypatch):
+        cache_dir = tmp_path / 'cache'
+        config = tcutils.config.Configuration.load(
+            config_path, DummySchema, cache=cache_dir)
+        assert config.included.foo == 'bar'
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Configuration was parsed')
+
+        monkeypatch.setattr(
+            tcutils.yamlinclude.DEFAULT_INCLUDE_LOADER, 'get_single_data', fail)
+        cached = tcutils.config.Configuration.load(
+            config_path, DummySchema, cache=cache_dir)
+        assert cached.config == config.config
+
+    @pytest.mark.parametrize("use_hash", [False, True])
+    def test_cache_invalidated_by_include(self, config_path, tmp_path,
+        use_hash
+    ):
+        cache = tcutils.configcache.ConfigurationCache(
+            tmp_path / 'cache', use_hash=use_hash)
+        tcutils.config.Configuration.load(config_path, DummySchema, cache=cache)
+        included_path = tmp_path / 'included.yaml'
+        included_path.write_text('foo: changed!\n')
+        stat = included_path.stat()
+        os.utime(included_path, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 1000000000))
+        config = tcutils.config.Configuration.load(
+            config_path, DummySchema, cache=cache)
+        assert config.included.foo == 'changed!'
+
+    def test_cache_keyed_by_schema(self, config_path, tmp_path):
+        class OtherSchema(tcutils.config.BaseConfigSchema):
+            name = fields.String()
+            included = fields.Raw()
+
+        cache = tcutils.configcache.ConfigurationCache(tmp_path / 'cache')
+        tcutils.config.Configuration.load(config_path, DummySchema, cache=cache)
+        assert cache.get(config_path, OtherSchema) is None
+        assert cache.get(config_path, DummySchema) is not None
+
+    def test_cache_invalidated_by_new_fragment(self, tmp_path):
+        (tmp_path / 'conf.d').mkdir()
+        (tmp_path / 'conf.d' / 'a.yaml').write_text('a: 1\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'name: test\n'
+            'included: !include_dir {path: conf.d, merge: true}\n')
+        cache = tcutils.configcache.ConfigurationCache(tmp_path / 'cache')
+        config = tcutils.config.Configuration.load(
+            config_path, DummySchema, cache=cache)
+        assert config.config['included'] == {'a': 1}
+        (tmp_path / 'conf.d' / 'b.yaml').write_text('b: 2\n')
+        assert cache.get(config_path, DummySchema) is None
+        config = tcutils.config.Configuration.load(
+            config_path, DummySchema, cache=cache)
+        assert config.config['included'] == {'a': 1, 'b': 2}
+
+    def test_schema_signature(self):
+        def make_schema(inner_field, required=False, hook_key='name'):
+            class Inner(tcutils.config.BaseConfigSchema):
+                value = inner_field
+
+            class Outer(tcutils.config.BaseConfigSchema):
+                name = fields.String(required=required)
+                inner = fields.Nested(Inner)
+                items = fields.List(fields.Nested(lambda: Inner()))
+
+                @post_load
+                def strip(self, data, **kwargs):
+                    data.pop(hook_key, None)
+                    return data
+
+            return Outer
+
+        signature = tcutils.configcache.schema_signature
+        base = signature(make_schema(fields.Integer()))
+        assert base == signature(make_schema(fields.Integer()))
+        assert base != signature(make_schema(fields.String()))
+        assert base != signature(make_schema(
+            fields.Integer(validate=validate.Range(min=1))))
+        assert base != signature(make_schema(
+            fields.Integer(data_key='other')))
+        assert base != signature(make_schema(
+            fields.Integer(), required=True))
+        assert base != signature(make_schema(
+            fields.Integer(), hook_key='inner'))
+
+    def test_schema_signature_hash_seed(self):
+        code = (
+            'from marshmallow import fields, validate\n'
+            'import tcutils.configcache\n'
+            'class Schema(tcutils.config.BaseConfigSchema):\n'
+            '    kind = fields.String(validate=validate.OneOf(\n'
+            '        {"alpha", "beta", "gamma", "delta", "epsilon"}))\n'
+            '    tags = fields.List(fields.String(), validate=[\n'
+            '        validate.ContainsOnly({"a", "b", "c", "d"}),\n'
+            '        validate.NoneOf(frozenset({"x", "y", "z"}))])\n'
+            'print(tcutils.configcache.schema_signature(Schema))\n'
+        )
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        signatures = {
+            subprocess.run(
+                [sys.executable, '-c', code], cwd=root, check=True,
+                capture_output=True, text=True,
+                env=dict(os.environ, PYTHONHASHSEED=str(seed)),
+            ).stdout
+            for seed in range(1, 5)
+        }
+        assert len(signatures) == 1
+
+    def test_cache_schema_changed(self, config_path, tmp_path, monkeypatch):
+        cache = tcutils.configcache.ConfigurationCache(tmp_path / 'cache')
+        cache.set(config_path, DummySchema, {'name': 'old'}, [config_path])
+        monkeypatch.setattr(
+            tcutils.configcache, 'schema_signature', lambda schema: 'new')
+        assert cache.get(config_path, DummySchema) is None
+        cache.set(config_path, DummySchema, {'name': 'new'}, [config_path])
+        assert cache.get(config_path, DummySchema) == {'name': 'new'}
+        # Entry of older schema version is overwritten
+        assert len(list((tmp_path / 'cache').glob('*.cfgcache'))) == 1
+
+    def test_cache_unreadable_entry(self, config_path, tmp_path):
+        cache = tcutils.configcache.ConfigurationCache(tmp_path / 'cache')
+        tcutils.config.Configuration.load(config_path, DummySchema, cache=cache)
+        entry_path, = (tmp_path / 'cache').glob('*.cfgcache')
+        # Pickle referring to class that no longer exists
+        entry_path.write_bytes(
+            b'\x80\x04\x95\x19\x00\x00\x00\x00\x00\x00\x00\x8c\x08builtins'
+            b'\x94\x8c\x07Missing\x94\x93\x94.')
+        assert cache.get(config_path, DummySchema) is None
+        entry_path.write_bytes(b'cmissing_module_xyz\nName\n.')
+        assert cache.get(config_path, DummySchema) is None
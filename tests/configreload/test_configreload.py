@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import os
+import pytest
+from marshmallow import fields
+
+from ..context import tcutils
+
+
+class DummySchema(tcutils.config.BaseConfigSchema):
+    database = fields.Dict()
+    server = fields.Dict()
+
+
+class DummyConfiguration(tcutils.config.Configuration):
+
+    def _parse_database(self):
+        self.database_calls = getattr(self, 'database_calls', 0) + 1
+        self.config['db_url'] = f'db://{self.config["database"]["host"]}'
+
+    def _parse_server(self):
+        self.server_calls = getattr(self, 'server_calls', 0) + 1
+
+
+def touch(path, content):
+    path.write_text(content)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+
+class TestReloadableConfiguration:
+
+    @pytest.fixture
+    def config_path(self, tmp_path):
+        (tmp_path / 'database.yaml').write_text('host: localhost\n')
+        (tmp_path / 'server.yaml').write_text('port: 80\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'database: !include database.yaml\n'
+            'server: !include server.yaml\n')
+        return config_path
+
+    def test_reload_changed_section(self, config_path, tmp_path):
+        diffs = []
+        config = tcutils.configreload.ReloadableConfiguration(
+            config_path, DummySchema,
+            configuration_class=DummyConfiguration,
+            on_reload=lambda snapshot, diff: diffs.append(diff))
+        old_snapshot = config.snapshot()
+        assert config.database.host == 'localhost'
+        assert not config.check()
+
+        touch(tmp_path / 'database.yaml', 'host: db.example.com\n')
+        assert config.check()
+        assert config.database.host == 'db.example.com'
+        assert config.server.port == 80
+        assert config.database_calls == 2
+        assert config.server_calls == 1
+        assert diffs == [[('database', 'host')]]
+        assert old_snapshot.database.host == 'localhost'
+        assert config.db_url == 'db://db.example.com'
+
+        # Keys set by hooks of unchanged sections are kept
+        touch(tmp_path / 'server.yaml', 'port: 8080\n')
+        assert config.check()
+        assert config.server.port == 8080
+        assert config.database_calls == 2
+        assert config.db_url == 'db://db.example.com'
+
+    def test_reload_reuses_unchanged_fragments(self, config_path, tmp_path):
+        config = tcutils.configreload.ReloadableConfiguration(
+            config_path, DummySchema)
+        server_path = os.path.realpath(tmp_path / 'server.yaml')
+        server_fragment = config._fragments[server_path]
+        touch(tmp_path / 'database.yaml', 'host: other\n')
+        assert config.check()
+        assert config._fragments[server_path] is server_fragment
+
+    def test_reload_invalid_keeps_snapshot(self, config_path, tmp_path):
+        config = tcutils.configreload.ReloadableConfiguration(
+            config_path, DummySchema)
+        snapshot = config.snapshot()
+        touch(tmp_path / 'server.yaml', '- not a mapping\n')
+        with pytest.raises(tcutils.config.ValidationError):
+            config.check()
+        assert config.snapshot() is snapshot
+
+    def test_reload_glob_fragments(self, tmp_path):
+        fragments_dir = tmp_path / 'conf.d'
+        fragments_dir.mkdir()
+        (fragments_dir / 'a.yaml').write_text('a: 1\n')
+        (tmp_path / 'server.yaml').write_text(
+            '!include_dir {path: conf.d, merge: true}\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'database: {}\nserver: !include server.yaml\n')
+        config = tcutils.configreload.ReloadableConfiguration(
+            config_path, DummySchema)
+        assert config.config['server'] == {'a': 1}
+        (fragments_dir / 'b.yaml').write_text('b: 2\n')
+        assert config.check()
+        assert config.config['server'] == {'a': 1, 'b': 2}
+        # Fragments of reused files are still watched
+        touch(config_path, 'database: {x: 1}\nserver: !include server.yaml\n')
+        assert config.check()
+        (fragments_dir / 'a.yaml').unlink()
+        assert config.check()
+        assert config.config['server'] == {'b': 2}
+
+    def test_reload_change_during_load(self, config_path, tmp_path,
+                                       monkeypatch):
+        load_config_file = tcutils.configreload.load_config_file
+
+        def load_and_change(*args, **kwargs):
+            result = load_config_file(*args, **kwargs)
+            touch(tmp_path / 'server.yaml', 'port: 8080\n')
+            return result
+
+        monkeypatch.setattr(
+            tcutils.configreload, 'load_config_file', load_and_change)
+        config = tcutils.configreload.ReloadableConfiguration(
+            config_path, DummySchema)
+        monkeypatch.undo()
+        assert config.server.port == 80
+        assert config.check()
+        assert config.server.port == 8080
+
+    def test_reload_snapshot_frozen(self, config_path):
+        config = tcutils.configreload.ReloadableConfiguration(
+            config_path, DummySchema)
+        with pytest.raises(TypeError):
+            config.snapshot().config['server'] = {}
+        with pytest.raises(TypeError):
+            config.snapshot().config['server']['port'] = 8080
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import multiprocessing
+import pytest
+
+from ..context import tcutils
+
+
+DUMMY_CONFIG = {
+    'string': 'foo',
+    'number': 42,
+    'big': 2 ** 70,
+    'ratio': 0.5,
+    'flag': False,
+    'empty': None,
+    'list': [1, 'two', {'three': 3}],
+    'nested': {
+        'one': 1,
+        'inception': {
+            'full': 'stars',
+            'zażółć': 'gęślą',
+        }
+    },
+    1: 'integer key',
+}
+
+
+def read_snapshot(name, queue):
+    snapshot = tcutils.configsnapshot.ConfigurationSnapshot.attach(name)
+    configuration = snapshot.configuration()
+    queue.put(configuration.nested.inception.full)
+    snapshot.close()
+
+
+class TestConfigurationSnapshot:
+
+    def test_snapshot_roundtrip(self):
+        image = tcutils.configsnapshot.encode_snapshot(DUMMY_CONFIG)
+        snapshot = tcutils.configsnapshot.ConfigurationSnapshot(image)
+        assert snapshot.mapping == DUMMY_CONFIG
+        assert list(snapshot.mapping) == list(DUMMY_CONFIG)
+        assert 'missing' not in snapshot.mapping
+
+    def test_snapshot_views_memoized(self):
+        image = tcutils.configsnapshot.encode_snapshot(DUMMY_CONFIG)
+        mapping = tcutils.configsnapshot.ConfigurationSnapshot(image).mapping
+        assert mapping['nested'] is mapping['nested']
+        assert mapping['nested']['inception'] is \
+            mapping['nested']['inception']
+        assert mapping['list'] is mapping['list']
+        assert mapping['list'][2] is mapping['list'][2]
+        assert mapping['list'][-1] is mapping['list'][2]
+
+    def test_snapshot_configuration(self, tmp_path):
+        snapshot_path = tmp_path / 'config.snapshot'
+        tcutils.configsnapshot.ConfigurationSnapshot.write(
+            tcutils.config.Configuration(DUMMY_CONFIG), snapshot_path)
+        snapshot = tcutils.configsnapshot.ConfigurationSnapshot.open(
+            snapshot_path)
+        configuration = snapshot.configuration()
+        assert configuration.string == 'foo'
+        assert configuration.nested.one == 1
+        assert getattr(configuration, 'nested.inception.full') == 'stars'
+        assert configuration.nested.inception['zażółć'] == 'gęślą'
+        assert configuration.list[2]['three'] == 3
+        assert str(configuration) == f'Configuration({DUMMY_CONFIG})'
+        snapshot.close()
+
+    def test_snapshot_configuration_hooks(self):
+        class HookedConfiguration(tcutils.config.Configuration):
+            def _parse_nested(self):
+                self.config['nested_one'] = self.config['nested']['one'] + 1
+
+        snapshot = tcutils.configsnapshot.ConfigurationSnapshot(
+            tcutils.configsnapshot.encode_snapshot(DUMMY_CONFIG))
+        configuration = snapshot.configuration(HookedConfiguration)
+        assert configuration.nested_one == 2
+        assert isinstance(
+            configuration.config['nested'],
+            tcutils.configsnapshot.SnapshotMapping)
+        assert 'nested_one' not in snapshot.mapping
+
+    def test_snapshot_shared_memory(self):
+        snapshot = tcutils.configsnapshot.ConfigurationSnapshot.create(
+            DUMMY_CONFIG)
+        try:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=read_snapshot, args=(snapshot.name, queue))
+            process.start()
+            assert queue.get(timeout=10) == 'stars'
+            process.join()
+        finally:
+            snapshot.close()
+            snapshot.unlink()
+
+    def test_snapshot_unsupported_type(self):
+        with pytest.raises(TypeError):
+            tcutils.configsnapshot.encode_snapshot({'value': object()})
@@ -6,7 +6,12 @@
 # Copyright (c) 2019-2020 TropiCoders Karol Tomala
 #
 
+import io
+import bz2
+import gzip
+import lzma
 import pytest
+import asyncio
 import pathlib
 import sys
 
@@ -133,3 +138,179 @@ class TestFS:
         cleaned_filename = tcutils.fs.clean_filename(
             filename, whitelist, replace, replacement)
         assert cleaned_filename == result
+
+    @pytest.fixture
+    def uri_inputs(self, tmp_path):
+        uris = []
+        for number in range(6):
+            path = tmp_path / f'input_{number}.txt'
+            path.write_text(f'input {number}\n')
+            uris.append(str(path) if number % 2 else path.as_uri())
+        uris.insert(2, str(tmp_path / 'missing.txt'))
+        uris.append('-')
+        return uris
+
+    def check_uri_results(self, results, uris):
+        assert sorted(result.index for result in results) == \
+            list(range(len(uris)))
+        for result in results:
+            assert result.uri == uris[result.index]
+        by_uri = {result.uri: result for result in results}
+        assert isinstance(by_uri[uris[2]].error, OSError)
+        assert by_uri[uris[0]].data == b'input 0\n'
+        assert by_uri[uris[1]].data == b'input 1\n'
+        assert by_uri['-'].data == 'standard input\n'
+
+    @pytest.mark.parametrize("ordered", [False, True])
+    def test_open_uris(self, uri_inputs, ordered):
+        results = list(tcutils.fs.open_uris(
+            uri_inputs, 'file', io.StringIO('standard input\n'),
+            max_concurrency=2, ordered=ordered))
+        self.check_uri_results(results, uri_inputs)
+        if ordered:
+            assert [result.index for result in results] == \
+                list(range(len(uri_inputs)))
+
+    @pytest.mark.parametrize("ordered", [False, True])
+    def test_open_uris_async(self, uri_inputs, ordered):
+        async def fetch_all():
+            return [
+                result async for result in tcutils.fs.open_uris_async(
+                    uri_inputs, 'file', io.StringIO('standard input\n'),
+                    max_concurrency=2, ordered=ordered)
+            ]
+
+        results = asyncio.run(fetch_all())
+        self.check_uri_results(results, uri_inputs)
+        if ordered:
+            assert [result.index for result in results] == \
+                list(range(len(uri_inputs)))
+
+    @pytest.mark.parametrize("ordered", [False, True])
+    def test_open_uris_async_lazy(self, uri_inputs, ordered):
+        consumed = []
+
+        def generate_uris():
+            for uri in uri_inputs:
+                consumed.append(uri)
+                yield uri
+
+        async def fetch_first():
+            results = tcutils.fs.open_uris_async(
+                generate_uris(), 'file', io.StringIO('standard input\n'),
+                max_concurrency=2, ordered=ordered)
+            try:
+                return await results.__anext__()
+            finally:
+                await results.aclose()
+
+        result = asyncio.run(fetch_first())
+        assert result.uri in consumed
+        assert len(consumed) == 2
+
+    @pytest.fixture
+    def large_file(self, tmp_path):
+        path = tmp_path / 'large.bin'
+        path.write_bytes(bytes(range(256)) * 1000)
+        return path
+
+    @pytest.mark.parametrize("local_mode", ['raw', 'mmap'])
+    def test_open_uri_local_mode(self, large_file, local_mode):
+        for uri in [str(large_file), large_file.as_uri()]:
+            stream = tcutils.fs.open_uri(uri, local_mode=local_mode)
+            try:
+                if local_mode == 'raw':
+                    assert isinstance(stream, io.FileIO)
+                else:
+                    assert isinstance(stream, tcutils.fs.mmap.mmap)
+                    assert stream[256:258] == b'\x00\x01'
+                assert stream.read() == large_file.read_bytes()
+            finally:
+                stream.close()
+
+    def test_open_uri_local_mode_empty(self, tmp_path):
+        path = tmp_path / 'empty.bin'
+        path.write_bytes(b'')
+        with tcutils.fs.open_uri(str(path), local_mode='mmap') as stream:
+            assert stream.read() == b''
+        with pytest.raises(ValueError):
+            tcutils.fs.open_uri(str(path), local_mode='direct')
+
+    @pytest.mark.parametrize("local_mode", [None, 'raw', 'mmap'])
+    def test_iter_uri_chunks(self, large_file, local_mode):
+        sizes = []
+        data = bytearray()
+        for chunk in tcutils.fs.iter_uri_chunks(
+                large_file.as_uri(), chunk_size=4096, local_mode=local_mode):
+            assert isinstance(chunk, memoryview)
+            sizes.append(len(chunk))
+            data += chunk
+        assert data == large_file.read_bytes()
+        assert max(sizes) == 4096
+
+    def test_iter_chunks_streams(self, large_file):
+        chunks = tcutils.fs.iter_uri_chunks(
+            large_file.as_uri(), chunk_size=1000)
+        chunk = next(chunks)
+        assert bytes(chunk) == (bytes(range(256)) * 4)[:1000]
+        chunks.close()
+        # Chunks are released when iteration moves on
+        with pytest.raises(ValueError):
+            bytes(chunk)
+        text = io.StringIO('ząb\n' * 10)
+        assert b''.join(tcutils.fs.iter_chunks(text, 7)) == \
+            'ząb\n'.encode('utf-8') * 10
+        binary = io.BytesIO(b'abc' * 10)
+        assert [bytes(chunk) for chunk in tcutils.fs.iter_chunks(
+            binary, 16)] == [b'abc' * 5 + b'a', b'bc' + b'abc' * 4]
+
+    @pytest.fixture
+    def compressed_files(self, tmp_path):
+        data = b''.join(b'line %d\n' % number for number in range(20000))
+        files = {'plain': tmp_path / 'plain.txt'}
+        files['plain'].write_bytes(data)
+        for codec, module in [('gzip', gzip), ('bz2', bz2), ('xz', lzma)]:
+            files[codec] = tmp_path / f'data.{codec}'
+            files[codec].write_bytes(module.compress(data))
+        return data, files
+
+    @pytest.mark.parametrize("codec", ['gzip', 'bz2', 'xz'])
+    @pytest.mark.parametrize("local_mode", [None, 'raw', 'mmap'])
+    def test_open_uri_decompress(self, compressed_files, codec, local_mode):
+        data, files = compressed_files
+        with tcutils.fs.open_uri(
+                str(files[codec]), local_mode=local_mode,
+                decompress=True) as stream:
+            assert isinstance(stream, tcutils.fs.DecompressedStream)
+            assert stream.codec == codec
+            assert stream.readline() == b'line 0\n'
+            assert stream.read() == data[len(b'line 0\n'):]
+        assert stream.source.closed
+        chunks = b''.join(
+            bytes(chunk) for chunk in tcutils.fs.iter_uri_chunks(
+                files[codec].as_uri(), chunk_size=4096, decompress=True))
+        assert chunks == data
+
+    def test_open_uri_decompress_detection(self, compressed_files, tmp_path):
+        data, files = compressed_files
+        # Magic bytes win over misleading extension
+        renamed = tmp_path / 'data.bin'
+        renamed.write_bytes(files['xz'].read_bytes())
+        plain_gz = tmp_path / 'plain.gz'
+        plain_gz.write_bytes(data)
+        with tcutils.fs.open_uri(str(renamed), decompress=True) as stream:
+            assert stream.codec == 'xz'
+            assert stream.read() == data
+        with tcutils.fs.open_uri(str(plain_gz), decompress=True) as stream:
+            assert not isinstance(stream, tcutils.fs.DecompressedStream)
+            assert stream.read() == data
+        # Extension is used when stream can't be peeked
+        unpeekable = io.BufferedIOBase()
+        assert tcutils.fs.compression_codec(unpeekable, 'a.tar.gz') == 'gzip'
+        assert tcutils.fs.compression_codec(unpeekable, 'a.txt') is None
+        with tcutils.fs.open_uri(str(plain_gz)) as stream:
+            assert stream.read() == data
+        with pytest.raises(ValueError):
+            tcutils.fs.open_uri(str(plain_gz), decompress='zstd')
+        text = io.StringIO('text')
+        assert tcutils.fs.decompress_stream(text) is text
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import gzip
+import pytest
+import threading
+import urllib.error
+import http.server
+
+from ..context import tcutils
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/hello')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path not in ('/hello', '/hello-close', '/hello.gz'):
+            self.send_error(404)
+            return
+        body = b'hello world\n'
+        if self.path == '/hello.gz':
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Close connection without telling client, like keep-alive timeout
+        self.close_connection = self.path == '/hello-close'
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_url():
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), KeepAliveHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={'poll_interval': 0.05},
+        daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+class TestHTTPPool:
+
+    def test_pooled_opener_reuses_connection(self, http_url):
+        with tcutils.httppool.PooledHTTPOpener() as opener:
+            for _ in range(5):
+                with opener(f'{http_url}/hello') as response:
+                    assert response.status == 200
+                    assert response.read() == b'hello world\n'
+            assert opener.pool.created == 1
+            assert opener.pool.reused == 4
+
+    def test_pooled_opener_unread_body(self, http_url):
+        with tcutils.httppool.PooledHTTPOpener() as opener:
+            opener(f'{http_url}/hello').close()
+            with opener(f'{http_url}/hello') as response:
+                assert response.readline() == b'hello world\n'
+            assert opener.pool.created == 1
+
+    def test_pooled_opener_redirect_and_error(self, http_url):
+        with tcutils.httppool.PooledHTTPOpener() as opener:
+            with opener(f'{http_url}/redirect') as response:
+                assert response.geturl() == f'{http_url}/hello'
+                assert response.read() == b'hello world\n'
+            with pytest.raises(urllib.error.HTTPError) as e:
+                opener(f'{http_url}/missing')
+            assert e.value.code == 404
+
+    def test_pooled_opener_stale_connection(self, http_url):
+        with tcutils.httppool.PooledHTTPOpener() as opener:
+            opener(f'{http_url}/hello-close').close()
+            with opener(f'{http_url}/hello') as response:
+                assert response.read() == b'hello world\n'
+            assert opener.pool.created == 2
+
+    def test_pooled_opener_timeout(self, http_url):
+        with tcutils.httppool.PooledHTTPOpener(timeout=5) as opener:
+            with opener(f'{http_url}/hello', timeout=2) as response:
+                assert response._connection.sock.gettimeout() == 2
+                assert response.read() == b'hello world\n'
+            with opener(f'{http_url}/hello') as response:
+                assert response._connection.sock.gettimeout() == 5
+                assert response.read() == b'hello world\n'
+            assert opener.pool.created == 1
+            with pytest.raises(TypeError):
+                opener(f'{http_url}/hello', context=None)
+            with tcutils.fs.open_uri(
+                    f'{http_url}/hello', opener=opener,
+                    timeout=2) as response:
+                assert response.read() == b'hello world\n'
+
+    def test_open_uri_opener(self, http_url, tmp_path):
+        local_path = tmp_path / 'local.txt'
+        local_path.write_text('local\n')
+        with tcutils.httppool.PooledHTTPOpener() as opener:
+            with tcutils.fs.open_uri(
+                    f'{http_url}/hello', opener=opener) as response:
+                assert response.read() == b'hello world\n'
+            with tcutils.fs.open_uri(
+                    str(local_path), opener=opener) as response:
+                assert response.read() == b'local\n'
+
+    def test_open_uri_decompress(self, http_url):
+        with tcutils.httppool.PooledHTTPOpener() as opener:
+            for _ in range(2):
+                with tcutils.fs.open_uri(
+                        f'{http_url}/hello.gz', opener=opener,
+                        decompress=True) as response:
+                    assert response.codec == 'gzip'
+                    assert response.read() == b'hello world\n'
+            assert opener.pool.created == 1
+        with tcutils.fs.open_uri(
+                f'{http_url}/hello.gz', decompress=True) as response:
+            assert response.read() == b'hello world\n'
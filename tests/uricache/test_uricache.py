@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2019-2020 TropiCoders Karol Tomala
+#
+
+import pytest
+import threading
+import contextlib
+import urllib.error
+import urllib.request
+import http.server
+
+from ..context import tcutils
+
+
+class RevalidatingServer(http.server.ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RevalidatingHandler)
+        self.bodies = {'/data': b'version 1\n', '/large': b'x' * 1000}
+        self.downloads = 0
+        self.revalidations = 0
+        self.failing = False
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class RevalidatingHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.server.failing:
+            self.send_error(503)
+            return
+        body = self.server.bodies.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = f'"{hash(body)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.revalidations += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.server.downloads += 1
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = RevalidatingServer()
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={'poll_interval': 0.05},
+        daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+OPENERS = ['urlopen', 'pooled']
+
+
+def make_cache(cache_dir, opener, **kwargs):
+    if opener == 'pooled':
+        kwargs['opener'] = tcutils.httppool.PooledHTTPOpener()
+    return tcutils.uricache.URICache(cache_dir, **kwargs)
+
+
+class TestURICache:
+
+    @pytest.mark.parametrize("opener", OPENERS)
+    def test_uri_cache_revalidation(self, server, tmp_path, opener):
+        cache = make_cache(tmp_path / 'cache', opener)
+        url = f'{server.url}/data'
+        for _ in range(3):
+            with tcutils.fs.open_uri(url, cache=cache) as fp:
+                assert fp.read() == b'version 1\n'
+        assert (server.downloads, server.revalidations) == (1, 2)
+        assert (cache.misses, cache.hits) == (1, 2)
+        server.bodies['/data'] = b'version 2\n'
+        with cache.open(url) as fp:
+            assert fp.read() == b'version 2\n'
+        assert server.downloads == 2
+        assert len(list((tmp_path / 'cache').glob('*.body'))) == 1
+
+    def test_uri_cache_max_age(self, server, tmp_path):
+        cache = tcutils.uricache.URICache(tmp_path, max_age=60)
+        for _ in range(3):
+            with cache.open(f'{server.url}/data') as fp:
+                assert fp.read() == b'version 1\n'
+        assert (server.downloads, server.revalidations) == (1, 0)
+
+    def test_uri_cache_eviction(self, server, tmp_path):
+        cache = tcutils.uricache.URICache(tmp_path, max_size=1005)
+        cache.open(f'{server.url}/data').close()
+        cache.open(f'{server.url}/large').close()
+        assert [meta['url'] for meta in cache.entries()] == [
+            f'{server.url}/large']
+        assert cache.size() == 1000
+
+    def test_uri_cache_errors(self, server, tmp_path):
+        cache = tcutils.uricache.URICache(tmp_path)
+        with pytest.raises(urllib.error.HTTPError):
+            cache.open(f'{server.url}/missing')
+        url = f'{server.url}/data'
+        cache.open(url).close()
+        server.shutdown()
+        server.server_close()
+        with cache.open(url) as fp:
+            assert fp.read() == b'version 1\n'
+        cache.clear()
+        assert cache.entries() == []
+        with pytest.raises(urllib.error.URLError):
+            cache.open(url)
+
+    def test_uri_cache_concurrent(self, server, tmp_path):
+        url = f'{server.url}/data'
+        bodies = []
+
+        def fetch():
+            cache = tcutils.uricache.URICache(tmp_path, max_age=60)
+            with cache.open(url) as fp:
+                bodies.append(fp.read())
+
+        threads = [threading.Thread(target=fetch) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert bodies == [b'version 1\n'] * 8
+        assert server.downloads == 1
+
+    def test_uri_cache_lock_files(self, server, tmp_path):
+        cache = tcutils.uricache.URICache(tmp_path, max_size=1005)
+        for path in ('data', 'large', 'missing'):
+            with contextlib.suppress(urllib.error.HTTPError):
+                cache.open(f'{server.url}/{path}').close()
+        cache.clear()
+        lock_names = {path.name for path in tmp_path.glob('*.lock')}
+        assert 'evict.lock' in lock_names
+        assert all(
+            name == 'evict.lock' or name.startswith('bucket-')
+            for name in lock_names)
+
+    def test_uri_cache_opener_arguments(self, server, tmp_path):
+        calls = []
+        errors = []
+
+        def opener(url, headers=None, **kwargs):
+            calls.append(kwargs)
+            try:
+                return urllib.request.urlopen(
+                    urllib.request.Request(url, headers=headers or {}),
+                    **kwargs)
+            except urllib.error.HTTPError as e:
+                errors.append(e)
+                raise e
+
+        cache = tcutils.uricache.URICache(tmp_path, opener=opener)
+        url = f'{server.url}/data'
+        with tcutils.fs.open_uri(url, cache=cache, timeout=5) as fp:
+            assert fp.read() == b'version 1\n'
+        assert calls == [{'timeout': 5}]
+        with pytest.raises(TypeError):
+            tcutils.fs.open_uri(url, 'http', None, b'data', cache=cache)
+        server.failing = True
+        with cache.open(url) as fp:
+            assert fp.read() == b'version 1\n'
+        assert errors[0].code == 503
+        assert errors[0].fp.closed
@@ -6,8 +6,11 @@
 # Copyright (c) 2019-2020 TropiCoders Karol Tomala
 #
 
+import os
+import glob
 import pytest
 import yaml
+import pickle
 import pathlib
 
 from ..context import tcutils
@@ -26,6 +29,37 @@ FULL_YAML_DICT = {
     }
 }
 
+INCLUDE_LOADERS = [
+    tcutils.yamlinclude.IncludeLoader,
+    pytest.param(tcutils.yamlinclude.CIncludeLoader, marks=pytest.mark.skipif(
+        tcutils.yamlinclude.CIncludeLoader is None,
+        reason='libyaml is not available')),
+]
+
+SELECTIVE_LOADERS = [
+    tcutils.yamlinclude.SelectiveIncludeLoader,
+    pytest.param(
+        tcutils.yamlinclude.CSelectiveIncludeLoader,
+        marks=pytest.mark.skipif(
+            tcutils.yamlinclude.CSelectiveIncludeLoader is None,
+            reason='libyaml is not available')),
+]
+
+SELECTIVE_YAML = """\
+base: &base {x: 1, y: 2}
+database:
+  host: db
+  port: 5432
+  options: !include missing.yaml
+server:
+  <<: *base
+  port: 80
+  nested: {a: [1, {b: 2}], c: 3}
+other: !include missing.yaml
+items: [1, &item {q: 1}]
+ref: *item
+"""
+
 
 class TestYamlInclude:
 
@@ -34,7 +68,385 @@ class TestYamlInclude:
         yaml_path = pathlib.Path(__file__).parent.absolute() / BASE_YAML_PATH
         return yaml_path.open('r')
 
-    def test_yaml_include(self, base_yaml_stream):
-        contents = yaml.load(base_yaml_stream,
-            tcutils.yamlinclude.IncludeLoader)
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include(self, base_yaml_stream, loader_class):
+        contents = yaml.load(base_yaml_stream, loader_class)
         assert contents == FULL_YAML_DICT
+
+    @pytest.fixture
+    def shared_yaml_path(self, tmp_path):
+        (tmp_path / 'defaults.yaml').write_text('timeout: 30\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'one: !include defaults.yaml\ntwo: !include defaults.yaml\n')
+        return config_path
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_shared(self, shared_yaml_path, loader_class):
+        with shared_yaml_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load(
+                fp, loader_class, copy_includes=False)
+        assert contents['one'] == {'timeout': 30}
+        assert contents['one'] is contents['two']
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_copied(self, shared_yaml_path, loader_class):
+        with shared_yaml_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load(fp, loader_class)
+        assert contents['one'] == contents['two']
+        assert contents['one'] is not contents['two']
+        contents['one']['timeout'] = 60
+        assert contents['two'] == {'timeout': 30}
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_cycle(self, tmp_path, loader_class):
+        (tmp_path / 'a.yaml').write_text('b: !include b.yaml\n')
+        (tmp_path / 'b.yaml').write_text('a: !include a.yaml\n')
+        with (tmp_path / 'a.yaml').open('r') as fp:
+            with pytest.raises(tcutils.yamlinclude.IncludeCycleError) as e:
+                tcutils.yamlinclude.load(fp, loader_class)
+        chain = [pathlib.Path(path).name for path in e.value.chain]
+        assert chain == ['a.yaml', 'b.yaml', 'a.yaml']
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_load_all(self, tmp_path, loader_class):
+        (tmp_path / 'included.yaml').write_text('foo: bar\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            '---\none: !include included.yaml\n---\ntwo: 2\n')
+        with config_path.open('r') as fp:
+            documents = list(tcutils.yamlinclude.load_all(fp, loader_class))
+        assert documents == [{'one': {'foo': 'bar'}}, {'two': 2}]
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_lazy(self, tmp_path, loader_class):
+        (tmp_path / 'table.yaml').write_text('rows: !include rows.yaml\n')
+        (tmp_path / 'rows.yaml').write_text('[1, 2, 3]\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('table: !include_lazy table.yaml\n')
+        with config_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load(fp, loader_class)
+        proxy = contents['table']
+        assert not proxy.resolved
+        copied = pickle.loads(pickle.dumps(proxy))
+        assert copied == proxy and not copied.resolved
+        assert proxy.resolve() == {'rows': [1, 2, 3]}
+        assert proxy.resolve() is proxy.resolve()
+        assert copied.resolve() == {'rows': [1, 2, 3]}
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_lazy_cycle(self, tmp_path, loader_class):
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('self: !include_lazy config.yaml\n')
+        with config_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load(fp, loader_class)
+        with pytest.raises(tcutils.yamlinclude.IncludeCycleError):
+            contents['self'].resolve()
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_json(self, tmp_path, loader_class):
+        (tmp_path / 'data.JSON').write_text('{"rows": [1, 2], "on": true}')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'data: !include data.JSON\nlazy: !include_lazy data.JSON\n')
+        with config_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load(
+                fp, loader_class, fragment_cache=None)
+        assert contents['data'] == {'rows': [1, 2], 'on': True}
+        assert contents['lazy'].resolve() == contents['data']
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_msgpack(self, tmp_path, loader_class):
+        msgpack = pytest.importorskip('msgpack')
+        (tmp_path / 'data.msgpack').write_bytes(
+            msgpack.packb({'rows': [1, 2], 1: 'one'}))
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('data: !include data.msgpack\n')
+        with config_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load(fp, loader_class)
+        assert contents['data'] == {'rows': [1, 2], 1: 'one'}
+
+    @pytest.mark.parametrize("loader_class", SELECTIVE_LOADERS)
+    @pytest.mark.parametrize("select, result", [
+        (['database.host', 'database.port'],
+         {'database': {'host': 'db', 'port': 5432}}),
+        (['server.x', 'server.nested.c'],
+         {'server': {'x': 1, 'nested': {'c': 3}}}),
+        (['ref', 'server.port.missing', 'items'],
+         {'ref': {'q': 1}, 'items': [1, {'q': 1}]}),
+        (['server', 'server.port'], {'server': {
+            'x': 1, 'y': 2, 'port': 80,
+            'nested': {'a': [1, {'b': 2}], 'c': 3}}}),
+    ])
+    def test_yaml_load_selected(self, tmp_path, loader_class, select, result):
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(SELECTIVE_YAML)
+        with config_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load_selected(
+                fp, select, loader_class)
+        assert contents == result
+
+    @pytest.mark.parametrize("loader_class", SELECTIVE_LOADERS)
+    def test_yaml_load_selected_include(self, tmp_path, loader_class):
+        (tmp_path / 'database.yaml').write_text('host: db\nport: 5432\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text(
+            'database: !include database.yaml\nother: !include missing.yaml\n')
+        with config_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load_selected(
+                fp, ['database.port'], loader_class)
+        assert contents == {'database': {'port': 5432}}
+
+    @pytest.fixture
+    def fragments_path(self, tmp_path):
+        tcutils.yamlinclude.FRAGMENT_CACHE.invalidate()
+        fragments_dir = tmp_path / 'conf.d'
+        fragments_dir.mkdir()
+        (fragments_dir / '20-db.yaml').write_text(
+            'services:\n  db:\n    port: 5432\n')
+        (fragments_dir / '10-web.yaml').write_text(
+            'services:\n  web:\n    port: 80\n')
+        (fragments_dir / '30-web.yml').write_text(
+            'services:\n  web:\n    workers: 4\n')
+        (fragments_dir / 'notes.txt').write_text('not yaml\n')
+        return tmp_path
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_glob(self, fragments_path, loader_class):
+        config_path = fragments_path / 'config.yaml'
+        config_path.write_text(
+            'listed: !include_glob conf.d/*.yaml\n'
+            'merged: !include_glob {pattern: "conf.d/*.y*ml", merge: true}\n')
+        with config_path.open('r') as fp:
+            contents = tcutils.yamlinclude.load(fp, loader_class)
+        assert contents['listed'] == [
+            {'services': {'web': {'port': 80}}},
+            {'services': {'db': {'port': 5432}}},
+        ]
+        assert contents['merged'] == {'services': {
+            'web': {'port': 80, 'workers': 4},
+            'db': {'port': 5432},
+        }}
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    @pytest.mark.parametrize("include_workers", [1, None])
+    def test_yaml_include_glob_workers(
+            self, fragments_path, loader_class, include_workers):
+        (fragments_path / 'nested.yaml').write_text(
+            'fragments: !include_glob conf.d/*.yaml\n')
+        config_path = fragments_path / 'config.yaml'
+        config_path.write_text('nested: !include nested.yaml\n')
+        include_globs = {}
+        with config_path.open('r') as fp:
+            loader = loader_class(
+                fp, fragment_cache=None, include_globs=include_globs,
+                include_workers=include_workers)
+            try:
+                contents = loader.get_single_data()
+            finally:
+                loader.dispose()
+        assert len(contents['nested']['fragments']) == 2
+        assert loader_class.include_workers == 1
+        pattern = (str(fragments_path / 'conf.d' / '*.yaml'), True)
+        assert loader.included_globs == [pattern]
+        assert include_globs == {
+            os.path.realpath(fragments_path / 'nested.yaml'): [pattern]}
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_dir(self, fragments_path, loader_class):
+        config_path = fragments_path / 'config.yaml'
+        config_path.write_text(
+            'listed: !include_dir conf.d\n'
+            'merged: !include_dir {path: conf.d, merge: true}\n'
+            'empty: !include_dir {path: conf.d, pattern: "*.json"}\n')
+        with config_path.open('r') as fp:
+            loader = loader_class(fp)
+            try:
+                contents = loader.get_single_data()
+            finally:
+                loader.dispose()
+        assert len(contents['listed']) == 3
+        assert contents['listed'][2] == {'services': {'web': {'workers': 4}}}
+        assert contents['merged']['services']['web'] == {
+            'port': 80, 'workers': 4}
+        assert contents['empty'] == []
+        assert sorted(path.name for path in loader.included_files) == [
+            '10-web.yaml', '10-web.yaml', '20-db.yaml', '20-db.yaml',
+            '30-web.yml', '30-web.yml']
+        conf_dir = str(fragments_path / 'conf.d')
+        assert loader.included_globs == [
+            (os.path.join(conf_dir, '*.yaml'), False),
+            (os.path.join(conf_dir, '*.yml'), False),
+            (os.path.join(conf_dir, '*.yaml'), False),
+            (os.path.join(conf_dir, '*.yml'), False),
+            (os.path.join(conf_dir, '*.json'), False),
+        ]
+        signature = tcutils.yamlinclude.glob_signature(
+            loader.included_globs[0])
+        (fragments_path / 'conf.d' / '40-new.yaml').write_text('{}\n')
+        assert tcutils.yamlinclude.glob_signature(
+            loader.included_globs[0]) != signature
+
+    @pytest.mark.parametrize("loader_class", INCLUDE_LOADERS)
+    def test_yaml_include_glob_cached(
+            self, fragments_path, loader_class, monkeypatch):
+        config_path = fragments_path / 'config.yaml'
+        config_path.write_text('fragments: !include_glob conf.d/*.yaml\n')
+        fragment_cache = tcutils.yamlinclude.FRAGMENT_CACHE
+        with config_path.open('r') as fp:
+            first = tcutils.yamlinclude.load(
+                fp, loader_class, fragment_cache=fragment_cache)
+        parsed = []
+        original = loader_class.get_single_data
+
+        def get_single_data(loader):
+            parsed.append(loader)
+            return original(loader)
+
+        monkeypatch.setattr(loader_class, 'get_single_data', get_single_data)
+        with config_path.open('r') as fp:
+            second = tcutils.yamlinclude.load(
+                fp, loader_class, fragment_cache=fragment_cache)
+        assert second == first
+        # Only root file was parsed again
+        assert len(parsed) == 1
+        second['fragments'][0]['services']['web']['port'] = 8080
+        (fragments_path / 'conf.d' / '10-web.yaml').write_text(
+            'services:\n  web:\n    port: 8081\n')
+        with config_path.open('r') as fp:
+            third = tcutils.yamlinclude.load(
+                fp, loader_class, fragment_cache=fragment_cache)
+        assert third['fragments'][0] == {'services': {'web': {'port': 8081}}}
+        assert third['fragments'][1] == first['fragments'][1]
+        assert len(parsed) == 3
+
+
+class TestFragmentCache:
+
+    @pytest.fixture
+    def included_path(self, tmp_path):
+        (tmp_path / 'nested.yaml').write_text('level: 2\n')
+        (tmp_path / 'included.yaml').write_text(
+            'foo: bar\nnested: !include nested.yaml\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('included: !include included.yaml\n')
+        return config_path
+
+    def load(self, config_path, cache, **loader_kwargs):
+        with config_path.open('r') as fp:
+            loader = tcutils.yamlinclude.IncludeLoader(
+                fp, fragment_cache=cache, **loader_kwargs)
+            try:
+                return loader.get_single_data()
+            finally:
+                loader.dispose()
+
+    def test_fragment_cache_hits(self, included_path):
+        cache = tcutils.yamlinclude.FragmentCache()
+        first = self.load(included_path, cache)
+        second = self.load(included_path, cache)
+        assert first == second == {
+            'included': {'foo': 'bar', 'nested': {'level': 2}}}
+        assert first['included'] is not second['included']
+        info = cache.info()
+        assert (info.hits, info.misses, info.entries) == (1, 2, 2)
+        assert info.size == sum(
+            (included_path.parent / name).stat().st_size
+            for name in ('included.yaml', 'nested.yaml', 'nested.yaml'))
+
+    def test_fragment_cache_stale_dependency(self, included_path):
+        cache = tcutils.yamlinclude.FragmentCache()
+        self.load(included_path, cache)
+        (included_path.parent / 'nested.yaml').write_text('level: 3\n# new\n')
+        contents = self.load(included_path, cache)
+        assert contents['included']['nested'] == {'level': 3}
+        assert cache.info().hits == 0
+
+    def test_fragment_cache_shared_dependency(self, tmp_path):
+        (tmp_path / 'd.yaml').write_text('v: 1\n')
+        (tmp_path / 'b.yaml').write_text('d: !include d.yaml\n')
+        (tmp_path / 'x.yaml').write_text('b: !include b.yaml\n')
+        (tmp_path / 'y.yaml').write_text('b: !include b.yaml\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('y: !include y.yaml\nx: !include x.yaml\n')
+        cache = tcutils.yamlinclude.FragmentCache()
+        assert self.load(config_path, cache)['x'] == {'b': {'d': {'v': 1}}}
+        (tmp_path / 'd.yaml').write_text('v: 222\n')
+        assert self.load(config_path, cache) == {
+            'y': {'b': {'d': {'v': 222}}}, 'x': {'b': {'d': {'v': 222}}}}
+
+    def test_fragment_cache_frozen(self, included_path):
+        cache = tcutils.yamlinclude.FragmentCache(frozen=True)
+        first = self.load(included_path, cache, copy_includes=True)
+        second = self.load(included_path, cache, copy_includes=True)
+        assert first['included'] is second['included']
+        with pytest.raises(TypeError):
+            first['included']['foo'] = 'baz'
+
+    def test_fragment_cache_eviction(self, tmp_path):
+        for name in ('a', 'b', 'c'):
+            (tmp_path / f'{name}.yaml').write_text(f'name: {name}\n')
+        paths = [str(tmp_path / f'{name}.yaml') for name in ('a', 'b', 'c')]
+        cache = tcutils.yamlinclude.FragmentCache(max_entries=2)
+        for path in paths:
+            cache.set(path, tcutils.yamlinclude.fragment_signature(path),
+                      {'path': path}, [])
+        assert paths[0] not in cache
+        assert cache.get(paths[1]) == ({'path': paths[1]}, [], [])
+        cache.set(paths[0], tcutils.yamlinclude.fragment_signature(paths[0]),
+                  {'path': paths[0]}, [])
+        assert paths[1] in cache and paths[2] not in cache
+        assert cache.info().evictions == 2
+        size = tcutils.yamlinclude.fragment_signature(paths[0])[2]
+        cache = tcutils.yamlinclude.FragmentCache(max_size=size * 2)
+        for path in paths:
+            cache.set(path, tcutils.yamlinclude.fragment_signature(path),
+                      {'path': path}, [])
+        assert len(cache) == 2 and cache.info().size == size * 2
+
+    def test_fragment_cache_invalidate(self, included_path):
+        cache = tcutils.yamlinclude.FragmentCache()
+        self.load(included_path, cache)
+        cache.invalidate(str(included_path.parent / 'nested.yaml'))
+        assert len(cache) == 0
+        self.load(included_path, cache)
+        cache.invalidate()
+        assert len(cache) == 0 and cache.info().size == 0
+
+    def test_fragment_cache_opt_in(self, included_path):
+        assert tcutils.yamlinclude.IncludeLoader.fragment_cache is None
+        tcutils.yamlinclude.FRAGMENT_CACHE.invalidate()
+        with included_path.open('r') as fp:
+            tcutils.yamlinclude.load(fp)
+        assert len(tcutils.yamlinclude.FRAGMENT_CACHE) == 0
+
+    def test_fragment_cache_glob(self, tmp_path):
+        fragments_dir = tmp_path / 'conf.d'
+        fragments_dir.mkdir()
+        (fragments_dir / 'a.yaml').write_text('a: 1\n')
+        (tmp_path / 'included.yaml').write_text(
+            '!include_dir {path: conf.d, merge: true}\n')
+        config_path = tmp_path / 'config.yaml'
+        config_path.write_text('included: !include included.yaml\n')
+        cache = tcutils.yamlinclude.FragmentCache()
+        assert self.load(config_path, cache) == {'included': {'a': 1}}
+        assert self.load(config_path, cache) == {'included': {'a': 1}}
+        assert cache.info().hits == 1
+        (fragments_dir / 'b.yaml').write_text('b: 2\n')
+        assert self.load(config_path, cache) == {
+            'included': {'a': 1, 'b': 2}}
+        # Only unchanged a.yaml was reused
+        assert cache.info().hits == 2
+        with config_path.open('r') as fp:
+            loader = tcutils.yamlinclude.IncludeLoader(
+                fp, fragment_cache=cache)
+            try:
+                loader.get_single_data()
+            finally:
+                loader.dispose()
+        # Glob patterns of cached fragment are reported as dependencies
+        assert loader.included_globs == [
+            (os.path.join(glob.escape(str(fragments_dir)), '*.yaml'), False),
+            (os.path.join(glob.escape(str(fragments_dir)), '*.yml'), False),
+        ]
+        assert cache.info().hits == 3